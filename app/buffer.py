@@ -1,8 +1,13 @@
+from typing import Optional
+
 import threading
 
 import numpy as np
 
 from config import COLUMNS, CENTER_ZONE_IDX
+from summary import Overview, SummaryPyramid
+
+CENTER_ZONE_DIST_COLUMNS = [COLUMNS.index(f"zone{CENTER_ZONE_IDX}_dist{target}") for target in range(2)]
 
 
 class Buffer:
@@ -14,11 +19,35 @@ class Buffer:
         self._data_index = -1  # Unbounded index for data samples
         self._buffer_size = size
         self._buffer = self._create_internal_buffer(size)
+        self._summary = SummaryPyramid(size)  # Center zone distances over the whole ring, for the overview
+
+        # Incremented on every change, lets readers skip work when nothing changed since their last read
+        self._version = 0
+        # Incremented on every change except appending an empty sample after another empty sample
+        self._activity_version = 0
+        self._last_sample_active = False
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def activity_version(self) -> int:
+        return self._activity_version
 
     def append(self, sample: np.ndarray) -> None:
+        active = bool((sample[3::2] != -1).any())  # any zone distance present
+        timestamp, dist0, dist1 = (sample.item(i) for i in (0, *CENTER_ZONE_DIST_COLUMNS))
+
         with self._lock:
             self._data_index += 1
             self._buffer[self._data_index % self._buffer_size] = sample
+            self._summary.append(timestamp, dist0, dist1)
+
+            self._version += 1
+            if active or self._last_sample_active:
+                self._activity_version += 1
+            self._last_sample_active = active
 
     def seek(self, value: int) -> None:
         if self._empty():
@@ -29,6 +58,46 @@ class Buffer:
             start_index = self._get_data_start_index()
             offset = int(value / 100.0 * data_length)
             self._observed_index = (start_index + offset) % self._buffer_size
+            self._view_changed()
+
+    def seek_to_timestamp(self, timestamp_ms: int) -> bool:
+        """Observes the data up to and including the last sample at timestamp_ms, in O(log n).
+
+        Returns False if timestamp_ms is outside of the buffered data, the nearest end is observed then.
+        """
+        with self._lock:
+            if self._empty():
+                return False
+
+            oldest = self._get_oldest_index()
+            first_ms = self._buffer[oldest % self._buffer_size, 0]
+            last_ms = self._buffer[self._data_index % self._buffer_size, 0]
+            found = first_ms <= timestamp_ms <= last_ms
+
+            index = self._bisect(timestamp_ms, right=True)
+            index = min(max(index, oldest + 1), self._data_index)
+            self._observed_index = index % self._buffer_size
+            self._view_changed()
+
+        return found
+
+    def get_range(self, t0: int, t1: int) -> np.ndarray:
+        """Samples with t0 <= timestamp <= t1, found by binary search over the ring."""
+        with self._lock:
+            if self._empty():
+                return np.array([])
+
+            start, end = self._bisect(t0), self._bisect(t1, right=True)
+            if start >= end:
+                return self._buffer[:0]
+
+            return self._get_data_slice(start % self._buffer_size, end % self._buffer_size)
+
+    def get_overview(self, columns: int) -> Optional[Overview]:
+        """Center zone min/max distances and occupancy of the whole ring in at most `columns` entries, the work
+        is proportional to `columns` rather than to the number of samples."""
+        with self._lock:
+            return self._summary.query(self._get_oldest_index(), self._data_index + 1, columns)
 
     def rewind(self) -> None:
         with self._lock:
@@ -37,14 +106,17 @@ class Buffer:
                 if self._is_running_live()
                 else (self._observed_index - 1) % self._buffer_size
             )
+            self._view_changed()
 
     def fast_forward(self) -> None:
         with self._lock:
             self._observed_index = -1 if self._is_running_live() else (self._observed_index + 1) % self._buffer_size
+            self._view_changed()
 
     def reset(self) -> None:
         with self._lock:
             self._observed_index = -1
+            self._view_changed()
 
     def skip_to_next_motion(self, direction: int = 1) -> None:
         with self._lock:
@@ -58,6 +130,7 @@ class Buffer:
                 index = self._get_current_motion_end_index(index, direction)
 
             self._observed_index = index
+            self._view_changed()
 
     def get_data(self) -> np.ndarray:
         with self._lock:
@@ -74,6 +147,10 @@ class Buffer:
 
             return self._get_data_slice(start_index, end_index)
 
+    def _view_changed(self) -> None:
+        self._version += 1
+        self._activity_version += 1
+
     def _create_internal_buffer(self, buffer_size: int) -> np.ndarray:
         return np.zeros((buffer_size, len(COLUMNS)), dtype=np.int64)
 
@@ -95,6 +172,24 @@ class Buffer:
     def _get_data_start_index(self) -> int:
         return max(0, self._data_index - self._buffer_size)
 
+    def _get_oldest_index(self) -> int:
+        """Unbounded index of the oldest sample still in the ring."""
+        return max(0, self._data_index - self._buffer_size + 1)
+
+    def _bisect(self, timestamp_ms: int, right: bool = False) -> int:
+        """Unbounded index of the first sample with a timestamp >= timestamp_ms (> if right), data_index + 1 if
+        there is none. Timestamps are monotonic over the unbounded index, the ring position wraps around."""
+        lo, hi = self._get_oldest_index(), self._data_index + 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            timestamp = self._buffer[mid % self._buffer_size, 0]
+            if timestamp < timestamp_ms or (right and timestamp == timestamp_ms):
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return lo
+
     def _get_current_motion_end_index(self, index: int, direction: int = 1) -> int:
         end_index = self._data_index % self._buffer_size
 
@@ -0,0 +1,60 @@
+from typing import Optional
+
+import time
+
+
+class VirtualClock:
+    """Time base of a replayed recording, in the timestamps of its frames.
+
+    A speed of 1 replays in real time, N replays N times faster and 0 as fast as possible. Collectors pace their
+    frames with wait_until(). The clock is anchored at the first frame and again after resume(), so the time spent
+    paused is skipped. Nothing downstream reads the wall clock of a replay: the virtual time is the timestamp of
+    the latest frame, so a recording gives the same detections at any speed.
+    """
+
+    REAL_TIME = 1.0
+    AS_FAST_AS_POSSIBLE = 0.0
+
+    def __init__(self, speed: float = REAL_TIME) -> None:
+        if speed < 0:
+            raise ValueError(f"Replay speed must not be negative, got {speed}")
+
+        self.speed = speed
+        self.time_ms: Optional[int] = None  # Timestamp of the latest frame reached
+
+        self._anchor_ms = 0
+        self._anchor_ns: Optional[int] = None  # perf_counter_ns() at the anchor frame
+
+    @property
+    def paced(self) -> bool:
+        return self.speed > 0
+
+    def resume(self) -> None:
+        """Re-anchors on the next frame, called when a paused replay continues."""
+        self._anchor_ns = None
+
+    def wait_until(self, timestamp_ms: int) -> float:
+        """Sleeps until the frame with this timestamp is due, returns how many ms it is late.
+
+        Sleeps under 1 ms are skipped because they overshoot, so frames at high rates are paced in small bursts.
+        """
+        lateness_ms = 0.0
+
+        if self.paced and self._anchor_ns is None:
+            self._anchor_ms, self._anchor_ns = timestamp_ms, time.perf_counter_ns()
+        elif self.paced:
+            due_ns = self._anchor_ns + (timestamp_ms - self._anchor_ms) * 1e6 / self.speed
+            delay_s = (due_ns - time.perf_counter_ns()) / 1e9
+            if delay_s > 0.001:
+                time.sleep(delay_s)
+            lateness_ms = max(0.0, (time.perf_counter_ns() - due_ns) / 1e6)
+
+        self.time_ms = int(timestamp_ms)
+        return lateness_ms
+
+    def extrapolate_ms(self, perf_ns: int) -> Optional[float]:
+        """Virtual time at perf_counter_ns() == perf_ns, None unless a paced replay is running."""
+        if not self.paced or self._anchor_ns is None:
+            return None
+
+        return self._anchor_ms + (perf_ns - self._anchor_ns) / 1e6 * self.speed
@@ -1,8 +1,12 @@
 import threading
+import time
 
 from numpy.typing import NDArray
 import numpy as np
 
+from clock import VirtualClock
+from metrics import REGISTRY, FRAMES, DROPPED_FRAMES, STAGE_COLLECTOR, TRANSPORT_LAG, Counter, Histogram
+
 from abc import abstractmethod
 from typing import Optional, Callable
 
@@ -10,19 +14,51 @@ from typing import Optional, Callable
 class Collector:
     DataSample = NDArray[np.int64]
     Subscriber = Callable[[DataSample], None]
+    EndSubscriber = Callable[[], None]
+
+    # How frame timestamps relate to the local wall clock
+    SENSOR_CLOCK = "sensor"  # gettimeofday of the sensor host, assumed to be synchronized with ours
+    REPLAY_CLOCK = "replay"  # recorded timestamps replayed in real time by the virtual clock
+    NO_CLOCK = None  # timestamps do not follow the wall clock, latencies are not measured
 
-    def __init__(self) -> None:
+    def __init__(self, clock: Optional[str] = SENSOR_CLOCK, virtual_clock: Optional[VirtualClock] = None) -> None:
         self._event = threading.Event()
         self._worker: Optional[threading.Thread] = None
         self._subscribers: list[Collector.Subscriber] = []
+        self._end_subscribers: list[Collector.EndSubscriber] = []
+
+        # perf_counter_ns() at receipt of the frame being dispatched, read by subscribers on the collector thread
+        self.receipt_ns: int = 0
+        self._pending_receipt_ns: int = 0
+        self.timestamp_ms: int = 0  # of the frame being dispatched
+
+        # Latencies against the frame timestamps: wall clock = perf_counter_ns() + offset, sampled on start
+        # instead of calling time.time() per frame
+        self.clock = clock
+        self.transport_lag_ms: Optional[float] = None  # of the frame being dispatched
+        self._wall_minus_perf_ns = time.time_ns() - time.perf_counter_ns()
+
+        # Paces recordings, None for live sources
+        self.virtual_clock = virtual_clock
+
+        # Written only by this collector's thread, see use_sensor_metrics()
+        self._frames: Counter = FRAMES
+        self._dropped_frames: Counter = DROPPED_FRAMES
+        self._stage_collector: Histogram = STAGE_COLLECTOR
+        self._transport_lag: Histogram = TRANSPORT_LAG
 
     @abstractmethod
     def _start(self) -> None:
         raise NotImplementedError("Subclasses must implement _run method")
 
     def start(self) -> None:
+        self._wall_minus_perf_ns = time.time_ns() - time.perf_counter_ns()
+        # Replayed timestamps do not advance while stopped
+        if self.virtual_clock is not None:
+            self.virtual_clock.resume()
+
         if self._worker is None or not self._worker.is_alive():
-            self._worker = threading.Thread(target=self._start, daemon=True)
+            self._worker = threading.Thread(target=self._run, daemon=True)
             self._worker.start()
 
         self._event.set()
@@ -30,12 +66,86 @@ class Collector:
     def stop(self) -> None:
         self._event.clear()
 
+    def use_sensor_metrics(self, sensor_id: int) -> None:
+        """Switches to metrics labelled with sensor="<sensor_id>", so that the collectors of several sensors, each
+        on its own thread, never update the same metric."""
+
+        def labelled(metric):
+            register = REGISTRY.counter if isinstance(metric, Counter) else REGISTRY.histogram
+            return register(metric.name, metric.help, **{**metric.labels, "sensor": str(sensor_id)})
+
+        self._frames = labelled(FRAMES)
+        self._dropped_frames = labelled(DROPPED_FRAMES)
+        self._stage_collector = labelled(STAGE_COLLECTOR)
+        self._transport_lag = labelled(TRANSPORT_LAG)
+
     def subscribe(self, callback: Subscriber) -> None:
         self._subscribers.append(callback)
 
     def unsubscribe(self, callback: Subscriber) -> None:
         self._subscribers.remove(callback)
 
+    def subscribe_end(self, callback: EndSubscriber) -> None:
+        """Called on the collector thread once a finite source, a recording, has been dispatched completely."""
+        self._end_subscribers.append(callback)
+
+    @property
+    def subscribers(self) -> list[Subscriber]:
+        return list(self._subscribers)
+
+    def replace_subscriber(self, old: Subscriber, new: Subscriber) -> None:
+        """Swaps a callback in place, safe while frames are dispatched on the collector thread."""
+        self._subscribers[self._subscribers.index(old)] = new
+
+    def _mark_receipt(self) -> None:
+        """Called by subclasses as soon as the raw frame arrives, before it is parsed."""
+        self._pending_receipt_ns = time.perf_counter_ns()
+
+    def latency_ms(self, timestamp_ms: int, perf_ns: Optional[int] = None) -> Optional[float]:
+        """Wall clock time at perf_ns (default: now) minus a frame timestamp, None without a usable clock."""
+        if self.clock is Collector.NO_CLOCK:
+            return None
+
+        if perf_ns is None:
+            perf_ns = time.perf_counter_ns()
+
+        if self.clock == Collector.REPLAY_CLOCK:
+            now_ms = self.virtual_clock.extrapolate_ms(perf_ns)
+            return now_ms - timestamp_ms if now_ms is not None else None
+
+        return (perf_ns + self._wall_minus_perf_ns) / 1e6 - timestamp_ms
+
+    def event_time_ms(self, timestamp_ms: int) -> int:
+        """Time of an event decided at the frame with this timestamp.
+
+        Replays use the frame timestamp, so a recording gives the same events at any speed, live sources the
+        wall clock.
+        """
+        if self.virtual_clock is not None:
+            return int(timestamp_ms)
+
+        return time.time_ns() // 1_000_000
+
     def dispatch(self, sample: DataSample) -> None:
+        self._frames.inc()
+        if self._pending_receipt_ns:
+            self.receipt_ns = self._pending_receipt_ns
+            self._pending_receipt_ns = 0
+            self._stage_collector.since(self.receipt_ns)
+        else:
+            self.receipt_ns = time.perf_counter_ns()
+
+        self.timestamp_ms = int(sample[0])
+        if self.clock is not Collector.NO_CLOCK:
+            self.transport_lag_ms = self.latency_ms(self.timestamp_ms, self.receipt_ns)
+            if self.transport_lag_ms is not None:
+                self._transport_lag.observe_ns(int(self.transport_lag_ms * 1e6))
+
         for subscriber in self._subscribers:
             subscriber(sample)
+
+    def _run(self) -> None:
+        self._start()
+
+        for subscriber in self._end_subscribers:
+            subscriber()
@@ -1,6 +1,7 @@
 from mediator import Mediator
 from strategy import Strategy
 from motion import Motion
+from velocity_estimator import VelocityEstimate, Cancellation
 
 from abc import ABC
 
@@ -19,11 +20,20 @@ class Component(ABC):
         """Value is an int between 0 and 100 representing the percentage of the video to seek to."""
         self._mediator.handle_seek(value)
 
+    def seek_to_timestamp(self, timestamp_ms: int) -> None:
+        """Observes the data up to the sample at timestamp_ms (epoch ms, as in *-velocity-labels.csv)."""
+        self._mediator.handle_seek_to_timestamp(timestamp_ms)
+
     def reset(self) -> None:
         self._mediator.handle_reset()
 
-    def gui_update(self, n_seconds: int) -> None:
-        self._mediator.handle_gui_update(n_seconds)
+    def gui_update(self, n_seconds: int, force: bool = False) -> None:
+        """Mediator pushes new data only if something visible changed, or if anything changed and force is set."""
+        self._mediator.handle_gui_update(n_seconds, force)
+
+    def overview_update(self, columns: int) -> None:
+        """Mediator pushes a summary of the whole buffer in at most `columns` entries, if it changed."""
+        self._mediator.handle_overview_update(columns)
 
     def rewind_to_next_motion(self, direction: int = 1) -> None:
         self._mediator.handle_rewind_to_next_motion(direction)
@@ -33,3 +43,12 @@ class Component(ABC):
 
     def signal_bicycle(self, motion: Motion) -> None:
         self._mediator.handle_signal_bicycle(motion)
+
+    def signal_provisional_bicycle(self, estimate: VelocityEstimate) -> None:
+        self._mediator.handle_provisional_bicycle(estimate)
+
+    def signal_provisional_cancelled(self, cancellation: Cancellation) -> None:
+        self._mediator.handle_provisional_cancelled(cancellation)
+
+    def toggle_profiling(self) -> None:
+        self._mediator.handle_toggle_profiling()
@@ -17,3 +17,11 @@ ZONE_COLUMNS = [item for pair in zip(ZONE_CONFIDENCE_COLUMNS, ZONE_DISTANCE_COLU
 COLUMNS = ["timestamp", "ambient_light"] + ZONE_COLUMNS
 
 BICYCLE_VELOCITY_THRESHOLD_KMH = 6.3
+
+# Downstream warnings must follow the last sample of a bicycle within this time
+DECISION_LATENCY_BUDGET_MS = 300
+
+# Provisional detections need a velocity this many standard deviations above the bicycle threshold
+PROVISIONAL_CONFIDENCE_Z = 2.0
+# Distances tracked before a provisional detection, fewer make the filter overconfident on short noisy tracks
+PROVISIONAL_MIN_SAMPLES = 5
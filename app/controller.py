@@ -4,43 +4,174 @@ from detector import Detector
 from mediator import Mediator
 from motion import Motion
 from collector import Collector
+from velocity_model import VelocityModel
+from velocity_estimator import VelocityEstimate, Cancellation
+from sink import Sink, PrintSink, provisional_event, cancelled_event
+from profiler import Profiler
+from pipeline import Stage, StageMonitor
+from metrics import STAGE_BUFFER, STAGE_TRANSFORM, STAGE_DETECT, END_TO_END, SIGNAL, BICYCLES, DECISION_LATENCY
+from metrics import LATE_BICYCLES, PROVISIONAL_BICYCLES, PROVISIONAL_CANCELLED
+from config import DECISION_LATENCY_BUDGET_MS
 from overrides import overrides
 from strategy import Strategy, ZoneDistaceStrategy, TargetZeroStrategy, ConfidenceStrategy
 from copy import deepcopy
+from typing import Optional, Union
+
+import signal
+import threading
+import time
 
 
 count = 0
 
+
+class _ReplayMediator(Mediator):
+    @overrides
+    def handle_signal_bicycle(self, motion: Motion) -> None:
+        # Motions found while replaying a paused buffer were published live before
+        pass
+
+
 class Controller(Mediator):
-    def __init__(self, collector: Collector, strategy: ZoneDistaceStrategy = TargetZeroStrategy()) -> None:
+    """Collector -> ingest -> transform -> detect -> publish, every stage but ingest on its own worker thread.
+
+    Stages are connected by bounded queues, a full queue drops the frame instead of blocking the collector. The
+    ingest stage runs on the collector thread and only appends to the buffer. The live detector is owned by the
+    detect worker, the GUI thread replays the paused buffer on a separate detector.
+    """
+
+    def __init__(
+        self,
+        collector: Collector,
+        strategy: ZoneDistaceStrategy = TargetZeroStrategy(),
+        velocity_model: Optional[VelocityModel] = None,
+        sink: Optional[Sink] = None,
+        profile_window_s: float = 30,
+        profile_dir: str = ".",
+        stats_interval_s: Optional[float] = 10,
+        queue_size: int = 1024,
+        provisional: bool = False,
+    ) -> None:
         self._collector = collector
         self._strategy = strategy
+        self._sink = sink if sink is not None else PrintSink()
 
         self._buffer = Buffer(span=160)
         self._gui = GUI(mediator=self)
-        self._detector = Detector(mediator=self)
+        self._detector = Detector(mediator=self, velocity_model=velocity_model, provisional=provisional)
+        self._replay_detector = Detector(mediator=_ReplayMediator(), velocity_model=velocity_model)
+        self._profiler = Profiler(self, collector, window_s=profile_window_s, output_dir=profile_dir)
 
         self._is_playing: bool = False
 
+        self._ingest = Stage("ingest", self._ingest_frame, inline=True)
+        self._transform = Stage("transform", self._transform_frame, queue_size)
+        self._detect = Stage("detect", self._detect_frame, queue_size)
+        self._publish = Stage("publish", self._publish_motion, queue_size)
+        self._stages = [self._ingest, self._transform, self._detect, self._publish]
+
+        # Frame being detected, owned by the detect worker
+        self._detect_receipt_ns = 0
+        self._detect_timestamp_ms = 0
+
+        self._stats_interval_s = stats_interval_s
+        self._stopped = threading.Event()
+
+        # Versions of the buffer and detector state last pushed to the GUI
+        self._gui_state: tuple[int, int, int] = (-1, -1, -1)
+        self._overview_state: tuple[int, int] = (-1, -1)  # Buffer version and columns of the last overview
+
     def start(self) -> None:
         self._collector.subscribe(self._handle_collector_data)
+        signal.signal(signal.SIGUSR1, self._handle_profiling_signal)
+        if self._stats_interval_s is not None:
+            threading.Thread(target=self._report_loop, daemon=True).start()
+
         self._start_live_data()
         self._gui.start()
 
+        self._stopped.set()
+        self._collector.stop()
+        for stage in self._stages:
+            stage.stop()
+        self._sink.close()
+
     def _handle_collector_data(self, sample: Collector.DataSample) -> None:
+        self._ingest.put((sample, self._collector.receipt_ns))
+
+    # ---------------------------------- Stages ---------------------------------- #
+
+    def _ingest_frame(self, frame: tuple[Collector.DataSample, int]) -> None:
+        sample, _ = frame
+        t = time.perf_counter_ns()
         self._buffer.append(sample)
+        STAGE_BUFFER.since(t)
 
         if self._is_playing:
-            sample = self._strategy.transform(sample.reshape(1, -1))[0]
-            self._detector.append_sample(sample)
+            self._transform.put(frame)
+
+    def _transform_frame(self, frame: tuple[Collector.DataSample, int]) -> None:
+        sample, receipt_ns = frame
+        t = time.perf_counter_ns()
+        sample = self._strategy.transform(sample.reshape(1, -1))[0]
+        STAGE_TRANSFORM.since(t)
+        self._detect.put((sample, receipt_ns))
+
+    def _detect_frame(self, frame: tuple[Collector.DataSample, int]) -> None:
+        sample, receipt_ns = frame
+        self._detect_receipt_ns = receipt_ns
+        self._detect_timestamp_ms = int(sample[0])
+
+        t = time.perf_counter_ns()
+        self._detector.append_sample(sample)
+        STAGE_DETECT.since(t)
+        END_TO_END.since(receipt_ns)
+
+    def _publish_motion(self, detection: tuple[Union[Motion, VelocityEstimate, Cancellation], int, int]) -> None:
+        motion, receipt_ns, timestamp_ms = detection
+        if isinstance(motion, VelocityEstimate):
+            PROVISIONAL_BICYCLES.inc()
+            self._sink.emit_event(provisional_event(motion, self._collector.event_time_ms(timestamp_ms)))
+            return
+        if isinstance(motion, Cancellation):
+            PROVISIONAL_CANCELLED.inc()
+            self._sink.emit_event(cancelled_event(motion, self._collector.event_time_ms(timestamp_ms)))
+            return
+
+        self._sink.emit(motion, self._collector.event_time_ms(timestamp_ms))
+
+        BICYCLES.inc()
+        SIGNAL.since(receipt_ns)
+
+        latency_ms = self._collector.latency_ms(motion.time_end)
+        if latency_ms is not None:
+            DECISION_LATENCY.observe_ns(int(latency_ms * 1e6))
+            flush_delay_ms = timestamp_ms - motion.time_end
+            print(f"Decision latency {latency_ms:.0f} ms after the last sample ({flush_delay_ms} ms flush delay)")
+            if latency_ms > DECISION_LATENCY_BUDGET_MS:
+                LATE_BICYCLES.inc()
+                print(f"Warning: decision latency over the {DECISION_LATENCY_BUDGET_MS} ms budget")
+
+    def _report_loop(self) -> None:
+        monitor = StageMonitor(self._stages)
+        while not self._stopped.wait(self._stats_interval_s):
+            print(f"Stage utilization: {monitor.report()}")
+
+    # ----------------------------------- GUI ------------------------------------ #
 
     def _update_data(self) -> None:
         data = self._buffer.get_data()
         data = self._strategy.transform(data)
-        if not self._is_playing:
-            self._detector.update_data(data)
-        motion = self._detector.get_motion()
+        if self._is_playing:
+            motion = self._detector.get_motion()
+        else:
+            self._replay_detector.update_data(data)
+            motion = self._replay_detector.get_motion()
         self._gui.update_data(data, motion)
+        self._gui_state = self._get_gui_state()
+
+    def _get_gui_state(self) -> tuple[int, int, int]:
+        return (self._buffer.version, self._buffer.activity_version, self._detector.version)
 
     def _stop_live_data(self) -> None:
         self._is_playing = False
@@ -70,6 +201,13 @@ class Controller(Mediator):
         self._buffer.seek(value)
         self._update_data()
 
+    @overrides
+    def handle_seek_to_timestamp(self, timestamp_ms: int) -> None:
+        self._stop_live_data()
+        if not self._buffer.seek_to_timestamp(timestamp_ms):
+            print(f"Timestamp {timestamp_ms} is not buffered, showing the nearest data")
+        self._update_data()
+
     @overrides
     def handle_reset(self) -> None:
         self._buffer.reset()
@@ -77,9 +215,28 @@ class Controller(Mediator):
         self._start_live_data()
 
     @overrides
-    def handle_gui_update(self, n_seconds: int) -> None:
+    def handle_gui_update(self, n_seconds: int, force: bool = False) -> None:
+        state = self._get_gui_state()
+        if state == self._gui_state:
+            return
+
+        # Only empty samples appended since the last update, refreshed when forced
+        if not force and state[1:] == self._gui_state[1:]:
+            return
+
         self._update_data()
 
+    @overrides
+    def handle_overview_update(self, columns: int) -> None:
+        state = (self._buffer.version, columns)
+        if state == self._overview_state:
+            return
+
+        overview = self._buffer.get_overview(columns)
+        if overview is not None:
+            self._gui.update_overview(overview)
+        self._overview_state = state
+
     @overrides
     def handle_rewind_to_next_motion(self, direction: int = 1) -> None:
         if self._is_playing:
@@ -103,6 +260,25 @@ class Controller(Mediator):
 
         self._update_data()
 
+    @overrides
+    def handle_toggle_profiling(self) -> None:
+        self._profiler.toggle()
+
+    def _handle_profiling_signal(self, signum: int, frame) -> None:
+        # The signal may interrupt a profiled handler holding the profiler lock, toggle on another thread
+        threading.Thread(target=self.handle_toggle_profiling, daemon=True).start()
+
     @overrides
     def handle_signal_bicycle(self, motion: Motion) -> None:
-        print(f"Bicycle {"approaching" if motion.direction == 1 else "moving away"} {motion.velocity:.2f} kmh detected!")
+        # Called by the live detector on the detect worker
+        self._publish.put((motion, self._detect_receipt_ns, self._detect_timestamp_ms))
+
+    @overrides
+    def handle_provisional_bicycle(self, estimate: VelocityEstimate) -> None:
+        # Called by the live detector on the detect worker
+        self._publish.put((estimate, self._detect_receipt_ns, self._detect_timestamp_ms))
+
+    @overrides
+    def handle_provisional_cancelled(self, cancellation: Cancellation) -> None:
+        # Called by the live detector on the detect worker
+        self._publish.put((cancellation, self._detect_receipt_ns, self._detect_timestamp_ms))
@@ -1,22 +1,34 @@
 from collector import Collector
+from clock import VirtualClock
 
 from overrides import overrides
 from typing import Optional
 import numpy as np
-import time
 
 
 class CSVCollector(Collector):
-    def __init__(self, file_path: str, live_mode: bool = False, start_time_ms: int = 0) -> None:
-        super().__init__()
+    """Replays a recording paced by a virtual clock.
+
+    `speed` is 1 for real time, N for N times faster and 0 for as fast as possible. The default is real time
+    in `live_mode` and as fast as possible otherwise.
+    """
+
+    def __init__(
+        self, file_path: str, live_mode: bool = False, start_time_ms: int = 0, speed: Optional[float] = None
+    ) -> None:
+        if speed is None:
+            speed = VirtualClock.REAL_TIME if live_mode else VirtualClock.AS_FAST_AS_POSSIBLE
+        virtual_clock = VirtualClock(speed)
+
+        # Latencies are only measured against a real time replay
+        super().__init__(
+            clock=Collector.REPLAY_CLOCK if speed == VirtualClock.REAL_TIME else Collector.NO_CLOCK,
+            virtual_clock=virtual_clock,
+        )
 
         self._file_path = file_path
-        self._live_mode = live_mode
         self._start_time_ms = start_time_ms
 
-        self._last_timestamp: Optional[float] = None
-        self._last_dispatch_time: Optional[float] = None
-
     @overrides
     def _start(self) -> None:
         with open(self._file_path, "r") as file:
@@ -29,6 +41,7 @@ class CSVCollector(Collector):
             print("Reached end of CSV file")
 
     def _handle_message(self, line: str) -> None:
+        self._mark_receipt()
         data = line.strip().split(",")
         data = np.array(list(map(int, data)), dtype=np.int64)
 
@@ -36,20 +49,11 @@ class CSVCollector(Collector):
         if self._start_time_ms > timestamp_ms:
             return
 
-        if self._live_mode:
-            self._simulate_live_data(timestamp_ms / 1000.0)
-
-        self.dispatch(data)
-
-    def _simulate_live_data(self, timestamp: float) -> None:
-        if self._last_timestamp is not None:
-            elapsed_time = timestamp - self._last_timestamp
-            time_since_last_dispatch = time.time() - self._last_dispatch_time
-
-            if elapsed_time > time_since_last_dispatch:
-                time.sleep(elapsed_time - time_since_last_dispatch)
-            else:
+        lateness_ms = self.virtual_clock.wait_until(int(timestamp_ms))
+        if self.virtual_clock.paced:
+            if lateness_ms > 100:
                 print("Warning, data is being processed too slowly")
+            # A paced frame arrives after the replay delay
+            self._mark_receipt()
 
-        self._last_timestamp = timestamp
-        self._last_dispatch_time = time.time()
+        self.dispatch(data)
@@ -2,43 +2,88 @@ from component import Component
 from mediator import Mediator
 from motion import Motion
 from monotonic_series import MonotonicSeries
-from config import BICYCLE_VELOCITY_THRESHOLD_KMH, CENTER_ZONE_IDX
+from velocity_model import VelocityModel
+from velocity_estimator import StreamingVelocityEstimator, VelocityEstimate, Cancellation
+from config import BICYCLE_VELOCITY_THRESHOLD_KMH, CENTER_ZONE_IDX, DIST_TO_PATH
+from config import PROVISIONAL_CONFIDENCE_Z, PROVISIONAL_MIN_SAMPLES
+from metrics import SERIES, MOTIONS, FLUSH_DELAY
 
 import numpy as np
 import threading
 
-from copy import deepcopy
-from typing import Tuple, Optional
+from typing import Optional
 
 
 class Detector(Component):
     def __init__(
-        self, mediator: Mediator, min_samples: int = 3, max_dd: int = 200, max_series_time_delta_ms: int = 500
+        self,
+        mediator: Mediator,
+        min_samples: int = 3,
+        max_dd: int = 200,
+        max_series_time_delta_ms: int = 500,
+        velocity_model: Optional[VelocityModel] = None,
+        provisional: bool = False,
+        motion_validity_ms: int = 3000,
     ) -> None:
+        """All times are frame timestamps, the virtual time of a replay, the detector never reads the wall clock."""
         super().__init__(mediator)
 
         self._min_samples: int = min_samples
         self._max_dd: int = max_dd
         self._max_series_time_delta_ms: int = max_series_time_delta_ms
+        self._motion_validity_ms: int = motion_validity_ms
+        self._velocity_model: Optional[VelocityModel] = velocity_model
+
+        # Signals bicycles before their motion is flushed, the flushed motion confirms or cancels them
+        self._velocity_estimator: Optional[StreamingVelocityEstimator] = None
+        if provisional:
+            self._velocity_estimator = StreamingVelocityEstimator(
+                threshold_kmh=BICYCLE_VELOCITY_THRESHOLD_KMH,
+                dist_to_path=DIST_TO_PATH,
+                confidence_z=PROVISIONAL_CONFIDENCE_Z,
+                min_samples=max(min_samples, PROVISIONAL_MIN_SAMPLES),
+                max_dd=max_dd,
+                max_gap_ms=max_series_time_delta_ms,
+            )
 
         self._latest_timestamp: int = -1
-        self._samples: list[Tuple[int, int]] = []
+        self._latest_sample_ms: int = -1  # Timestamp of the sample being appended
+        # Samples of the series being processed, reused between series so appending allocates nothing
+        self._window = np.empty((256, 2), dtype=np.int64)
+        self._window_len = 0
         self._prev_direction: int = None
         self._processing_series = False
         self._series: list[MonotonicSeries] = []
+        self._replaying = False  # Replayed windows are not counted in the metrics
 
         self._motion_lock = threading.Lock()
         self._motion: Optional[Motion] = None
+        self._version = 0  # Incremented whenever the current motion changes
+
+        # Provisional detections signalled since the last flush, the motion and its bicycle event share their id
+        self._provisional: list[VelocityEstimate] = []
+        self._next_track_id = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def now_ms(self) -> int:
+        """Timestamp of the latest sample, -1 before the first one."""
+        return self._latest_sample_ms
 
     def append_sample(self, sample: np.ndarray) -> None:
         timestamp_ms, cener_zone_dist_mm = sample[0], sample[2 + CENTER_ZONE_IDX]
+        self._latest_sample_ms = timestamp_ms
 
-        # Make detected motion valid for 3 seconds after detection
+        # Detected motion stays valid for motion_validity_ms of frame time after detection
         with self._motion_lock:
             if self._motion:
                 dt = timestamp_ms - self._motion.time_end
-                if dt > 3000 or dt < 0:
+                if dt > self._motion_validity_ms or dt < 0:
                     self._motion = None
+                    self._version += 1
 
         # Flush detected monotonic series into motion
         if (
@@ -48,78 +93,134 @@ class Detector(Component):
         ):
             self._flush_series()
 
-        self._process_sample((timestamp_ms, cener_zone_dist_mm))
+        self._process_sample(timestamp_ms, cener_zone_dist_mm)
+
+        if self._velocity_estimator is not None:
+            estimate = self._velocity_estimator.update(timestamp_ms, cener_zone_dist_mm)
+            if estimate is not None and not self._replaying:
+                estimate = estimate._replace(track_id=self._new_track_id())
+                self._provisional.append(estimate)
+                self.signal_provisional_bicycle(estimate)
+
+            # The samples of a rejected series never become part of a motion
+            if self._provisional and not self._processing_series and len(self._series) == 0:
+                self._cancel_provisional(self._provisional, "no_motion", None)
+                self._provisional = []
 
     def update_data(self, data: np.ndarray) -> None:
-        if self._latest_timestamp == data[-1][0]:
+        if len(data) == 0 or self._latest_timestamp == data[-1][0]:
             return
 
-        self._samples = []
+        self._window_len = 0
         self._prev_direction = None
         self._processing_series = False
         self._series = []
+        self._provisional = []
+        if self._velocity_estimator is not None:
+            self._velocity_estimator.reset()
 
+        self._replaying = True
         for sample in data:
             self.append_sample(sample)
+        self._replaying = False
 
         self._latest_timestamp = data[-1][0]
 
     def get_motion(self) -> Optional[Motion]:
-        with self._motion_lock:
-            return deepcopy(self._motion)
+        """Current motion, immutable so it is returned without copying."""
+        return self._motion
 
-    def _validate_series_samples(self, samples: list[Tuple[int, int]]) -> bool:
-        max_dd_ok = all(abs(samples[i][1] - samples[i - 1][1]) < self._max_dd for i in range(1, len(samples)))
+    def _validate_series_samples(self, samples: np.ndarray) -> bool:
+        max_dd_ok = bool((np.abs(np.diff(samples[:, 1])) < self._max_dd).all())
         min_samples_ok = len(samples) >= self._min_samples
 
         return max_dd_ok and min_samples_ok
 
-    def _process_sample(self, sample: Tuple[int, int]) -> None:
-        _, distance_mm = sample
+    def _append_to_window(self, timestamp_ms: int, distance_mm: int) -> None:
+        if self._window_len == len(self._window):
+            self._window = np.concatenate((self._window, np.empty_like(self._window)))
 
+        self._window[self._window_len] = timestamp_ms, distance_mm
+        self._window_len += 1
+
+    def _close_series(self) -> None:
+        samples = self._window[: self._window_len]
+        if self._validate_series_samples(samples):
+            # The series copies its samples out of the window, which is reused from here on
+            series = MonotonicSeries(samples)
+            self._series.append(series)
+            if not self._replaying:
+                SERIES.inc()
+
+        self._window_len = 0
+        self._prev_direction = None
+
+    def _process_sample(self, timestamp_ms: int, distance_mm: int) -> None:
         if distance_mm == -1:
             self._processing_series = False
 
-            if len(self._samples) == 0:
+            if self._window_len == 0:
                 return
 
             # End of processed series detected
-            if self._validate_series_samples(self._samples):
-                series = MonotonicSeries(self._samples)
-                self._series.append(series)
-
-            self._samples = []
-            self._prev_direction = None
+            self._close_series()
 
         else:
             self._processing_series = True
 
             # First sample of a motion
-            if len(self._samples) == 0:
-                self._samples.append(sample)
+            if self._window_len == 0:
+                self._append_to_window(timestamp_ms, distance_mm)
                 return
 
-            direction = self._samples[-1][1] > distance_mm
+            prev_distance_mm = self._window[self._window_len - 1, 1]
+            direction = prev_distance_mm > distance_mm
 
             # Second sample of a motion
-            if len(self._samples) == 1:
+            if self._window_len == 1:
                 self._prev_direction = direction
 
             # Next consecutive sample of a motion
-            elif self._prev_direction != direction or abs(self._samples[-1][1] - distance_mm) > self._max_dd:
-                if self._validate_series_samples(self._samples):
-                    series = MonotonicSeries(self._samples)
-                    self._series.append(series)
+            elif self._prev_direction != direction or abs(prev_distance_mm - distance_mm) > self._max_dd:
+                self._close_series()
+
+            self._append_to_window(timestamp_ms, distance_mm)
 
-                self._samples = []
-                self._prev_direction = None
+    def _new_track_id(self) -> int:
+        self._next_track_id += 1
+        return self._next_track_id
 
-            self._samples.append(sample)
+    def _cancel_provisional(self, estimates: list[VelocityEstimate], reason: str, velocity: Optional[float]) -> None:
+        for estimate in estimates:
+            self.signal_provisional_cancelled(Cancellation(estimate, reason, velocity))
 
     def _flush_series(self):
         with self._motion_lock:
-            self._motion = Motion(self._series, self._max_series_time_delta_ms)
-            if self._motion.velocity > BICYCLE_VELOCITY_THRESHOLD_KMH:
-                self.signal_bicycle(deepcopy(self._motion))
+            motion = Motion(self._series, self._max_series_time_delta_ms)
+            if self._velocity_model is not None:
+                motion = motion.with_velocity(self._velocity_model.predict(motion))
+
+            # Provisional detections made before the first series of the motion were on rejected samples
+            before = [estimate for estimate in self._provisional if estimate.time < motion.time_start]
+            matched = [estimate for estimate in self._provisional if estimate.time >= motion.time_start]
+            self._provisional = []
+            motion = motion.with_track_id(matched[0].track_id if matched else self._new_track_id())
+
+            self._motion = motion
+            self._version += 1
+            if not self._replaying:
+                MOTIONS.inc()
+                # A motion is only decided once no series followed it for max_series_time_delta_ms
+                FLUSH_DELAY.observe_ns(int(self._latest_sample_ms - self._motion.time_end) * 1_000_000)
+            confirmed = self._motion.velocity > BICYCLE_VELOCITY_THRESHOLD_KMH
+            if confirmed:
+                # Motions are immutable, consumers on other threads share the same instance
+                self.signal_bicycle(self._motion)
+
+            self._cancel_provisional(before, "no_motion", None)
+            if confirmed:
+                self._cancel_provisional(matched[1:], "duplicate", self._motion.velocity)
+            else:
+                self._cancel_provisional(matched, "below_threshold", self._motion.velocity)
 
         self._series = []
@@ -1,27 +1,34 @@
 from component import Component
 from mediator import Mediator
 from motion import Motion
+from summary import Overview
 from config import NUM_ZONES
 
 from matplotlib import pyplot as plt
-from matplotlib.animation import FuncAnimation
-from matplotlib.widgets import Slider
+from matplotlib.widgets import Slider, TextBox
 from matplotlib.gridspec import GridSpec
 from matplotlib.artist import Artist
+from matplotlib.lines import Line2D
+from matplotlib.collections import LineCollection
+from matplotlib.colors import Normalize
 
-from typing import Optional
+from typing import Callable, Optional
 from abc import ABC, abstractmethod
 from datetime import datetime
 from overrides import overrides
 
 import numpy as np
 import threading
+import time
 
 
 class Animator(ABC):
+    """Creates its artists once and only mutates them on update, so that the figure can be blitted."""
+
     def __init__(self, fig, ax):
         self._fig = fig
         self._ax = ax
+        self.artists: list[Artist] = []
 
     @abstractmethod
     def update(self, data: np.ndarray, motion: Optional[Motion]) -> list[Artist]:
@@ -29,47 +36,54 @@ class Animator(ABC):
 
 
 class DepthMapAnimator(Animator):
-    def __init__(self, fig, ax):
+    def __init__(self, fig, ax, max_distance_mm=5000):
         super().__init__(fig, ax)
 
-        zone_distances = np.zeros((3, 3))
+        self._max_distance_mm = max_distance_mm
+        self._zone_distances = np.zeros((3, 3), dtype=np.int64)
 
         self._im = self._ax.imshow(
-            zone_distances,
+            self._zone_distances,
             cmap="autumn",
             extent=[0, 3, 3, 0],
             vmin=0,
-            vmax=5000,
+            vmax=max_distance_mm,
         )
 
         self._ax.set_title("Depth map")
         self._fig.colorbar(self._im, ax=self._ax, orientation="vertical")
-        self._ax.set_xticks(np.arange(0, zone_distances.shape[1] + 1, 1))
-        self._ax.set_yticks(np.arange(0, zone_distances.shape[0] + 1, 1))
+        self._ax.set_xticks(np.arange(0, self._zone_distances.shape[1] + 1, 1))
+        self._ax.set_yticks(np.arange(0, self._zone_distances.shape[0] + 1, 1))
         self._ax.grid(True, linestyle="--")
 
+        self._texts = [
+            self._ax.text(j + 0.5, i + 0.5, "", ha="center", va="center")
+            for i in range(self._zone_distances.shape[0])
+            for j in range(self._zone_distances.shape[1])
+        ]
+
+        self.artists = [self._im, *self._texts]
+
     @overrides
     def update(self, data: np.ndarray, motion: Optional[Motion]) -> list[Artist]:
         if len(data) == 0:
-            return []
-
-        zone_distances = data[-1][2:]
-        zone_distances = zone_distances.reshape(3, 3)
-        zone_distances[zone_distances == -1] = 5000
+            return self.artists
 
-        self._im.set_data(zone_distances)
+        # Copy, the data may be a view into the buffer
+        np.copyto(self._zone_distances, data[-1][2:].reshape(3, 3))
+        self._zone_distances[self._zone_distances == -1] = self._max_distance_mm
 
-        for text in self._ax.texts:
-            text.remove()
+        self._im.set_data(self._zone_distances)
 
-        for i in range(zone_distances.shape[0]):
-            for j in range(zone_distances.shape[1]):
-                self._ax.text(j + 0.5, i + 0.5, zone_distances[i, j], ha="center", va="center")
+        for text, distance in zip(self._texts, self._zone_distances.flat):
+            text.set_text(str(distance))
 
-        return [self._im]
+        return self.artists
 
 
 class CenterZoneAnimator(Animator):
+    """Plots the center zone distance against time relative to the latest sample, so the axes never change."""
+
     def __init__(self, fig, ax, time_span_s=5, y_span_mm=6000):
         super().__init__(fig, ax)
 
@@ -78,42 +92,109 @@ class CenterZoneAnimator(Animator):
 
         self._ax.set_title("Center zone")
         self._ax.set(xlabel="time [s]", ylabel="distance [mm]")
-        self._ax.set_xlim(0, self._time_span_s)
+        self._ax.set_xlim(-self._time_span_s * 3 / 4, self._time_span_s * 1 / 4)
         self._ax.set_ylim(0, self._y_span_mm)
         self._ax.grid(True)
 
-        self._scatter = self._ax.scatter([0], [0], color="orange", s=20)
+        (self._samples,) = self._ax.plot([], [], color="orange", marker="o", markersize=4.5, linestyle="")
+        self._series_lines: list[Line2D] = []
+
+        self.artists = [self._samples]
 
     @overrides
     def update(self, data: np.ndarray, motion: Optional[Motion]) -> list[Artist]:
         if len(data) < 2:
-            return []
+            return self.artists
+
+        t_now = data[-1][0]
+        self._samples.set_data((data[:, 0] - t_now) / 1000.0, data[:, 2 + NUM_ZONES // 2])
+        self._update_motion(motion, t_now)
+
+        return self.artists
+
+    def _update_motion(self, motion: Optional[Motion], t_now: int) -> None:
+        series = motion.series if motion is not None else ()
+
+        # Lines are pooled, a motion with more series than ever before adds new ones
+        while len(self._series_lines) < len(series):
+            (line,) = self._ax.plot([], [])
+            self._series_lines.append(line)
+            self.artists.append(line)
+
+        for i, line in enumerate(self._series_lines):
+            if i >= len(series):
+                line.set_visible(False)
+                continue
+
+            s = series[i]
+            samples = s.samples
+            line.set_data((samples[:, 0] - t_now) / 1000.0, samples[:, 1])
+            line.set_color("red" if s.dist_end < s.dist_start else "blue")
+            line.set_visible(True)
 
-        if motion != None:
-            self.update_motion(motion)
-        else:
-            for line in self._ax.get_lines():
-                line.remove()
 
-        center_zone_data = data[:, [0, 2 + NUM_ZONES // 2]]  # timestamp, center_zone_distance
+class OverviewAnimator(Animator):
+    """Strip with the center zone distances of the whole buffer, one min/max line per pixel column colored by the
+    share of samples with a target. The x axis spans the columns of the last overview, not time, so it is fixed."""
+
+    def __init__(self, fig, ax, y_span_mm=6000):
+        super().__init__(fig, ax)
+
+        self._timestamps = np.array([], dtype=np.int64)
+        self._cursor_ms: Optional[int] = None  # Latest shown sample
+
+        self._ax.set_xlim(0, 1)
+        self._ax.set_ylim(0, y_span_mm)
+        self._ax.set_xticks([])
+        self._ax.set_yticks([])
+
+        # Low occupancy stays visible, the colormap starts below 0
+        self._envelope = LineCollection([], cmap="Oranges", norm=Normalize(vmin=-0.5, vmax=1), linewidths=1)
+        self._ax.add_collection(self._envelope)
+        self._cursor = self._ax.axvline(1, color="red", linewidth=1)
+        self._range = self._ax.text(0.005, 0.95, "", fontsize=8, transform=self._ax.transAxes, va="top")
+
+        self.artists = [self._envelope, self._cursor, self._range]
+
+    def update_overview(self, overview: Overview) -> None:
+        self._timestamps = overview.timestamps
+
+        n = len(overview.timestamps)
+        x = (np.arange(n) + 0.5) / n
+        present = overview.max_distances != -1
+        lower = np.column_stack((x, overview.min_distances))[present]
+        upper = np.column_stack((x, overview.max_distances))[present]
+
+        self._envelope.set_segments(np.stack((lower, upper), axis=1))
+        self._envelope.set_array(overview.occupancy[present])
+
+        first, last = (datetime.fromtimestamp(t / 1000.0).strftime("%H:%M:%S") for t in self._timestamps[[0, -1]])
+        self._range.set_text(f"{first} - {last}")
+        self._move_cursor()
+
+    def timestamp_at(self, x: float) -> Optional[int]:
+        """Timestamp of the column at x in axes coordinates, None before the first overview."""
+        if len(self._timestamps) == 0:
+            return None
+
+        return int(self._timestamps[min(max(int(x * len(self._timestamps)), 0), len(self._timestamps) - 1)])
+
+    @overrides
+    def update(self, data: np.ndarray, motion: Optional[Motion]) -> list[Artist]:
+        if len(data) == 0:
+            return self.artists
 
-        t_now = center_zone_data[-1][0]
-        left = t_now - self._time_span_s * 3 / 4 * 1000
-        right = t_now + self._time_span_s * 1 / 4 * 1000
-        self._ax.set_xlim(left, right)
+        self._cursor_ms = data[-1][0]
+        self._move_cursor()
 
-        self._scatter.set_offsets(center_zone_data)
+        return self.artists
 
-        return [self._scatter]
+    def _move_cursor(self) -> None:
+        if self._cursor_ms is None or len(self._timestamps) == 0:
+            return
 
-    def update_motion(self, motion: Motion) -> None:
-        for s in motion._monotonic_series:
-            color = "red" if s.dist_end < s.dist_start else "blue"
-            self._ax.plot(
-                [sample[0] for sample in s._samples],
-                [sample[1] for sample in s._samples],
-                color=color,
-            )
+        x = np.searchsorted(self._timestamps, self._cursor_ms, side="right") / len(self._timestamps)
+        self._cursor.set_xdata([x, x])
 
 
 class WidgetAnimator(Animator):
@@ -133,11 +214,19 @@ class WidgetAnimator(Animator):
         self._distance = self._ax.text(0, 0.5, "distance: -1", **args)
         self._timestamp = self._ax.text(0, 0.25, "timestamp: -1", **args)
         self._motion_velocity = self._ax.text(0, 0, "velocity: -1", **args)
+        self._render_time = self._ax.text(
+            1, 1, "render: -1", fontsize=10, transform=self._ax.transAxes, ha="right", va="top"
+        )
+
+        self.artists = [self._time, self._distance, self._timestamp, self._motion_velocity, self._render_time]
+
+    def set_render_time(self, render_time_ms: float) -> None:
+        self._render_time.set_text(f"render: {render_time_ms:.1f} ms")
 
     @overrides
     def update(self, data: np.ndarray, motion: Optional[Motion]) -> list[Artist]:
         if len(data) == 0:
-            return []
+            return self.artists
 
         if motion != None:
             self._motion_velocity.set_text(f"velocity: {motion.velocity:.2f} kmh")
@@ -152,38 +241,126 @@ class WidgetAnimator(Animator):
         self._distance.set_text(f"distance: {distance} mm")
         self._time.set_text(f"time: {time}")
 
-        return [self._ax.texts]
+        return self.artists
+
+
+class BlitAnimation:
+    """Redraws the animated artists on top of the cached figure background on every tick of a canvas timer.
+
+    Ticks are skipped entirely, the artists stay on screen, while `needs_redraw` returns False. Keeps an
+    exponential moving average of the time it takes to update and draw a frame. Only public canvas methods are
+    used: the background is copied after every full draw of the figure, e.g. on resize.
+    """
+
+    def __init__(
+        self,
+        fig,
+        update: Callable[[], list[Artist]],
+        artists: Callable[[], list[Artist]],
+        interval: int,
+        needs_redraw: Callable[[], bool] = lambda: True,
+    ) -> None:
+        self.render_time_ms: float = 0.0
+        self._fig = fig
+        self._update = update
+        self._artists = artists
+        self._needs_redraw = needs_redraw
+        self._background = None
+
+        # Animated artists are left out of full draws, so that the background does not contain them
+        for artist in artists():
+            artist.set_animated(True)
+
+        self.event_source = fig.canvas.new_timer(interval=interval)
+        self.event_source.add_callback(self._step)
+        fig.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def _on_draw(self, event) -> None:
+        # The timer starts once the figure is shown
+        if self._background is None:
+            self.event_source.start()
+
+        self._background = self._fig.canvas.copy_from_bbox(self._fig.bbox)
+        self._draw(self._artists())
+
+    def _step(self) -> None:
+        if self._background is None or not self._needs_redraw():
+            return
+
+        start = time.perf_counter()
+        artists = self._update()
+        self._fig.canvas.restore_region(self._background)
+        self._draw(artists)
+        self._fig.canvas.blit(self._fig.bbox)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.render_time_ms = 0.9 * self.render_time_ms + 0.1 * elapsed_ms if self.render_time_ms else elapsed_ms
+
+    def _draw(self, artists: list[Artist]) -> None:
+        for artist in artists:
+            # Artists added since the last frame, e.g. pooled motion lines, join the animated ones here
+            if not artist.get_animated():
+                artist.set_animated(True)
+            self._fig.draw_artist(artist)
 
 
 class GUI(Component):
-    def __init__(self, mediator: Mediator) -> None:
+    """Polls the mediator every refresh interval and redraws only when it pushed new data.
+
+    The interval grows with the measured render cost so that rendering takes at most `max_render_share` of the
+    time, down to `min_fps`. Idle samples (no target in any zone) are only redrawn at `min_fps`.
+    """
+
+    def __init__(
+        self,
+        mediator: Mediator,
+        refresh_interval_ms: int = 100,
+        min_fps: float = 1,
+        max_render_share: float = 0.25,
+    ) -> None:
         super().__init__(mediator)
 
         self._center_zone_time_span_s = 5
-        self._refresh_interval_ms = 100
+        self._overview_interval_s = 1
+        self._refresh_interval_ms = refresh_interval_ms
+        self._max_interval_ms = max(1000 / min_fps, refresh_interval_ms)
+        self._max_render_share = max_render_share
 
         self._data_lock = threading.Lock()
         self._data = np.array([], dtype=np.int64)
 
+        self._dirty = True
+        self._last_redraw = 0.0
+        self._last_overview = 0.0
+
         self._fig = plt.figure()
-        gs = GridSpec(3, 5, figure=self._fig)
+        gs = GridSpec(3, 5, figure=self._fig, bottom=0.22)
 
         self._widgets_ax = self._fig.add_subplot(gs[:1, :3])
         self._center_zone_ax = self._fig.add_subplot(gs[1:, :3])
         self._depth_map_ax = self._fig.add_subplot(gs[:, 3:])
+        self._overview_ax = self._fig.add_axes([0.1, 0.07, 0.85, 0.06])
 
         self._widget_animator = WidgetAnimator(self._fig, self._widgets_ax)
         self._center_zone_animator = CenterZoneAnimator(self._fig, self._center_zone_ax, self._center_zone_time_span_s)
         self._depth_map_animator = DepthMapAnimator(self._fig, self._depth_map_ax)
+        self._overview_animator = OverviewAnimator(self._fig, self._overview_ax)
         self._animators: list[Animator] = [
             self._widget_animator,
             self._center_zone_animator,
             self._depth_map_animator,
+            self._overview_animator,
         ]
 
-        self._ani = FuncAnimation(self._fig, self._animate, interval=self._refresh_interval_ms, save_count=200)
+        # Artists are only mutated, so only they are redrawn on top of the cached background
+        self._ani = BlitAnimation(
+            self._fig,
+            self._animate,
+            self._artists,
+            interval=self._refresh_interval_ms,
+            needs_redraw=self._poll,
+        )
 
-        self._seek_ax = self._fig.add_axes([0.1, 0.02, 0.8, 0.02])
+        self._seek_ax = self._fig.add_axes([0.1, 0.02, 0.45, 0.02])
         self._slider = Slider(
             ax=self._seek_ax,
             label="Time",
@@ -196,8 +373,16 @@ class GUI(Component):
             track_color="gray",
         )
 
+        # Epoch ms timestamp, e.g. of a label in *-velocity-labels.csv
+        self._jump_ax = self._fig.add_axes([0.8, 0.01, 0.15, 0.04])
+        self._jump_box = TextBox(self._jump_ax, "Jump to ms ")
+
         self._fig.canvas.mpl_connect("key_press_event", self._on_key_press)
+        self._fig.canvas.mpl_connect("button_press_event", self._on_click)
+        # Resizing drops the blit background, artists have to be drawn again even if nothing changed
+        self._fig.canvas.mpl_connect("resize_event", self._on_resize)
         self._slider.on_changed(self._on_seek_submit)
+        self._jump_box.on_submit(self._on_jump_submit)
 
     def start(self) -> None:
         plt.show()
@@ -206,11 +391,50 @@ class GUI(Component):
         with self._data_lock:
             for animator in self._animators:
                 animator.update(data, motion)
+            self._dirty = True
 
-    def _animate(self, frame) -> None:
-        self.gui_update(self._center_zone_time_span_s)
+    def update_overview(self, overview: Overview) -> None:
+        with self._data_lock:
+            self._overview_animator.update_overview(overview)
+            self._dirty = True
+
+    def _poll(self) -> bool:
+        now = time.perf_counter()
+        if now - self._last_overview >= self._overview_interval_s:
+            self._last_overview = now
+            # One summary entry per pixel column, whatever the number of buffered samples
+            self.overview_update(max(int(self._overview_ax.get_window_extent().width), 1))
+
+        self.gui_update(self._center_zone_time_span_s, force=(now - self._last_redraw) * 1000 >= self._max_interval_ms)
+
+        with self._data_lock:
+            dirty, self._dirty = self._dirty, False
+
+        if dirty:
+            self._last_redraw = now
+            self._adapt_interval()
+
+        return dirty
+
+    def _adapt_interval(self) -> None:
+        interval_ms = self._ani.render_time_ms / self._max_render_share
+        interval_ms = int(min(max(interval_ms, self._refresh_interval_ms), self._max_interval_ms))
+        if self._ani.event_source is not None and self._ani.event_source.interval != interval_ms:
+            self._ani.event_source.interval = interval_ms
+
+    def _artists(self) -> list[Artist]:
+        return [artist for animator in self._animators for artist in animator.artists]
+
+    def _animate(self) -> list[Artist]:
+        self._widget_animator.set_render_time(self._ani.render_time_ms)
+        with self._data_lock:
+            return self._artists()
 
     def _on_key_press(self, event) -> None:
+        # Keys typed into the timestamp box are not shortcuts
+        if self._jump_box.capturekeystrokes:
+            return
+
         if event.key == "a":
             self.rewind()
 
@@ -233,5 +457,31 @@ class GUI(Component):
         elif event.key == "2":
             self.change_strategy("confidence")
 
+        # Shift+p, p is the matplotlib pan key
+        elif event.key == "P":
+            self.toggle_profiling()
+
+    def _on_resize(self, event) -> None:
+        with self._data_lock:
+            self._dirty = True
+
+    def _on_click(self, event) -> None:
+        if event.inaxes is not self._overview_ax or event.button != 1:
+            return
+
+        timestamp_ms = self._overview_animator.timestamp_at(event.xdata)
+        if timestamp_ms is not None:
+            self.seek_to_timestamp(timestamp_ms + self._center_zone_time_span_s * 1000 // 2)
+
     def _on_seek_submit(self, value: int) -> None:
         self.seek(value)
+
+    def _on_jump_submit(self, text: str) -> None:
+        try:
+            timestamp_ms = int(float(text.strip()))
+        except ValueError:
+            print(f"Invalid timestamp: {text!r}")
+            return
+
+        # The jumped to timestamp is shown in the middle of the center zone view
+        self.seek_to_timestamp(timestamp_ms + self._center_zone_time_span_s * 1000 // 2)
@@ -0,0 +1,187 @@
+from collector import Collector
+from detector import Detector
+from mediator import Mediator
+from motion import Motion
+from sink import Sink, provisional_event, cancelled_event
+from strategy import ZoneDistaceStrategy, TargetZeroStrategy
+from velocity_model import VelocityModel
+from velocity_estimator import VelocityEstimate, Cancellation
+from metrics import STAGE_TRANSFORM, STAGE_DETECT, END_TO_END, SIGNAL, BICYCLES, DECISION_LATENCY, LATE_BICYCLES
+from metrics import PROVISIONAL_BICYCLES, PROVISIONAL_CANCELLED
+from metrics import LatencyWindow
+from config import DECISION_LATENCY_BUDGET_MS
+from profiler import Profiler
+
+from overrides import overrides
+from typing import Optional
+
+import resource
+import signal
+import threading
+import time
+import os
+
+
+def rss_mb() -> float:
+    """Current resident set size, peak resident set size where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+
+class HeadlessController(Mediator):
+    """Collector -> strategy -> detector pipeline without the GUI and without importing matplotlib.
+
+    Runs until SIGINT/SIGTERM (or for `run_for_s`), reports detections to the sink and prints throughput stats
+    every `stats_interval_s`. SIGUSR1 toggles a profiling window.
+    """
+
+    def __init__(
+        self,
+        collector: Collector,
+        sink: Sink,
+        strategy: ZoneDistaceStrategy = TargetZeroStrategy(),
+        velocity_model: Optional[VelocityModel] = None,
+        stats_interval_s: float = 10,
+        profile_window_s: float = 30,
+        profile_dir: str = ".",
+        provisional: bool = False,
+    ) -> None:
+        self._collector = collector
+        self._sink = sink
+        self._strategy = strategy
+        self._detector = Detector(mediator=self, velocity_model=velocity_model, provisional=provisional)
+        self._profiler = Profiler(self, collector, window_s=profile_window_s, output_dir=profile_dir)
+
+        self._stats_interval_s = stats_interval_s
+        self._stop_event = threading.Event()
+
+        self._samples = 0
+        self._detections = 0
+        self._provisional_detections = 0
+        self._cancelled_detections = 0
+        self._busy_s = 0.0
+
+        # Sensor timestamp based latencies of the current stats interval
+        self._transport_lags = LatencyWindow()
+        self._flush_delays = LatencyWindow()
+        self._decision_latencies = LatencyWindow()
+        self._late_detections = 0
+
+    def start(self, run_for_s: Optional[float] = None) -> None:
+        signal.signal(signal.SIGINT, self._handle_stop_signal)
+        signal.signal(signal.SIGTERM, self._handle_stop_signal)
+        signal.signal(signal.SIGUSR1, self._handle_profiling_signal)
+
+        self._collector.subscribe(self._handle_collector_data)
+        if self._collector.virtual_clock is not None:
+            self._collector.subscribe_end(self._handle_replay_end)
+        self._collector.start()
+
+        start = time.perf_counter()
+        deadline = start + run_for_s if run_for_s is not None else None
+        last_report, last_samples, last_busy_s = start, 0, 0.0
+
+        while not self._stop_event.is_set():
+            timeout = self._stats_interval_s
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.perf_counter())
+                if timeout <= 0:
+                    break
+
+            if self._stop_event.wait(timeout):
+                break
+
+            now = time.perf_counter()
+            if now - last_report >= self._stats_interval_s:
+                self._report(now - last_report, self._samples - last_samples, self._busy_s - last_busy_s)
+                last_report, last_samples, last_busy_s = now, self._samples, self._busy_s
+
+        self._collector.stop()
+        self._sink.close()
+        self._report(time.perf_counter() - start, self._samples, self._busy_s, total=True)
+
+    def _handle_stop_signal(self, signum: int, frame) -> None:
+        print(f"Received {signal.Signals(signum).name}, stopping")
+        self._stop_event.set()
+
+    def _handle_profiling_signal(self, signum: int, frame) -> None:
+        # The signal may interrupt a profiled handler holding the profiler lock, toggle on another thread
+        threading.Thread(target=self.handle_toggle_profiling, daemon=True).start()
+
+    def _handle_replay_end(self) -> None:
+        print("Replay finished, stopping")
+        self._stop_event.set()
+
+    def _handle_collector_data(self, sample: Collector.DataSample) -> None:
+        t0 = time.perf_counter_ns()
+        sample = self._strategy.transform(sample.reshape(1, -1))[0]
+        t = STAGE_TRANSFORM.since(t0)
+        self._detector.append_sample(sample)
+        t = STAGE_DETECT.since(t)
+        END_TO_END.since(self._collector.receipt_ns)
+        self._busy_s += (t - t0) / 1e9
+        self._samples += 1
+
+        if self._collector.transport_lag_ms is not None:
+            self._transport_lags.add(self._collector.transport_lag_ms)
+
+    def _report(self, elapsed_s: float, samples: int, busy_s: float, total: bool = False) -> None:
+        print(
+            f"{'Total' if total else 'Stats'}: {samples / elapsed_s if elapsed_s > 0 else 0:.1f} samples/s, "
+            f"{busy_s / samples * 1e6 if samples > 0 else 0:.1f} us/sample, "
+            f"pipeline busy {busy_s / elapsed_s * 100 if elapsed_s > 0 else 0:.2f}%, "
+            f"{self._samples} samples, {self._detections} detections "
+            f"({self._provisional_detections} provisional, {self._cancelled_detections} cancelled, "
+            f"{self._sink.dropped} events dropped by the sink), "
+            f"RSS {rss_mb():.1f} MB"
+        )
+
+        if self._collector.clock is Collector.NO_CLOCK:
+            return
+
+        # Latencies of the interval since the previous report, also for the total, cumulative ones are in /metrics
+        print(
+            f"  {'since the last report: ' if total else ''}transport lag {self._transport_lags.summary()}\n"
+            f"  flush delay {self._flush_delays.summary()}\n"
+            f"  decision latency {self._decision_latencies.summary()}, "
+            f"{self._late_detections} over the {DECISION_LATENCY_BUDGET_MS} ms budget"
+        )
+
+    # ----------------------------- Mediator handlers ---------------------------- #
+
+    @overrides
+    def handle_toggle_profiling(self) -> None:
+        self._profiler.toggle()
+
+    @overrides
+    def handle_provisional_bicycle(self, estimate: VelocityEstimate) -> None:
+        PROVISIONAL_BICYCLES.inc()
+        self._provisional_detections += 1
+        self._sink.emit_event(provisional_event(estimate, self._collector.event_time_ms(self._collector.timestamp_ms)))
+
+    @overrides
+    def handle_provisional_cancelled(self, cancellation: Cancellation) -> None:
+        PROVISIONAL_CANCELLED.inc()
+        self._cancelled_detections += 1
+        self._sink.emit_event(
+            cancelled_event(cancellation, self._collector.event_time_ms(self._collector.timestamp_ms))
+        )
+
+    @overrides
+    def handle_signal_bicycle(self, motion: Motion) -> None:
+        BICYCLES.inc()
+        SIGNAL.since(self._collector.receipt_ns)
+        self._detections += 1
+        self._sink.emit(motion, self._collector.event_time_ms(self._collector.timestamp_ms))
+
+        latency_ms = self._collector.latency_ms(motion.time_end)
+        if latency_ms is not None:
+            DECISION_LATENCY.observe_ns(int(latency_ms * 1e6))
+            self._decision_latencies.add(latency_ms)
+            self._flush_delays.add(self._collector.timestamp_ms - motion.time_end)
+            if latency_ms > DECISION_LATENCY_BUDGET_MS:
+                LATE_BICYCLES.inc()
+                self._late_detections += 1
@@ -1,7 +1,16 @@
+import time
+
+# Startup time reported in headless mode
+_START = time.perf_counter()
+
 from csv_collector import CSVCollector
 from tcp_collector import TCPCollector
+from simulated_collector import SimulatedCollector
+from collector import Collector
 
-from controller import Controller
+from velocity_model import VelocityModel
+from sink import SINKS, create_sink
+from metrics import MetricsServer
 
 import argparse
 
@@ -12,12 +21,19 @@ def parse_args() -> argparse.Namespace:
     group.add_argument(
         "--tcp",
         type=str,
-        help="ip:port of the tmf8828 tcp server",
+        nargs="+",
+        help="ip:port of the tmf8828 tcp server, one per sensor",
     )
     group.add_argument(
         "--csv",
         type=str,
-        help="path to tmf8828 csv file",
+        nargs="+",
+        help="path to tmf8828 csv file, one per sensor",
+    )
+    group.add_argument(
+        "--sim",
+        action="store_true",
+        help="stream frames from the sensor simulation (tools/sensor_model.py)",
     )
     parser.add_argument(
         "--live-mode",
@@ -29,34 +45,247 @@ def parse_args() -> argparse.Namespace:
         "--start-time",
         type=int,
         default=0,
-        help="Epoch timestamp in milliseconds to start reading from (only for csv files)",
+        help="Epoch timestamp in milliseconds to start reading csv files from, or of the first simulated frame",
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        help="Replay speed of csv files and the simulation: 1 real time, N times faster, 0 as fast as possible "
+        "(default: real time with --live-mode and --sim, as fast as possible for csv files otherwise)",
+    )
+    parser.add_argument(
+        "--sim-sensors",
+        type=int,
+        default=1,
+        help="Number of independently simulated sensors",
+    )
+    parser.add_argument(
+        "--sim-rate",
+        type=float,
+        help="Simulated frames dispatched per second, 0 for as fast as possible (default is the sensor frame rate)",
+    )
+    parser.add_argument(
+        "--sim-frame-period",
+        type=float,
+        default=33,
+        help="Simulated sensor frame period in ms, spacing of the frame timestamps",
+    )
+    parser.add_argument(
+        "--sim-arrivals",
+        type=float,
+        default=10,
+        help="Mean number of simulated objects per minute",
+    )
+    parser.add_argument(
+        "--sim-bike-ratio",
+        type=float,
+        default=0.5,
+        help="Fraction of simulated objects that are bicycles",
+    )
+    parser.add_argument(
+        "--sim-bike-speed",
+        type=float,
+        nargs=2,
+        default=[10, 30],
+        metavar=("MIN", "MAX"),
+        help="Simulated bicycle velocity range in km/h",
+    )
+    parser.add_argument(
+        "--sim-pedestrian-speed",
+        type=float,
+        nargs=2,
+        default=[3, 6],
+        metavar=("MIN", "MAX"),
+        help="Simulated pedestrian velocity range in km/h",
+    )
+    parser.add_argument(
+        "--sim-max-lag",
+        type=float,
+        help="Drop simulated frames dispatched later than this many ms (default: never drop)",
+    )
+    parser.add_argument(
+        "--sim-seed",
+        type=int,
+        help="Random seed of the simulation",
+    )
+    parser.add_argument(
+        "--velocity-model",
+        type=str,
+        help="path to velocity model saved by detection/linear_regression_approach.py (.npz or .joblib)",
+    )
+    parser.add_argument(
+        "--provisional",
+        action="store_true",
+        help="also report bicycles as soon as a streaming velocity estimate is confident, before the motion ends",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="run without the GUI (matplotlib is not imported), until SIGINT/SIGTERM",
+    )
+    parser.add_argument(
+        "--sink",
+        type=str,
+        choices=SINKS,
+        default="print",
+        help="where detections are reported",
+    )
+    parser.add_argument(
+        "--sink-target",
+        type=str,
+        help="file path for jsonl, host:port for udp, socket path for unix sinks",
+    )
+    parser.add_argument(
+        "--stats-interval",
+        type=float,
+        default=10,
+        help="seconds between throughput stats in headless mode and stage utilization stats with the GUI",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="serve pipeline metrics in Prometheus text format on this local port (default: disabled)",
+    )
+    parser.add_argument(
+        "--profile-window",
+        type=float,
+        default=30,
+        help="seconds profiled after shift+p in the GUI or SIGUSR1, profiles are written to --profile-dir",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        type=str,
+        default=".",
+        help="directory of the profile-<time>.txt/.prof files",
+    )
+    parser.add_argument(
+        "--run-for",
+        type=float,
+        help="stop headless mode after this many seconds (default: run until a signal)",
     )
     args = parser.parse_args()
+
+    if args.sink in ["jsonl", "udp", "unix"] and not args.sink_target:
+        parser.error(f"--sink {args.sink} requires --sink-target")
+
+    num_sensors = len(args.tcp or args.csv or []) or args.sim_sensors
+    if num_sensors > 1 and not args.headless:
+        parser.error("multiple sensors are only supported with --headless")
+
     return args
 
 
-def main():
-    args = parse_args()
+def create_collectors(args: argparse.Namespace) -> list[Collector]:
+    """One collector per sensor, the index of a collector is the id of its sensor."""
+    collectors = []
 
-    if args.csv:
-        file_path = args.csv
+    for file_path in args.csv or []:
         print(f"Reading from CSV file: {file_path}")
-        collector = CSVCollector(
-            file_path=file_path,
-            live_mode=args.live_mode,
-            start_time_ms=args.start_time,
+        collectors.append(
+            CSVCollector(
+                file_path=file_path,
+                live_mode=args.live_mode,
+                start_time_ms=args.start_time,
+                speed=args.speed,
+            )
         )
 
-    elif args.tcp:
-        host, port_str = args.tcp.split(":")
+    for address in args.tcp or []:
+        host, port_str = address.split(":")
         port = int(port_str)
         print(f"Connecting to TCP server at {host}:{port}")
-        collector = TCPCollector(
-            host=host,
-            port=port,
+        collectors.append(
+            TCPCollector(
+                host=host,
+                port=port,
+            )
         )
 
-    controller = Controller(collector)
+    if args.sim:
+        print("Streaming simulated sensor data")
+        for sensor_id in range(args.sim_sensors):
+            collector = SimulatedCollector(
+                frame_period_ms=args.sim_frame_period,
+                rate_hz=args.sim_rate,
+                arrivals_per_min=args.sim_arrivals,
+                bike_ratio=args.sim_bike_ratio,
+                bike_speed_kmh=args.sim_bike_speed,
+                pedestrian_speed_kmh=args.sim_pedestrian_speed,
+                max_lag_ms=args.sim_max_lag,
+                seed=args.sim_seed + sensor_id if args.sim_seed is not None else None,
+                speed=args.speed,
+                start_ms=args.start_time or None,
+            )
+            prefix = f"[sensor {sensor_id}] " if args.sim_sensors > 1 else ""
+            collector.subscribe_ground_truth(
+                lambda gt, prefix=prefix: print(
+                    f"{prefix}Ground truth: {gt['kind']} {'approaching' if gt['direction'] == 1 else 'moving away'} "
+                    f"{gt['velocity_kmh']:.2f} kmh"
+                )
+            )
+            collectors.append(collector)
+
+    return collectors
+
+
+def main():
+    args = parse_args()
+    collectors = create_collectors(args)
+
+    sink = create_sink(args.sink, args.sink_target)
+
+    if args.metrics_port is not None:
+        MetricsServer(args.metrics_port).start()
+
+    # Detector processes load the velocity model themselves
+    if len(collectors) > 1:
+        from multi_sensor import MultiSensorController
+
+        controller = MultiSensorController(
+            collectors,
+            sink,
+            velocity_model_path=args.velocity_model,
+            stats_interval_s=args.stats_interval,
+            provisional=args.provisional,
+        )
+        print(f"Started {len(collectors)} sensors in {(time.perf_counter() - _START) * 1000:.0f} ms")
+        controller.start(run_for_s=args.run_for)
+        return
+
+    collector = collectors[0]
+    velocity_model = None
+    if args.velocity_model:
+        print(f"Loading velocity model: {args.velocity_model}")
+        velocity_model = VelocityModel(args.velocity_model)
+
+    if args.headless:
+        from headless_controller import HeadlessController, rss_mb
+
+        controller = HeadlessController(
+            collector,
+            sink,
+            velocity_model=velocity_model,
+            stats_interval_s=args.stats_interval,
+            profile_window_s=args.profile_window,
+            profile_dir=args.profile_dir,
+            provisional=args.provisional,
+        )
+        print(f"Started headless in {(time.perf_counter() - _START) * 1000:.0f} ms, RSS {rss_mb():.1f} MB")
+        controller.start(run_for_s=args.run_for)
+        return
+
+    # Imports matplotlib, only needed with the GUI
+    from controller import Controller
+
+    controller = Controller(
+        collector,
+        velocity_model=velocity_model,
+        sink=sink,
+        profile_window_s=args.profile_window,
+        profile_dir=args.profile_dir,
+        stats_interval_s=args.stats_interval,
+        provisional=args.provisional,
+    )
     controller.start()
 
 
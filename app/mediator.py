@@ -1,5 +1,6 @@
 from motion import Motion
 from strategy import Strategy
+from velocity_estimator import VelocityEstimate, Cancellation
 
 from abc import ABC
 
@@ -9,6 +10,10 @@ class Mediator(ABC):
         print("Mediator: Seek event not implemented")
         pass
 
+    def handle_seek_to_timestamp(self, timestamp_ms: int) -> None:
+        print("Mediator: Seek to timestamp event not implemented")
+        pass
+
     def handle_rewind(self) -> None:
         print("Mediator: Rewind event not implemented")
         pass
@@ -21,10 +26,14 @@ class Mediator(ABC):
         print("Mediator: Reset event not implemented")
         pass
 
-    def handle_gui_update(self, n_seconds: int) -> None:
+    def handle_gui_update(self, n_seconds: int, force: bool = False) -> None:
         print("Mediator: GUI update event not implemented")
         pass
 
+    def handle_overview_update(self, columns: int) -> None:
+        print("Mediator: Overview update event not implemented")
+        pass
+
     def handle_rewind_to_next_motion(self, direction: int = 1) -> None:
         print("Mediator: Rewind to next motion event not implemented")
         pass
@@ -36,3 +45,15 @@ class Mediator(ABC):
     def handle_signal_bicycle(self, motion: Motion) -> None:
         print("Mediator: Signal bicycle event not implemented")
         pass
+
+    def handle_provisional_bicycle(self, estimate: VelocityEstimate) -> None:
+        print("Mediator: Provisional bicycle event not implemented")
+        pass
+
+    def handle_provisional_cancelled(self, cancellation: Cancellation) -> None:
+        print("Mediator: Provisional cancelled event not implemented")
+        pass
+
+    def handle_toggle_profiling(self) -> None:
+        print("Mediator: Toggle profiling event not implemented")
+        pass
@@ -0,0 +1,234 @@
+"""
+Lightweight pipeline instrumentation: counters, latency histograms and a Prometheus text exporter.
+
+Updates are plain integer increments without locks. Every metric is written by a single thread (the collector
+thread for the live pipeline, the collectors of several sensors each write their own sensor labelled metrics),
+the exporter reads them concurrently and may see a scrape that is one update behind, which Prometheus tolerates.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import threading
+import numpy as np
+
+from time import perf_counter_ns
+
+
+# Histogram buckets are powers of two of microseconds: le 1us, 2us, 4us, ..., ~8.4s
+NUM_BUCKETS = 24
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Optional[dict] = None) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.value = 0
+
+    def inc(self, n: int = 1) -> None:
+        self.value += n
+
+
+class Histogram:
+    """Latency histogram with O(1) observe: the bucket index is the bit length of the latency in microseconds."""
+
+    def __init__(self, name: str, help: str, labels: Optional[dict] = None) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.counts = [0] * (NUM_BUCKETS + 1)  # last bucket is +Inf
+        self.sum_ns = 0
+
+    def observe_ns(self, duration_ns: int) -> None:
+        index = (duration_ns // 1000).bit_length() if duration_ns > 0 else 0
+        self.counts[index if index < NUM_BUCKETS else NUM_BUCKETS] += 1
+        self.sum_ns += duration_ns
+
+    def since(self, start_ns: int) -> int:
+        """Observes the time elapsed since start_ns, returns the current time to chain stages."""
+        # Inlined observe_ns, this runs several times per frame
+        now = perf_counter_ns()
+        duration_ns = now - start_ns
+        index = (duration_ns // 1000).bit_length() if duration_ns > 0 else 0
+        self.counts[index if index < NUM_BUCKETS else NUM_BUCKETS] += 1
+        self.sum_ns += duration_ns
+        return now
+
+    def percentile(self, p: float) -> float:
+        """Upper bound in seconds of the bucket containing the p-th percentile, 0 if empty."""
+        counts = list(self.counts)
+        total = sum(counts)
+        if total == 0:
+            return 0.0
+
+        cumulative = 0
+        for index, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= total * p / 100:
+                return _bucket_bound_s(index)
+
+        return float("inf")
+
+
+class LatencyWindow:
+    """Raw latencies of one reporting interval, for exact percentiles in logs (histograms keep bucket bounds)."""
+
+    def __init__(self) -> None:
+        self._values: list[float] = []
+
+    def add(self, value_ms: float) -> None:
+        self._values.append(value_ms)
+
+    def summary(self) -> str:
+        """p50/p99/max of the values added since the last summary, then starts a new interval."""
+        values, self._values = self._values, []
+        if len(values) == 0:
+            return "n/a"
+
+        values = np.array(values)
+        return (
+            f"p50 {np.percentile(values, 50):.1f} ms, p99 {np.percentile(values, 99):.1f} ms, "
+            f"max {values.max():.1f} ms ({len(values)})"
+        )
+
+
+def _bucket_bound_s(index: int) -> float:
+    return (2**index) / 1e6 if index < NUM_BUCKETS else float("inf")
+
+
+def _format_labels(labels: dict) -> str:
+    if len(labels) == 0:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()  # Only guards registration, never updates
+        self._metrics: dict[tuple, Counter | Histogram] = {}
+
+    def counter(self, name: str, help: str, **labels) -> Counter:
+        return self._register(Counter, name, help, labels)
+
+    def histogram(self, name: str, help: str, **labels) -> Histogram:
+        return self._register(Histogram, name, help, labels)
+
+    def _register(self, kind: type, name: str, help: str, labels: dict):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._metrics:
+                self._metrics[key] = kind(name, help, labels)
+            metric = self._metrics[key]
+
+        if not isinstance(metric, kind):
+            raise ValueError(f"Metric {name} is already registered as {type(metric).__name__}")
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+        lines = []
+        described = set()
+        for metric in metrics:
+            # Counters are declared and exposed with the _total suffix, like client_python does
+            family = f"{metric.name}_total" if isinstance(metric, Counter) else metric.name
+            if family not in described:
+                kind = "counter" if isinstance(metric, Counter) else "histogram"
+                lines.append(f"# HELP {family} {metric.help}")
+                lines.append(f"# TYPE {family} {kind}")
+                described.add(family)
+
+            if isinstance(metric, Counter):
+                lines.append(f"{family}{_format_labels(metric.labels)} {metric.value}")
+                continue
+
+            counts = list(metric.counts)
+            cumulative = 0
+            for index, count in enumerate(counts):
+                cumulative += count
+                le = "+Inf" if index == NUM_BUCKETS else f"{_bucket_bound_s(index):.6g}"
+                lines.append(f"{metric.name}_bucket{_format_labels({**metric.labels, 'le': le})} {cumulative}")
+            lines.append(f"{metric.name}_sum{_format_labels(metric.labels)} {metric.sum_ns / 1e9:.9f}")
+            lines.append(f"{metric.name}_count{_format_labels(metric.labels)} {cumulative}")
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ------------------------------ PIPELINE METRICS ---------------------------- #
+
+FRAMES = REGISTRY.counter("tof_frames", "Frames received by the collector")
+DROPPED_FRAMES = REGISTRY.counter("tof_dropped_frames", "Frames dropped before reaching the pipeline")
+SERIES = REGISTRY.counter("tof_series", "Monotonic series detected")
+MOTIONS = REGISTRY.counter("tof_motions", "Motions flushed by the detector")
+BICYCLES = REGISTRY.counter("tof_bicycles", "Bicycle detections signalled")
+DROPPED_EVENTS = REGISTRY.counter("tof_dropped_events", "Detection events dropped by a full sink queue")
+PROVISIONAL_BICYCLES = REGISTRY.counter("tof_provisional_bicycles", "Bicycles signalled before the motion flush")
+PROVISIONAL_CANCELLED = REGISTRY.counter("tof_provisional_cancelled", "Provisional bicycles not confirmed by a motion")
+LATE_BICYCLES = REGISTRY.counter("tof_late_bicycles", "Bicycle detections signalled later than the latency budget")
+
+STAGE_HELP = "Time spent in each pipeline stage of a frame"
+STAGE_COLLECTOR = REGISTRY.histogram("tof_stage_seconds", STAGE_HELP, stage="collector")
+STAGE_BUFFER = REGISTRY.histogram("tof_stage_seconds", STAGE_HELP, stage="buffer")
+STAGE_TRANSFORM = REGISTRY.histogram("tof_stage_seconds", STAGE_HELP, stage="transform")
+STAGE_DETECT = REGISTRY.histogram("tof_stage_seconds", STAGE_HELP, stage="detect")
+
+END_TO_END = REGISTRY.histogram("tof_frame_seconds", "Time from frame receipt to the end of detection")
+SIGNAL = REGISTRY.histogram("tof_signal_seconds", "Time from receipt of the frame that flushed a motion to its signal")
+
+# Sensor timestamp based latencies, see Collector.latency_ms()
+TRANSPORT_LAG = REGISTRY.histogram("tof_transport_lag_seconds", "Time from the sensor timestamp to frame receipt")
+FLUSH_DELAY = REGISTRY.histogram(
+    "tof_flush_delay_seconds", "Sensor time from the last sample of a motion to the sample that flushed it"
+)
+DECISION_LATENCY = REGISTRY.histogram(
+    "tof_decision_latency_seconds", "Time from the last sample of a bicycle motion to its signal"
+)
+
+
+# --------------------------------- EXPORTER --------------------------------- #
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self) -> None:
+        if self.path not in ["/", "/metrics"]:
+            self.send_error(404)
+            return
+
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class MetricsServer:
+    """Serves the registry in Prometheus text format on http://host:port/metrics from a daemon thread."""
+
+    def __init__(self, port: int, host: str = "127.0.0.1", registry: Registry = REGISTRY) -> None:
+        handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> None:
+        self._thread.start()
+        print(f"Serving metrics on http://{self._server.server_address[0]}:{self.port}/metrics")
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
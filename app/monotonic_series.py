@@ -1,49 +1,90 @@
 from config import DIST_TO_PATH
-from typing import Tuple
+from typing import Tuple, Union
 import numpy as np
 
 
 class MonotonicSeries:
-    def __init__(self, samples: list[Tuple[int, int]]) -> None:
+    """Immutable series of (timestamp, distance) samples, shared between threads without copying.
+
+    Samples are kept in a read-only (n, 2) int64 array, available as `samples`.
+    """
+
+    __slots__ = (
+        "_samples",
+        "time_start",
+        "time_end",
+        "time_total",
+        "dist_start",
+        "dist_end",
+        "dist_avg",
+        "direction",
+        "velocity",
+    )
+
+    def __init__(self, samples: Union[list[Tuple[int, int]], np.ndarray]) -> None:
+        samples = np.array(samples, dtype=np.int64).reshape(-1, 2)
+        samples.flags.writeable = False
         self._validate_monotonicity(samples)
-        self._samples = samples
 
-        self.time_start = samples[0][0]
-        self.time_end = samples[-1][0]
-        self.time_total = self.time_end - self.time_start
+        timestamps, distances = samples[:, 0], samples[:, 1]
+        dist_start, dist_end = int(distances[0]), int(distances[-1])
 
-        self.dist_start = samples[0][1]
-        self.dist_end = samples[-1][1]
-        self.dist_avg = sum(dist for _, dist in samples) / len(samples)
+        freeze(
+            self,
+            _samples=samples,
+            time_start=int(timestamps[0]),
+            time_end=int(timestamps[-1]),
+            time_total=int(timestamps[-1] - timestamps[0]),
+            dist_start=dist_start,
+            dist_end=dist_end,
+            dist_avg=float(distances.mean()),
+            direction=-1 if dist_start < dist_end else 1,
+            velocity=self._calculate_avg_velocity(samples),
+        )
 
-        self.direction = -1 if self.dist_start < self.dist_end else 1
-        self.velocity = self._calculate_avg_velocity()
+    @property
+    def samples(self) -> np.ndarray:
+        return self._samples
 
     def __len__(self) -> int:
         return len(self._samples)
 
-    def _validate_monotonicity(self, samples: list[Tuple[int, int]]) -> None:
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __copy__(self) -> "MonotonicSeries":
+        return self
+
+    def __deepcopy__(self, memo: dict) -> "MonotonicSeries":
+        return self
+
+    def _validate_monotonicity(self, samples: np.ndarray) -> None:
         assert len(samples) >= 2
 
-        prev_direction = samples[1] > samples[0]
-        for i in range(1, len(samples)):
-            direction = samples[i] > samples[i - 1]
-            assert prev_direction == direction
+        # Lexicographic comparison of consecutive (timestamp, distance) samples
+        t, d = samples[:, 0], samples[:, 1]
+        increasing = (t[1:] > t[:-1]) | ((t[1:] == t[:-1]) & (d[1:] > d[:-1]))
+        assert (increasing == increasing[0]).all()
+
+    @staticmethod
+    def _calculate_avg_velocity(samples: np.ndarray) -> float:
+        t1, d1 = samples[:-1, 0], samples[:-1, 1]
+        t2, d2 = samples[1:, 0], samples[1:, 1]
+
+        dt = t2 - t1
+        dd = d2 - d1
 
-    def _calculate_avg_velocity(self) -> float:
-        velocities = []
-        for i in range(1, len(self._samples)):
-            t1, d1 = self._samples[i - 1]
-            t2, d2 = self._samples[i]
+        valid = (dt != 0) & (d2**2 - DIST_TO_PATH**2 > 0)
+        if not valid.all():
+            print(f"WARNING: Zero division would occur, skipping {np.sum(~valid)} samples")
 
-            dt = t2 - t1
-            dd = d2 - d1
+        d2, dd, dt = d2[valid], dd[valid], dt[valid]
+        velocities = d2 / np.sqrt(d2**2 - DIST_TO_PATH**2) * dd / dt * 3.6
 
-            if (dt == 0) or (d2**2 - DIST_TO_PATH**2 <= 0):
-                print("WARNING: Zero division would occur, skipping sample")
-                continue
+        return abs(float(sum(velocities.tolist())) / len(velocities)) if len(velocities) != 0 else 0
 
-            velocity = d2 / np.sqrt(d2**2 - DIST_TO_PATH**2) * dd / dt * 3.6
-            velocities.append(velocity)
 
-        return abs(sum(velocities) / len(velocities)) if len(velocities) != 0 else 0
+def freeze(instance: object, **fields) -> None:
+    """Sets the fields of an immutable instance, only called while constructing it."""
+    for name, value in fields.items():
+        object.__setattr__(instance, name, value)
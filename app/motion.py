@@ -1,25 +1,67 @@
-from monotonic_series import MonotonicSeries
+from monotonic_series import MonotonicSeries, freeze
 
 
 class Motion:
+    """Immutable summary of consecutive monotonic series, shared between threads without copying."""
+
+    __slots__ = (
+        "series",
+        "num_series",
+        "num_samples_total",
+        "time_start",
+        "time_end",
+        "time_total",
+        "dist_start",
+        "dist_end",
+        "dist_avg",
+        "direction",
+        "velocity",
+        "track_id",
+    )
+
     def __init__(self, series: list[MonotonicSeries], max_time_delta_ms: int) -> None:
         self._validate_series(series, max_time_delta_ms)
-        series = self._filter_opposite_directions(series)
-        self._monotonic_series = series
+        series = tuple(self._filter_opposite_directions(series))
+
+        time_start = series[0].time_start
+        time_end = series[-1].time_end
+
+        freeze(
+            self,
+            series=series,
+            num_series=len(series),
+            num_samples_total=sum(len(series) for series in series),
+            time_start=time_start,
+            time_end=time_end,
+            time_total=time_end - time_start,
+            dist_start=series[0].dist_start,
+            dist_end=series[-1].dist_end,
+            dist_avg=sum(series.dist_avg for series in series) / len(series),
+            direction=series[0].direction,
+            velocity=sum(series.velocity for series in series) / len(series),
+            track_id=-1,
+        )
+
+    def with_velocity(self, velocity: float) -> "Motion":
+        """Copy sharing the series, with the velocity replaced (e.g. by a velocity model prediction)."""
+        motion = object.__new__(Motion)
+        freeze(motion, **{**{name: getattr(self, name) for name in Motion.__slots__}, "velocity": velocity})
+        return motion
 
-        self.num_series = len(series)
-        self.num_samples_total = sum(len(series) for series in series)
+    def with_track_id(self, track_id: int) -> "Motion":
+        """Copy sharing the series, with the id that pairs it with its provisional detection."""
+        motion = object.__new__(Motion)
+        freeze(motion, **{**{name: getattr(self, name) for name in Motion.__slots__}, "track_id": track_id})
+        return motion
 
-        self.time_start = series[0].time_start
-        self.time_end = series[-1].time_end
-        self.time_total = self.time_end - self.time_start
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
 
-        self.dist_start = series[0].dist_start
-        self.dist_end = series[-1].dist_end
-        self.dist_avg = sum(series.dist_avg for series in series) / len(series)
+    def __copy__(self) -> "Motion":
+        return self
 
-        self.direction = series[0].direction
-        self.velocity = sum(series.velocity for series in series) / len(series)
+    def __deepcopy__(self, memo: dict) -> "Motion":
+        return self
 
     def _filter_opposite_directions(self, series: list[MonotonicSeries]) -> list[MonotonicSeries]:
         longest_series = max(series, key=lambda s: len(s))
@@ -0,0 +1,389 @@
+"""
+Several sensor streams in one controller process.
+
+The collector thread of every sensor writes raw frames into a shared memory ring, and a detector process per
+sensor reads them in batches. No frame is pickled and the detectors of different sensors do not share a GIL.
+Detections come back as events tagged with the sensor id and are merged into a single sink. When every stream
+is a replay, events are stamped with their frame time and merged in frame time order, so a recording gives the
+same output on every run.
+"""
+
+from collector import Collector
+from detector import Detector
+from mediator import Mediator
+from motion import Motion
+from sink import Sink, motion_event, provisional_event, cancelled_event
+from strategy import Strategy, TargetZeroStrategy, ConfidenceStrategy
+from velocity_model import VelocityModel
+from velocity_estimator import VelocityEstimate, Cancellation
+from metrics import BICYCLES, DECISION_LATENCY, LATE_BICYCLES, PROVISIONAL_BICYCLES, PROVISIONAL_CANCELLED
+from config import COLUMNS, DECISION_LATENCY_BUDGET_MS
+
+from multiprocessing import shared_memory
+from overrides import overrides
+from typing import Optional
+
+import multiprocessing as mp
+import numpy as np
+import heapq
+import signal
+import threading
+import time
+
+
+# ----------------------------------- RING ----------------------------------- #
+
+
+class SharedRing:
+    """Single producer, single consumer ring of raw frames in shared memory, the buffer of one sensor stream.
+
+    The header holds counters with a single writer each: frames written (producer), frames read, frames skipped
+    because the reader fell a whole ring behind and busy time of the reader (consumer). The write counter is
+    only advanced after the frame is stored, and the reader checks it again after copying, seqlock style, to drop
+    frames the producer overwrote meanwhile.
+
+    Memory ordering: the reader relies on the producer's row stores becoming visible to the other process before
+    its store of the write counter, and on its own loads not being reordered across them. CPython exposes no
+    fences, so this holds on x86 (TSO), where stores and loads are not reordered with each other, but is not
+    guaranteed on weakly ordered CPUs such as the ARM sensor host. There the rows must be published through a
+    synchronizing primitive (e.g. a multiprocessing.Lock around write and read) instead.
+    """
+
+    WRITTEN, READ, SKIPPED, BUSY_NS = range(4)
+    HEADER_SIZE = 4
+
+    def __init__(self, capacity: int, name: Optional[str] = None) -> None:
+        size = (SharedRing.HEADER_SIZE + capacity * len(COLUMNS)) * np.dtype(np.int64).itemsize
+        self._shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self._owner = name is None
+        self.capacity = capacity
+
+        self.header = np.ndarray((SharedRing.HEADER_SIZE,), dtype=np.int64, buffer=self._shm.buf)
+        self._rows = np.ndarray(
+            (capacity, len(COLUMNS)),
+            dtype=np.int64,
+            buffer=self._shm.buf,
+            offset=SharedRing.HEADER_SIZE * np.dtype(np.int64).itemsize,
+        )
+        if self._owner:
+            self.header[:] = 0
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def write(self, sample: Collector.DataSample) -> None:
+        written = int(self.header[SharedRing.WRITTEN])
+        self._rows[written % self.capacity] = sample
+        self.header[SharedRing.WRITTEN] = written + 1
+
+    def read(self, start: int, max_rows: int) -> tuple[np.ndarray, int]:
+        """Copy of up to max_rows frames from frame number start on, and the number of the next frame to read."""
+        # The slot of frame written - capacity is the one the producer may be overwriting right now
+        written = int(self.header[SharedRing.WRITTEN])
+        start = self._skip_overwritten(start, written)
+
+        end = min(written, start + max_rows)
+        first, last = start % self.capacity, end % self.capacity
+        if first < last or start == end:
+            rows = self._rows[first:last].copy()
+        else:
+            rows = np.concatenate((self._rows[first:], self._rows[:last]))
+
+        # Frames overwritten while they were copied are torn, drop them
+        valid_start = self._skip_overwritten(start, int(self.header[SharedRing.WRITTEN]))
+        rows = rows[min(valid_start, end) - start :]
+
+        return rows, max(end, valid_start)
+
+    def _skip_overwritten(self, start: int, written: int) -> int:
+        oldest_intact = written - self.capacity + 1
+        if start < oldest_intact:
+            self.header[SharedRing.SKIPPED] += oldest_intact - start
+            return oldest_intact
+        return start
+
+    def close(self) -> None:
+        # Views must go before the mapping can be closed
+        del self.header, self._rows
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+# ------------------------------ DETECTOR PROCESS ---------------------------- #
+
+
+# Event sent after every batch of a replayed stream, all its events up to time_ms have been sent before it
+_PROGRESS = "progress"
+
+
+class _EventMediator(Mediator):
+    def __init__(self, sensor_id: int, events: mp.Queue, replay: bool) -> None:
+        self._sensor_id = sensor_id
+        self._events = events
+        self._replay = replay
+        self.detector: Optional[Detector] = None
+
+    def _timestamp_ms(self) -> Optional[int]:
+        # Replays are stamped with the frame time, see Collector.event_time_ms(), live streams with the wall clock
+        return int(self.detector.now_ms) if self._replay else None
+
+    @overrides
+    def handle_signal_bicycle(self, motion: Motion) -> None:
+        self._events.put({**motion_event(motion, self._timestamp_ms()), "sensor": self._sensor_id})
+
+    @overrides
+    def handle_provisional_bicycle(self, estimate: VelocityEstimate) -> None:
+        self._events.put({**provisional_event(estimate, self._timestamp_ms()), "sensor": self._sensor_id})
+
+    @overrides
+    def handle_provisional_cancelled(self, cancellation: Cancellation) -> None:
+        self._events.put({**cancelled_event(cancellation, self._timestamp_ms()), "sensor": self._sensor_id})
+
+
+def detect_stream(
+    sensor_id: int,
+    ring_name: str,
+    capacity: int,
+    strategy: Strategy,
+    velocity_model_path: Optional[str],
+    events: mp.Queue,
+    stop: mp.Event,
+    batch_size: int,
+    poll_interval_s: float,
+    provisional: bool = False,
+    replay: bool = False,
+) -> None:
+    """Detector process of one sensor, transforms whole batches of frames and feeds them to its own Detector."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The controller stops the detectors
+
+    ring = SharedRing(capacity, name=ring_name)
+    transform = (ConfidenceStrategy() if strategy == "confidence" else TargetZeroStrategy()).transform
+    velocity_model = VelocityModel(velocity_model_path) if velocity_model_path else None
+    mediator = _EventMediator(sensor_id, events, replay)
+    detector = Detector(mediator=mediator, velocity_model=velocity_model, provisional=provisional)
+    mediator.detector = detector
+
+    position = int(ring.header[SharedRing.READ])
+    while True:
+        # Drain the ring once more after stop, frames written before it are still detected
+        stopping = stop.is_set()
+        rows, position = ring.read(position, batch_size)
+
+        if len(rows) == 0:
+            if stopping:
+                break
+            time.sleep(poll_interval_s)
+            continue
+
+        start = time.perf_counter_ns()
+        for sample in transform(rows):
+            detector.append_sample(sample)
+        ring.header[SharedRing.BUSY_NS] += time.perf_counter_ns() - start
+        ring.header[SharedRing.READ] = position
+        if replay:
+            events.put({"event": _PROGRESS, "sensor": sensor_id, "time_ms": int(detector.now_ms)})
+
+    ring.close()
+
+
+# -------------------------------- CONTROLLER -------------------------------- #
+
+
+class MultiSensorController:
+    """Headless controller of several sensors, detector processes are started on start() and stopped on exit.
+
+    Each collector feeds its own ring and detector process, events of all sensors are merged into the sink on
+    a single thread, with the sensor id (index of the collector) in the "sensor" field. If all collectors are
+    replays, events are held back until every detector has passed their frame time and are emitted ordered by
+    (timestamp, sensor), and the controller stops once every replay has ended and its ring is drained.
+    """
+
+    def __init__(
+        self,
+        collectors: list[Collector],
+        sink: Sink,
+        strategy: Strategy = "target_0",
+        velocity_model_path: Optional[str] = None,
+        stats_interval_s: float = 10,
+        capacity: int = 2**16,
+        batch_size: int = 1024,
+        poll_interval_s: float = 0.002,
+        provisional: bool = False,
+    ) -> None:
+        self._collectors = collectors
+        self._sink = sink
+        self._stats_interval_s = stats_interval_s
+
+        self._replay = all(collector.virtual_clock is not None for collector in collectors)
+        self._replays_running = len(collectors)
+        self._replays_lock = threading.Lock()
+
+        self._rings = [SharedRing(capacity) for _ in collectors]
+        self._events: mp.Queue = mp.Queue()
+        self._stop_detectors = mp.Event()
+        self._processes = [
+            mp.Process(
+                target=detect_stream,
+                args=(
+                    sensor_id,
+                    ring.name,
+                    capacity,
+                    strategy,
+                    velocity_model_path,
+                    self._events,
+                    self._stop_detectors,
+                    batch_size,
+                    poll_interval_s,
+                    provisional,
+                    self._replay,
+                ),
+                name=f"detector-{sensor_id}",
+                daemon=True,
+            )
+            for sensor_id, ring in enumerate(self._rings)
+        ]
+
+        self._stop_event = threading.Event()
+        self._merger = threading.Thread(target=self._merge_events, daemon=True)
+        self._detections = [0] * len(collectors)
+
+    def start(self, run_for_s: Optional[float] = None) -> None:
+        signal.signal(signal.SIGINT, self._handle_stop_signal)
+        signal.signal(signal.SIGTERM, self._handle_stop_signal)
+
+        for process in self._processes:
+            process.start()
+        self._merger.start()
+
+        for sensor_id, (collector, ring) in enumerate(zip(self._collectors, self._rings)):
+            collector.use_sensor_metrics(sensor_id)
+            collector.subscribe(ring.write)
+            if self._replay:
+                collector.subscribe_end(self._handle_replay_end)
+            collector.start()
+
+        start = time.perf_counter()
+        deadline = start + run_for_s if run_for_s is not None else None
+        last_report, last_header = start, [ring.header.copy() for ring in self._rings]
+
+        while not self._stop_event.is_set():
+            timeout = self._stats_interval_s
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.perf_counter())
+                if timeout <= 0:
+                    break
+
+            if self._stop_event.wait(timeout):
+                break
+
+            now = time.perf_counter()
+            if now - last_report >= self._stats_interval_s:
+                header = [ring.header.copy() for ring in self._rings]
+                self._report(now - last_report, last_header, header)
+                last_report, last_header = now, header
+
+        self._stop(time.perf_counter() - start)
+
+    def _stop(self, elapsed_s: float) -> None:
+        for collector in self._collectors:
+            collector.stop()
+
+        self._stop_detectors.set()
+        for process in self._processes:
+            process.join()
+
+        self._events.put(None)
+        self._merger.join()
+        self._sink.close()
+
+        header = [ring.header.copy() for ring in self._rings]
+        self._report(elapsed_s, [np.zeros_like(h) for h in header], header, total=True)
+        for ring in self._rings:
+            ring.close()
+
+    def _handle_replay_end(self) -> None:
+        # Stopping drains the rings, the detectors still see every frame written before
+        with self._replays_lock:
+            self._replays_running -= 1
+            if self._replays_running > 0:
+                return
+
+        print("Replay finished, stopping")
+        self._stop_event.set()
+
+    def _handle_stop_signal(self, signum: int, frame) -> None:
+        print(f"Received {signal.Signals(signum).name}, stopping")
+        self._stop_event.set()
+
+    def _merge_events(self) -> None:
+        # Replayed events wait here until every sensor's detector has passed their frame time
+        pending: list[tuple[int, int, int, dict]] = []
+        progress_ms = [-1] * len(self._collectors)
+        received = 0
+
+        while True:
+            try:
+                event = self._events.get()
+            except (EOFError, OSError):
+                event = None
+
+            if event is None:
+                while pending:
+                    self._handle_event(heapq.heappop(pending)[-1])
+                return
+
+            if not self._replay:
+                self._handle_event(event)
+                continue
+
+            if event["event"] == _PROGRESS:
+                progress_ms[event["sensor"]] = event["time_ms"]
+            else:
+                received += 1
+                heapq.heappush(pending, (event["timestamp_ms"], event["sensor"], received, event))
+
+            # Events of one sensor arrive in order, so nothing at or before the slowest sensor's time is missing
+            while pending and pending[0][0] <= min(progress_ms):
+                self._handle_event(heapq.heappop(pending)[-1])
+
+    def _handle_event(self, event: dict) -> None:
+        if event["event"] == "provisional_bicycle":
+            PROVISIONAL_BICYCLES.inc()
+            self._sink.emit_event(event)
+            return
+        if event["event"] == "provisional_cancelled":
+            PROVISIONAL_CANCELLED.inc()
+            self._sink.emit_event(event)
+            return
+
+        sensor_id = event["sensor"]
+        self._detections[sensor_id] += 1
+        BICYCLES.inc()
+
+        latency_ms = self._collectors[sensor_id].latency_ms(event["time_end"])
+        if latency_ms is not None:
+            DECISION_LATENCY.observe_ns(int(latency_ms * 1e6))
+            if latency_ms > DECISION_LATENCY_BUDGET_MS:
+                LATE_BICYCLES.inc()
+
+        self._sink.emit_event(event)
+
+    def _report(self, elapsed_s: float, before: list[np.ndarray], after: list[np.ndarray], total: bool = False):
+        written = sum(int(a[SharedRing.WRITTEN] - b[SharedRing.WRITTEN]) for a, b in zip(after, before))
+        read = sum(int(a[SharedRing.READ] - b[SharedRing.READ]) for a, b in zip(after, before))
+        print(
+            f"{'Total' if total else 'Stats'}: {written / elapsed_s if elapsed_s > 0 else 0:.1f} frames/s received, "
+            f"{read / elapsed_s if elapsed_s > 0 else 0:.1f} frames/s detected, "
+            f"{sum(self._detections)} detections ({self._sink.dropped} dropped by the sink)"
+        )
+
+        for sensor_id, (b, a) in enumerate(zip(before, after)):
+            busy_s = (a[SharedRing.BUSY_NS] - b[SharedRing.BUSY_NS]) / 1e9
+            print(
+                f"  sensor {sensor_id}: {int(a[SharedRing.WRITTEN] - b[SharedRing.WRITTEN])} frames, "
+                f"backlog {int(a[SharedRing.WRITTEN] - a[SharedRing.READ])}, skipped {int(a[SharedRing.SKIPPED])}, "
+                f"detector busy {busy_s / elapsed_s * 100 if elapsed_s > 0 else 0:.1f}%, "
+                f"{self._detections[sensor_id]} detections"
+            )
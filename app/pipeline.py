@@ -0,0 +1,106 @@
+from metrics import REGISTRY
+
+from typing import Any, Callable
+
+import queue
+import threading
+import time
+import traceback
+
+
+class Stage:
+    """Worker thread consuming a bounded queue.
+
+    put() never blocks the producer, items are dropped and counted when the queue is full. Busy time is exported
+    as tof_stage_busy_seconds_total, its rate is the utilization of the stage. An inline stage has no queue and
+    no worker, put() runs the handler on the producer thread (the collector thread for ingest).
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self, name: str, handler: Callable[[Any], None], queue_size: int = 1024, inline: bool = False
+    ) -> None:
+        self.name = name
+        self.busy_ns = 0
+        self.processed = 0
+        self.dropped = 0
+
+        self._handler = handler
+        self._inline = inline
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._busy = REGISTRY.counter("tof_stage_busy_seconds", "Busy time of the pipeline stages", stage=name)
+        self._drops = REGISTRY.counter("tof_stage_dropped", "Items dropped by a full pipeline stage queue", stage=name)
+
+        self._worker = None
+        if not inline:
+            self._worker = threading.Thread(target=self._run, name=f"stage-{name}", daemon=True)
+            self._worker.start()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def put(self, item: Any) -> bool:
+        if self._inline:
+            self._process(item)
+            return True
+
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            self._drops.inc()
+            return False
+
+    def stop(self) -> None:
+        """Processes the queued items, then stops the worker."""
+        if self._worker is None:
+            return
+
+        self._queue.put(Stage._STOP)
+        self._worker.join()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is Stage._STOP:
+                return
+            self._process(item)
+
+    def _process(self, item: Any) -> None:
+        start = time.perf_counter_ns()
+        try:
+            self._handler(item)
+        except Exception:
+            # The stage keeps running, one bad frame must not stop the pipeline
+            print(f"Error in {self.name} stage:")
+            traceback.print_exc()
+
+        busy_ns = time.perf_counter_ns() - start
+        self.busy_ns += busy_ns
+        self.processed += 1
+        self._busy.inc(busy_ns / 1e9)
+
+
+class StageMonitor:
+    """Utilization of the stages between two reports."""
+
+    def __init__(self, stages: list[Stage]) -> None:
+        self._stages = stages
+        self._last_time = time.perf_counter_ns()
+        self._last_busy = [stage.busy_ns for stage in stages]
+
+    def report(self) -> str:
+        now = time.perf_counter_ns()
+        elapsed_ns = max(now - self._last_time, 1)
+        busy = [stage.busy_ns for stage in self._stages]
+
+        report = ", ".join(
+            f"{stage.name} {(b - last) / elapsed_ns * 100:.1f}% (queue {stage.depth}, dropped {stage.dropped})"
+            for stage, b, last in zip(self._stages, busy, self._last_busy)
+        )
+
+        self._last_time, self._last_busy = now, busy
+        return report
@@ -0,0 +1,186 @@
+"""
+Opt-in profiling of the mediator handlers and collector callbacks.
+
+While a profiling window is open, the handlers are shadowed on the instances by wrappers which count calls and
+time them, and a single cProfile profile is enabled for the whole window. Outside of a window nothing is wrapped,
+so the profiler costs nothing until it is switched on, and it can be switched on in a running process without
+losing the in-memory buffer.
+"""
+
+from collector import Collector
+from mediator import Mediator
+
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+import cProfile
+import io
+import pstats
+import threading
+import time
+
+
+class HandlerStats:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+
+class Profiler:
+    """Profiles `handle_*` methods of the mediator and the collector subscribers for `window_s` seconds.
+
+    One cProfile.Profile is enabled when the window opens and disabled when it closes. From Python 3.12 cProfile is
+    built on sys.monitoring, which is interpreter wide: the profile sees every thread, and a second profile
+    enabled concurrently would raise. The window is dumped to <output_dir>/profile-<start>.txt (per-handler
+    table and the top functions by cumulative time) and .prof (pstats, e.g. for snakeviz).
+    """
+
+    def __init__(
+        self, mediator: Mediator, collector: Collector, window_s: float = 30, output_dir: str = ".", top: int = 40
+    ) -> None:
+        self._mediator = mediator
+        self._collector = collector
+        self._window_s = window_s
+        self._output_dir = Path(output_dir)
+        self._top = top
+
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._active = False
+        self._in_flight = 0
+        self._timer: Optional[threading.Timer] = None
+        self._started: Optional[datetime] = None
+        self._start_time = 0.0
+
+        self._stats: dict[str, HandlerStats] = {}
+        self._profile: Optional[cProfile.Profile] = None
+
+        self._handlers: list[str] = []
+        self._subscribers: list[tuple[Collector.Subscriber, Collector.Subscriber]] = []
+
+    @property
+    def active(self) -> bool:
+        return self._active
+
+    def toggle(self) -> None:
+        if self._active:
+            self.stop()
+        else:
+            self.start()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._active:
+                return
+            self._active = True
+            self._stats = {}
+            self._profile = None
+            self._started = datetime.now()
+            self._start_time = time.perf_counter()
+
+        mediator_name = type(self._mediator).__name__
+        self._handlers = [
+            name
+            for name in dir(type(self._mediator))
+            if name.startswith("handle_") and name != "handle_toggle_profiling"
+        ]
+        for name in self._handlers:
+            setattr(self._mediator, name, self._wrap(f"{mediator_name}.{name}", getattr(self._mediator, name)))
+
+        self._subscribers = []
+        for subscriber in self._collector.subscribers:
+            wrapped = self._wrap(getattr(subscriber, "__qualname__", repr(subscriber)), subscriber)
+            self._collector.replace_subscriber(subscriber, wrapped)
+            self._subscribers.append((subscriber, wrapped))
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            self._profile = profile
+        except ValueError as e:
+            # Another profiler (or a debugger) owns sys.monitoring, handlers are still timed
+            print(f"Profiling without cProfile: {e}")
+
+        self._timer = threading.Timer(self._window_s, self.stop)
+        self._timer.daemon = True
+        self._timer.start()
+        print(f"Profiling {len(self._handlers) + len(self._subscribers)} handlers for {self._window_s:.0f} s")
+
+    def stop(self) -> None:
+        with self._lock:
+            if not self._active:
+                return
+            self._active = False
+            elapsed_s = time.perf_counter() - self._start_time
+
+        if self._timer is not None and self._timer is not threading.current_thread():
+            self._timer.cancel()
+
+        if self._profile is not None:
+            self._profile.disable()
+
+        # Removing the instance attributes uncovers the original methods
+        for name in self._handlers:
+            delattr(self._mediator, name)
+        for subscriber, wrapped in self._subscribers:
+            self._collector.replace_subscriber(wrapped, subscriber)
+
+        # Stop may be called from within a profiled call (e.g. shift+p in the GUI), so dump once it returns
+        threading.Thread(target=self._dump, args=(elapsed_s,), daemon=True).start()
+
+    # ---------------------------------- PRIVATE --------------------------------- #
+
+    def _wrap(self, name: str, handler: Callable) -> Callable:
+        stats = self._stats.setdefault(name, HandlerStats())
+
+        def wrapper(*args, **kwargs):
+            with self._lock:
+                self._in_flight += 1
+
+            start = time.perf_counter()
+            try:
+                return handler(*args, **kwargs)
+
+            finally:
+                elapsed_s = time.perf_counter() - start
+
+                with self._lock:
+                    stats.calls += 1
+                    stats.total_s += elapsed_s
+                    stats.max_s = max(stats.max_s, elapsed_s)
+                    self._in_flight -= 1
+                    self._idle.notify_all()
+
+        return wrapper
+
+    def _dump(self, elapsed_s: float) -> None:
+        with self._lock:
+            # Calls still running with a wrapper, bounded in case one never returns
+            self._idle.wait_for(lambda: self._in_flight == 0, timeout=10)
+            stats = dict(self._stats)
+            profile = self._profile
+
+        self._output_dir.mkdir(parents=True, exist_ok=True)
+        path = self._output_dir / f"profile-{self._started:%Y%m%d_%H%M%S}"
+
+        out = io.StringIO()
+        out.write(f"Profile window of {elapsed_s:.1f} s started at {self._started:%Y-%m-%d %H:%M:%S}\n\n")
+        out.write(f"{'handler':<50} {'calls':>8} {'total ms':>12} {'mean ms':>10} {'max ms':>10}\n")
+        for name, handler in sorted(stats.items(), key=lambda item: item[1].total_s, reverse=True):
+            mean_ms = handler.total_s / handler.calls * 1000 if handler.calls > 0 else 0
+            out.write(
+                f"{name:<50} {handler.calls:>8} {handler.total_s * 1000:>12.1f} {mean_ms:>10.3f} "
+                f"{handler.max_s * 1000:>10.3f}\n"
+            )
+
+        stats_by_function = pstats.Stats(profile, stream=out) if profile is not None else None
+        if stats_by_function is not None and stats_by_function.total_calls > 0:
+            stats_by_function.dump_stats(path.with_suffix(".prof"))
+            out.write(f"\nTop {self._top} functions by cumulative time:\n")
+            stats_by_function.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self._top)
+
+        with open(path.with_suffix(".txt"), "w") as f:
+            f.write(out.getvalue())
+        print(f"Saved profile to {path.with_suffix('.txt')}")
@@ -0,0 +1,146 @@
+from collector import Collector
+from clock import VirtualClock
+
+from overrides import overrides
+from typing import Callable, Optional, Tuple
+from pathlib import Path
+import numpy as np
+import time
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "tools"))
+
+from sensor_model import Sensor, random_motions, OBJECT_KINDS
+
+
+class SimulatedCollector(Collector):
+    """Streams frames sampled from tools/sensor_model.py.
+
+    Frames carry simulated sensor timestamps spaced by `frame_period_ms`, starting at `start_ms` (default: the
+    wall clock on start). They are paced by a virtual clock at `speed` times real time (0: as fast as possible),
+    or at `rate_hz` frames per second (default: real time, 0: as fast as possible). Ground truth of each motion
+    is published to ground truth subscribers once its last frame has been dispatched.
+    """
+
+    GroundTruth = dict
+    GroundTruthSubscriber = Callable[[GroundTruth], None]
+
+    def __init__(
+        self,
+        frame_period_ms: float = 33,
+        rate_hz: Optional[float] = None,
+        arrivals_per_min: float = 10,
+        bike_ratio: float = 0.5,
+        bike_speed_kmh: Tuple[float, float] = (10, 30),
+        pedestrian_speed_kmh: Tuple[float, float] = (3, 6),
+        distance_to_path_m: Tuple[float, float] = (1.5, 1.5),
+        max_lag_ms: Optional[float] = None,
+        report_interval_s: float = 5,
+        seed: Optional[int] = None,
+        speed: Optional[float] = None,
+        start_ms: Optional[int] = None,
+    ) -> None:
+        if speed is None:
+            speed = VirtualClock.REAL_TIME if rate_hz is None else rate_hz * frame_period_ms / 1000
+        virtual_clock = VirtualClock(speed)
+
+        # Simulated timestamps only follow the wall clock when dispatched in real time
+        super().__init__(
+            clock=Collector.REPLAY_CLOCK if speed == VirtualClock.REAL_TIME else Collector.NO_CLOCK,
+            virtual_clock=virtual_clock,
+        )
+
+        self._sensor = Sensor(frame_period_ms=frame_period_ms)
+        self._rng = np.random.default_rng(seed)
+        self._start_ms = start_ms
+        self._motion_args = {
+            "bike_ratio": bike_ratio,
+            "bike_speed_kmh": bike_speed_kmh,
+            "pedestrian_speed_kmh": pedestrian_speed_kmh,
+            "distance_to_path_m": distance_to_path_m,
+            "arrivals_per_min": arrivals_per_min,
+        }
+        self._chunk_motions = 100
+
+        self._max_lag_ms = max_lag_ms
+        self._report_interval_s = report_interval_s
+        self._ground_truth_subscribers: list[SimulatedCollector.GroundTruthSubscriber] = []
+
+        self._dispatched = 0
+        self._dropped = 0
+        self._lags: list[float] = []
+
+    def subscribe_ground_truth(self, callback: GroundTruthSubscriber) -> None:
+        self._ground_truth_subscribers.append(callback)
+
+    @overrides
+    def _start(self) -> None:
+        print("Started simulated data stream")
+
+        start_ms = self._start_ms if self._start_ms is not None else int(time.time() * 1000)
+        last_report = time.perf_counter()
+
+        while True:
+            data, ground_truth = self._sample_chunk(start_ms)
+            gt_index = 0
+
+            for sample in data:
+                if not self._event.is_set():
+                    self._event.wait()
+
+                lag_ms = self.virtual_clock.wait_until(int(sample[0]))
+
+                if self._max_lag_ms is not None and lag_ms > self._max_lag_ms:
+                    self._dropped += 1
+                    self._dropped_frames.inc()
+                else:
+                    self._lags.append(lag_ms)
+                    self._dispatched += 1
+                    self._mark_receipt()
+                    self.dispatch(sample)
+
+                while gt_index < len(ground_truth) and ground_truth[gt_index]["end_ms"] <= sample[0]:
+                    self._dispatch_ground_truth(ground_truth[gt_index])
+                    gt_index += 1
+
+                now = time.perf_counter()
+                if now - last_report >= self._report_interval_s:
+                    self._report(now - last_report)
+                    last_report = now
+
+            start_ms = int(data[-1][0] + self._sensor.frame_period_ms)
+
+    def _sample_chunk(self, start_ms: int) -> Tuple[np.ndarray, list[GroundTruth]]:
+        motions = random_motions(self._chunk_motions, self._rng, **self._motion_args)
+        data, ground_truth = self._sensor.sample(motions, self._rng, start_ms=start_ms)
+
+        return data, [
+            {
+                "kind": OBJECT_KINDS[motions.kind[i]],
+                "velocity_kmh": float(motions.velocity_kmh[i]),
+                "direction": int(motions.direction[i]),
+                "distance_to_path_m": float(motions.distance_to_path_m[i]),
+                "start_ms": int(ground_truth.start_ms[i]),
+                "end_ms": int(ground_truth.end_ms[i]),
+                "center_zone_ms": int(ground_truth.center_zone_ms[i]),
+            }
+            for i in range(len(motions))
+        ]
+
+    def _dispatch_ground_truth(self, ground_truth: GroundTruth) -> None:
+        for subscriber in self._ground_truth_subscribers:
+            subscriber(ground_truth)
+
+    def _report(self, elapsed_s: float) -> None:
+        lags_ms = np.array(self._lags) if len(self._lags) > 0 else np.zeros(1)
+        target_fps = self.virtual_clock.speed * 1000 / self._sensor.frame_period_ms
+        print(
+            f"Simulated collector: {self._dispatched / elapsed_s:.0f} fps "
+            f"(target {target_fps if target_fps > 0 else float('inf'):.0f}), "
+            f"lag p50 {np.percentile(lags_ms, 50):.2f} ms, p99 {np.percentile(lags_ms, 99):.2f} ms, "
+            f"max {lags_ms.max():.2f} ms, dropped {self._dropped}"
+        )
+
+        self._dispatched = 0
+        self._dropped = 0
+        self._lags = []
@@ -0,0 +1,275 @@
+from motion import Motion
+from velocity_estimator import VelocityEstimate, Cancellation
+from metrics import DROPPED_EVENTS
+
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Optional
+
+import json
+import os
+import queue
+import socket
+import threading
+import time
+
+
+Event = dict
+
+
+def motion_event(motion: Motion, timestamp_ms: Optional[int] = None) -> Event:
+    """Summary fields of a detected motion, cheap enough to build on the detection thread.
+
+    timestamp_ms is the decision time, the wall clock by default, see Collector.event_time_ms().
+    """
+    return {
+        "event": "bicycle",
+        "track_id": motion.track_id,
+        "timestamp_ms": timestamp_ms if timestamp_ms is not None else int(time.time() * 1000),
+        "time_start": int(motion.time_start),
+        "time_end": int(motion.time_end),
+        "time_total": int(motion.time_total),
+        "dist_start": int(motion.dist_start),
+        "dist_end": int(motion.dist_end),
+        "dist_avg": float(motion.dist_avg),
+        "direction": int(motion.direction),
+        "velocity": float(motion.velocity),
+        "num_series": motion.num_series,
+        "num_samples_total": motion.num_samples_total,
+    }
+
+
+def provisional_event(estimate: VelocityEstimate, timestamp_ms: Optional[int] = None) -> Event:
+    """Bicycle signalled before its motion is complete, once the motion is flushed a "bicycle" event with the same
+    track_id confirms it or a "provisional_cancelled" event retracts it."""
+    return {
+        "event": "provisional_bicycle",
+        "track_id": estimate.track_id,
+        "timestamp_ms": timestamp_ms if timestamp_ms is not None else int(time.time() * 1000),
+        "time_start": int(estimate.time_start),
+        "time": int(estimate.time),
+        "distance": float(estimate.distance),
+        "direction": int(estimate.direction),
+        "velocity": float(estimate.velocity),
+        "velocity_std": float(estimate.velocity_std),
+        "num_samples": estimate.num_samples,
+    }
+
+
+def cancelled_event(cancellation: Cancellation, timestamp_ms: Optional[int] = None) -> Event:
+    """Provisional bicycle not confirmed by its motion, velocity is the one of the motion (None without one)."""
+    return {
+        "event": "provisional_cancelled",
+        "track_id": cancellation.estimate.track_id,
+        "timestamp_ms": timestamp_ms if timestamp_ms is not None else int(time.time() * 1000),
+        "time": int(cancellation.estimate.time),
+        "direction": int(cancellation.estimate.direction),
+        "reason": cancellation.reason,
+        "velocity": float(cancellation.velocity) if cancellation.velocity is not None else None,
+    }
+
+
+class Sink(ABC):
+    """Destination of bicycle detections.
+
+    emit() only builds the event and puts it on a bounded queue, events are serialized and written in batches
+    on the sink thread, so a slow disk or socket never delays the detector. Events are dropped when the queue
+    is full.
+    """
+
+    _STOP = None
+
+    def __init__(
+        self, queue_size: int = 1024, max_batch: int = 256, tick_interval_s: Optional[float] = None
+    ) -> None:
+        self.dropped = 0
+        self.errors = 0
+
+        self._max_batch = max_batch
+        self._tick_interval_s = tick_interval_s
+        self._queue: queue.Queue[Optional[Event]] = queue.Queue(maxsize=queue_size)
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def emit(self, motion: Motion, timestamp_ms: Optional[int] = None) -> None:
+        self.emit_event(motion_event(motion, timestamp_ms))
+
+    def emit_event(self, event: Event) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            DROPPED_EVENTS.inc()
+
+    def flush(self) -> None:
+        """Blocks until every emitted event has been written."""
+        self._queue.join()
+
+    def close(self) -> None:
+        self._queue.put(self._STOP)
+        self._worker.join()
+
+    @abstractmethod
+    def _write(self, events: list[Event]) -> None:
+        pass
+
+    def _tick(self) -> None:
+        """Called every tick_interval_s on the sink thread, also when idle."""
+        pass
+
+    def _close(self) -> None:
+        pass
+
+    def _run(self) -> None:
+        while True:
+            try:
+                event = self._queue.get(timeout=self._tick_interval_s)
+            except queue.Empty:
+                self._tick()
+                continue
+
+            batch = [event]
+            while len(batch) < self._max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = self._STOP in batch
+            events = [event for event in batch if event is not self._STOP]
+            try:
+                if len(events) > 0:
+                    self._write(events)
+                self._tick()
+            except OSError as e:
+                self.errors += 1
+                print(f"{type(self).__name__}: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if stop:
+                self._close()
+                return
+
+
+class PrintSink(Sink):
+    def _write(self, events: list[Event]) -> None:
+        for event in events:
+            direction = "approaching" if event["direction"] == 1 else "moving away"
+            sensor = f"[sensor {event['sensor']}] " if "sensor" in event else ""
+            if event["event"] == "provisional_bicycle":
+                print(
+                    f"{sensor}Provisional: bicycle {direction} "
+                    f"{event['velocity']:.2f} +- {event['velocity_std']:.2f} kmh"
+                )
+            elif event["event"] == "provisional_cancelled":
+                print(f"{sensor}Provisional bicycle {direction} cancelled ({event['reason'].replace('_', ' ')})")
+            else:
+                print(f"{sensor}Bicycle {direction} {event['velocity']:.2f} kmh detected!")
+
+
+class JSONLSink(Sink):
+    """Appends one JSON object per line, fsyncs at most every fsync_interval_s (and on close)."""
+
+    def __init__(self, path: str, fsync_interval_s: float = 1.0, **kwargs) -> None:
+        self._file = open(path, "a", encoding="utf-8")
+        self._fsync_interval_s = fsync_interval_s
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+        super().__init__(tick_interval_s=fsync_interval_s, **kwargs)
+
+    def _write(self, events: list[Event]) -> None:
+        self._file.write("".join(json.dumps(event) + "\n" for event in events))
+        self._file.flush()
+        self._unsynced = True
+
+    def _tick(self) -> None:
+        if self._unsynced and time.monotonic() - self._last_fsync >= self._fsync_interval_s:
+            self._fsync()
+
+    def _fsync(self) -> None:
+        os.fsync(self._file.fileno())
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+
+    def _close(self) -> None:
+        if self._unsynced:
+            self._fsync()
+        self._file.close()
+
+
+class UDPSink(Sink):
+    """One JSON datagram per event."""
+
+    def __init__(self, host: str, port: int, **kwargs) -> None:
+        self._address = (host, port)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        super().__init__(**kwargs)
+
+    def _write(self, events: list[Event]) -> None:
+        for event in events:
+            self._socket.sendto(json.dumps(event).encode(), self._address)
+
+    def _close(self) -> None:
+        self._socket.close()
+
+
+class UnixSocketSink(Sink):
+    """One JSON datagram per event to a local Unix datagram socket, events are lost while nobody listens."""
+
+    def __init__(self, path: str, **kwargs) -> None:
+        self._path = path
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        super().__init__(**kwargs)
+
+    def _write(self, events: list[Event]) -> None:
+        for event in events:
+            self._socket.sendto(json.dumps(event).encode(), self._path)
+
+    def _close(self) -> None:
+        self._socket.close()
+
+
+class RingSink(Sink):
+    """Keeps the last `capacity` events in memory, for tests."""
+
+    def __init__(self, capacity: int = 1024, **kwargs) -> None:
+        self._events: deque[Event] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def events(self) -> list[Event]:
+        with self._lock:
+            return list(self._events)
+
+    def _write(self, events: list[Event]) -> None:
+        with self._lock:
+            self._events.extend(events)
+
+
+SINKS = ["print", "jsonl", "udp", "unix", "ring"]
+
+
+def create_sink(kind: str, target: Optional[str] = None) -> Sink:
+    """target is a file path for jsonl, host:port for udp and a socket path for unix."""
+    if kind in ["jsonl", "udp", "unix"] and not target:
+        raise ValueError(f"Sink {kind} requires a target")
+
+    if kind == "print":
+        return PrintSink()
+
+    elif kind == "jsonl":
+        return JSONLSink(target)
+
+    elif kind == "udp":
+        host, port = target.rsplit(":", 1)
+        return UDPSink(host, int(port))
+
+    elif kind == "unix":
+        return UnixSocketSink(target)
+
+    elif kind == "ring":
+        return RingSink()
+
+    raise ValueError(f"Unknown sink {kind}")
@@ -0,0 +1,165 @@
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+
+class Overview(NamedTuple):
+    """One entry per pixel column: first timestamp, min and max distance (-1 if empty) and the fraction of
+    samples with a target."""
+
+    timestamps: np.ndarray
+    min_distances: np.ndarray
+    max_distances: np.ndarray
+    occupancy: np.ndarray
+
+
+class SummaryPyramid:
+    """Min/max/occupancy of zone distances over buckets of bucket_size * fanout^level consecutive samples.
+
+    Samples are appended one at a time in O(1) amortized work: the open level 0 bucket is accumulated in plain
+    ints and a level is only updated when a bucket of the level below is complete. Buckets are rings over the
+    unbounded sample index, so the pyramid of a ring buffer of `capacity` samples forgets the same samples. A
+    query reads at most `fanout` buckets per pixel column, its cost does not depend on the number of samples.
+    """
+
+    _EMPTY_MIN = np.iinfo(np.int64).max
+
+    def __init__(self, capacity: int, bucket_size: int = 16, fanout: int = 4) -> None:
+        self._capacity = capacity
+        self._bucket_size = bucket_size
+        self._fanout = fanout
+
+        # Samples per bucket of each level, up to a single bucket covering the whole capacity
+        self._sizes = [bucket_size]
+        while self._sizes[-1] < capacity:
+            self._sizes.append(self._sizes[-1] * fanout)
+
+        lengths = [max(capacity // size + 2, fanout) for size in self._sizes]
+        self._timestamps = [np.zeros(n, dtype=np.int64) for n in lengths]
+        self._mins = [np.full(n, SummaryPyramid._EMPTY_MIN, dtype=np.int64) for n in lengths]
+        self._maxs = [np.full(n, -1, dtype=np.int64) for n in lengths]
+        self._occupied = [np.zeros(n, dtype=np.int64) for n in lengths]
+
+        self.count = 0  # Samples appended, the unbounded index of the next one
+        self._reset_open_bucket()
+
+    @classmethod
+    def from_samples(
+        cls, timestamps: np.ndarray, distances: np.ndarray, bucket_size: int = 16, fanout: int = 4
+    ) -> "SummaryPyramid":
+        """Pyramid of a whole recording built with array operations, distances are (n,) or (n, targets)."""
+        distances = np.asarray(distances, dtype=np.int64).reshape(len(timestamps), -1)
+        pyramid = cls(max(len(timestamps), 1), bucket_size, fanout)
+
+        present = distances != -1
+        mins = np.where(present, distances, SummaryPyramid._EMPTY_MIN).min(axis=1)
+        maxs = distances.max(axis=1)
+        occupied = present.any(axis=1).astype(np.int64)
+
+        # Level 0 from the samples, each next level from the complete buckets of the level below
+        full = len(timestamps) // bucket_size * bucket_size
+        level = (
+            np.asarray(timestamps[:full:bucket_size], dtype=np.int64),
+            mins[:full].reshape(-1, bucket_size).min(axis=1),
+            maxs[:full].reshape(-1, bucket_size).max(axis=1),
+            occupied[:full].reshape(-1, bucket_size).sum(axis=1),
+        )
+        for k in range(len(pyramid._sizes)):
+            n = len(level[0])
+            pyramid._timestamps[k][:n], pyramid._mins[k][:n], pyramid._maxs[k][:n], pyramid._occupied[k][:n] = level
+
+            n = n // fanout * fanout
+            level = (
+                level[0][:n:fanout],
+                level[1][:n].reshape(-1, fanout).min(axis=1),
+                level[2][:n].reshape(-1, fanout).max(axis=1),
+                level[3][:n].reshape(-1, fanout).sum(axis=1),
+            )
+
+        # The open bucket holds the samples after the last complete level 0 bucket
+        pyramid.count = full
+        for t, d in zip(timestamps[full:].tolist(), distances[full:].tolist()):
+            pyramid.append(t, *d)
+
+        return pyramid
+
+    def append(self, timestamp_ms: int, *distances: int) -> None:
+        if self.count % self._bucket_size == 0:
+            self._open_timestamp = timestamp_ms
+
+        present = False
+        for distance in distances:
+            if distance != -1:
+                present = True
+                if distance < self._open_min:
+                    self._open_min = distance
+                if distance > self._open_max:
+                    self._open_max = distance
+        self._open_occupied += present
+
+        self.count += 1
+        if self.count % self._bucket_size == 0:
+            self._close(0, self.count // self._bucket_size - 1)
+            self._reset_open_bucket()
+
+    def query(self, start: int, end: int, columns: int) -> Optional[Overview]:
+        """Summary of the samples with unbounded indices in [start, end) in at most `columns` entries, None if
+        no complete bucket falls in the range. The range is rounded to whole buckets."""
+        start = max(start, self.count - self._capacity)
+        if end <= start or columns <= 0:
+            return None
+
+        # Coarsest level with at least one bucket per column
+        k = 0
+        while k + 1 < len(self._sizes) and self._sizes[k + 1] * columns <= end - start:
+            k += 1
+
+        size = self._sizes[k]
+        first = -(-start // size)
+        last = min(end, self.count) // size
+        if last <= first:
+            return None
+
+        positions = np.arange(first, last) % len(self._timestamps[k])
+        groups = np.unique(np.arange(min(columns, last - first)) * (last - first) // min(columns, last - first))
+
+        mins = np.minimum.reduceat(self._mins[k][positions], groups)
+        samples = np.diff(np.append(groups, last - first)) * size
+        return Overview(
+            timestamps=self._timestamps[k][positions][groups],
+            min_distances=np.where(mins == SummaryPyramid._EMPTY_MIN, -1, mins),
+            max_distances=np.maximum.reduceat(self._maxs[k][positions], groups),
+            occupancy=np.add.reduceat(self._occupied[k][positions], groups) / samples,
+        )
+
+    def _reset_open_bucket(self) -> None:
+        self._open_timestamp = 0
+        self._open_min = SummaryPyramid._EMPTY_MIN
+        self._open_max = -1
+        self._open_occupied = 0
+
+    def _close(self, k: int, bucket: int) -> None:
+        position = bucket % len(self._timestamps[k])
+
+        if k == 0:
+            values = (self._open_timestamp, self._open_min, self._open_max, self._open_occupied)
+        else:
+            first = bucket * self._fanout % len(self._timestamps[k - 1])
+            children = (
+                slice(first, first + self._fanout)
+                if first + self._fanout <= len(self._timestamps[k - 1])
+                else np.arange(first, first + self._fanout) % len(self._timestamps[k - 1])
+            )
+            values = (
+                self._timestamps[k - 1][first],
+                self._mins[k - 1][children].min(),
+                self._maxs[k - 1][children].max(),
+                self._occupied[k - 1][children].sum(),
+            )
+
+        self._timestamps[k][position], self._mins[k][position], self._maxs[k][position], self._occupied[k][
+            position
+        ] = values
+
+        if k + 1 < len(self._sizes) and (bucket + 1) % self._fanout == 0:
+            self._close(k + 1, bucket // self._fanout)
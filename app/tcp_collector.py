@@ -31,6 +31,7 @@ class TCPCollector(Collector):
                     if not bytes:
                         print("Connection closed")
                         break
+                    self._mark_receipt()
 
                     self._handle_message(bytes)
 
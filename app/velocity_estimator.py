@@ -0,0 +1,160 @@
+from typing import NamedTuple, Optional
+
+import math
+
+
+class VelocityEstimate(NamedTuple):
+    """Provisional velocity of the object in the center zone, decided before its motion is complete."""
+
+    time_start: int  # First sample of the tracked object
+    time: int  # Sample at which the estimate became confident
+    distance: float
+    direction: int  # 1 approaching, -1 moving away, like Motion.direction
+    velocity: float
+    velocity_std: float
+    num_samples: int
+    track_id: int = -1  # Assigned by the detector, shared with the motion that confirms the estimate
+
+
+class Cancellation(NamedTuple):
+    """Provisional detection that was not confirmed by a flushed bicycle motion."""
+
+    estimate: VelocityEstimate
+    reason: str  # "no_motion", "below_threshold" or "duplicate" if the motion confirmed an earlier estimate
+    velocity: Optional[float]  # Velocity of the flushed motion, None without one
+
+
+class StreamingVelocityEstimator:
+    """Constant velocity Kalman filter of the center zone distance, O(1) work per sample.
+
+    The state is the distance and its rate of change in mm/ms, the rate is mapped to the velocity along the path
+    with the same d / sqrt(d^2 - a^2) geometry as MonotonicSeries. A track starts at the first distance after a
+    gap of more than max_gap_ms, or after a jump of more than max_dd from the predicted distance. update() returns
+    an estimate once per track, as soon as the velocity is above threshold_kmh by confidence_z standard deviations.
+
+    The geometry factor grows without bound as d approaches a, so the velocity variance includes the distance
+    variance through the derivative of the factor, and no estimate is made unless the distance is above a by
+    confidence_z standard deviations.
+    """
+
+    def __init__(
+        self,
+        threshold_kmh: float,
+        dist_to_path: float,
+        confidence_z: float = 2.0,
+        min_samples: int = 3,
+        max_dd: int = 200,
+        max_gap_ms: int = 500,
+        measurement_std_mm: float = 30,
+        acceleration_std: float = 0.01,
+        initial_velocity_std: float = 10,
+    ) -> None:
+        self._threshold_kmh = threshold_kmh
+        self._dist_to_path_sq = dist_to_path**2
+        self._confidence_z = confidence_z
+        self._min_samples = min_samples
+        self._max_dd = max_dd
+        self._max_gap_ms = max_gap_ms
+        self._r = measurement_std_mm**2  # mm^2
+        self._q = acceleration_std**2  # (mm/ms^2)^2
+        self._p11_0 = initial_velocity_std**2  # (mm/ms)^2
+
+        self.reset()
+
+    def reset(self) -> None:
+        self._time = None
+        self._time_start = 0
+        self._num_samples = 0
+        self._emitted = False
+
+        self._d = 0.0
+        self._v = 0.0
+        self._p00 = self._p01 = self._p11 = 0.0
+
+    @property
+    def velocity(self) -> float:
+        """Velocity along the path of the current track in km/h."""
+        return abs(self._v) * self._geometry() * 3.6
+
+    @property
+    def velocity_std(self) -> float:
+        # First order propagation of the (distance, rate) covariance through |v| * g(d)
+        g = self._geometry()
+        dg = self._geometry_derivative()
+        variance = g * g * self._p11 + 2 * self._v * g * dg * self._p01 + self._v * self._v * dg * dg * self._p00
+        return math.sqrt(max(variance, 0.0)) * 3.6
+
+    def update(self, timestamp_ms: int, distance_mm: int) -> Optional[VelocityEstimate]:
+        if distance_mm == -1:
+            return None
+
+        dt = timestamp_ms - self._time if self._time is not None else None
+        if (
+            dt is None
+            or dt < 0
+            or dt > self._max_gap_ms
+            or abs(distance_mm - (self._d + self._v * dt)) > self._max_dd
+        ):
+            self._start_track(timestamp_ms, distance_mm)
+            return None
+
+        # Predict
+        q = self._q
+        self._d += self._v * dt
+        self._p00 += 2 * dt * self._p01 + dt * dt * self._p11 + q * dt**4 / 4
+        self._p01 += dt * self._p11 + q * dt**3 / 2
+        self._p11 += q * dt * dt
+
+        # Correct with the measured distance
+        s = self._p00 + self._r
+        k0, k1 = self._p00 / s, self._p01 / s
+        innovation = distance_mm - self._d
+        self._d += k0 * innovation
+        self._v += k1 * innovation
+        self._p11 -= k1 * self._p01
+        self._p00 *= 1 - k0
+        self._p01 *= 1 - k0
+
+        self._time = timestamp_ms
+        self._num_samples += 1
+
+        if self._emitted or self._num_samples < self._min_samples:
+            return None
+
+        # Close to the path distance the geometry is too steep for a linear error estimate
+        if (self._d - self._confidence_z * math.sqrt(self._p00)) ** 2 <= self._dist_to_path_sq:
+            return None
+
+        velocity, velocity_std = self.velocity, self.velocity_std
+        if velocity - self._confidence_z * velocity_std <= self._threshold_kmh:
+            return None
+
+        self._emitted = True
+        return VelocityEstimate(
+            time_start=self._time_start,
+            time=timestamp_ms,
+            distance=self._d,
+            direction=1 if self._v < 0 else -1,
+            velocity=velocity,
+            velocity_std=velocity_std,
+            num_samples=self._num_samples,
+        )
+
+    def _start_track(self, timestamp_ms: int, distance_mm: int) -> None:
+        self._time = timestamp_ms
+        self._time_start = timestamp_ms
+        self._num_samples = 1
+        self._emitted = False
+
+        self._d = float(distance_mm)
+        self._v = 0.0
+        self._p00, self._p01, self._p11 = self._r, 0.0, self._p11_0
+
+    def _geometry(self) -> float:
+        d_sq = self._d * self._d
+        return self._d / math.sqrt(d_sq - self._dist_to_path_sq) if d_sq > self._dist_to_path_sq else 1.0
+
+    def _geometry_derivative(self) -> float:
+        """d/dd of d / sqrt(d^2 - a^2), which is -a^2 / (d^2 - a^2)^(3/2)."""
+        d_sq = self._d * self._d
+        return -self._dist_to_path_sq / (d_sq - self._dist_to_path_sq) ** 1.5 if d_sq > self._dist_to_path_sq else 0.0
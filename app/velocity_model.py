@@ -0,0 +1,38 @@
+from motion import Motion
+
+from typing import Any
+import numpy as np
+
+
+class VelocityModel:
+    """Velocity correction model trained by detection/linear_regression_approach.py.
+
+    Linear models are stored as .npz coefficients and evaluated with a single dot product,
+    any other estimator is stored with joblib and goes through its predict method.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._coef: np.ndarray = None
+        self._intercept: float = 0.0
+        self._estimator: Any = None
+
+        if path.endswith(".npz"):
+            model = np.load(path)
+            self._features = [str(feature) for feature in model["features"]]
+            self._coef = model["coef"].astype(np.float64)
+            self._intercept = float(model["intercept"])
+        else:
+            import joblib
+
+            model = joblib.load(path)
+            self._features = model["features"]
+            self._estimator = model["estimator"]
+
+    def predict(self, motion: Motion) -> float:
+        # Built per call, the live and the replay detector share the model and predict from different threads
+        x = np.array([getattr(motion, feature) for feature in self._features], dtype=np.float64)
+
+        if self._estimator is not None:
+            return float(self._estimator.predict(x.reshape(1, -1))[0])
+
+        return float(self._coef @ x + self._intercept)
@@ -0,0 +1,182 @@
+"""Benchmarks of the live pipeline in app/: strategies, buffer, detector and collectors."""
+
+from common import *
+
+import sys
+import struct
+import argparse
+
+sys.path.insert(0, str(APP_DIR))
+
+from buffer import Buffer
+from detector import Detector
+from mediator import Mediator
+from motion import Motion
+from strategy import TargetZeroStrategy, ConfidenceStrategy
+from tcp_collector import TCPCollector
+from csv_collector import CSVCollector
+
+
+class NullMediator(Mediator):
+    def __init__(self) -> None:
+        self.detections = 0
+
+    def handle_signal_bicycle(self, motion: Motion) -> None:
+        self.detections += 1
+
+
+def bench_strategies(data: np.ndarray, span: int, prefix: str) -> dict:
+    results = {}
+    for name, strategy in [("target_0", TargetZeroStrategy()), ("confidence", ConfidenceStrategy())]:
+        windows = len(data) - span
+        results[f"{prefix}/strategy.transform[{name}]/window"] = measure(
+            lambda i: strategy.transform(data[i % windows : i % windows + span]),
+            calls=min(2000, windows),
+            samples_per_call=span,
+        )
+        results[f"{prefix}/strategy.transform[{name}]/sample"] = measure(
+            lambda i: strategy.transform(data[i % len(data)].reshape(1, -1)),
+            calls=min(20000, len(data)),
+        )
+
+    return results
+
+
+def bench_buffer(data: np.ndarray, span: int, size: int, prefix: str) -> dict:
+    results = {}
+
+    buffer = Buffer(span=span, size=size)
+    results[f"{prefix}/buffer.append"] = measure(lambda i: buffer.append(data[i % len(data)]), calls=size)
+
+    # Buffer is at full capacity and has wrapped around from here on
+    results[f"{prefix}/buffer.get_data/live"] = measure(lambda i: buffer.get_data(), calls=5000, samples_per_call=span)
+
+    buffer.seek(50)
+    results[f"{prefix}/buffer.get_data/paused"] = measure(lambda i: buffer.get_data(), calls=5000, samples_per_call=span)
+
+    def skip(i: int) -> None:
+        buffer.skip_to_next_motion(direction=1 if i % 4 < 2 else -1)
+
+    results[f"{prefix}/buffer.skip_to_next_motion"] = measure(skip, calls=200, setup=lambda: buffer.seek(50))
+
+    # Timestamps scattered over the recording, 5 s ranges
+    timestamps = data[np.arange(5000) * 7919 % len(data), 0]
+    results[f"{prefix}/buffer.seek_to_timestamp"] = measure(lambda i: buffer.seek_to_timestamp(timestamps[i]), calls=5000)
+    results[f"{prefix}/buffer.get_range"] = measure(
+        lambda i: buffer.get_range(timestamps[i], timestamps[i] + 5000), calls=5000
+    )
+
+    # Whole ring summarized to the pixel columns of the overview strip
+    results[f"{prefix}/buffer.get_overview"] = measure(lambda i: buffer.get_overview(1000), calls=2000)
+
+    return results
+
+
+def bench_detector(data: np.ndarray, span: int, prefix: str) -> dict:
+    results = {}
+    transformed = TargetZeroStrategy().transform(data)
+
+    mediator = NullMediator()
+    detector = Detector(mediator=mediator)
+    results[f"{prefix}/detector.append_sample"] = measure(
+        lambda i: detector.append_sample(transformed[i % len(transformed)]), calls=len(transformed)
+    )
+    results[f"{prefix}/detector.append_sample"]["detections"] = mediator.detections
+
+    detector = Detector(mediator=NullMediator())
+    windows = len(transformed) - span
+    results[f"{prefix}/detector.update_data"] = measure(
+        lambda i: detector.update_data(transformed[i % windows : i % windows + span]),
+        calls=min(2000, windows),
+        samples_per_call=span,
+    )
+
+    results[f"{prefix}/detector.get_motion"] = measure(lambda i: detector.get_motion(), calls=5000)
+
+    return results
+
+
+def bench_collectors(data: np.ndarray, prefix: str) -> dict:
+    results = {}
+
+    tcp_collector = TCPCollector(host="localhost", port=0)
+    tcp_collector.subscribe(lambda sample: None)
+    messages = [
+        struct.pack("<Qi18i18i4x", row[0], row[1], *row[2::2], *row[3::2]) for row in data[: min(len(data), 20000)]
+    ]
+    results[f"{prefix}/tcp_collector._handle_message"] = measure(
+        lambda i: tcp_collector._handle_message(messages[i % len(messages)]), calls=len(messages)
+    )
+
+    csv_collector = CSVCollector(file_path="", live_mode=False)
+    csv_collector.subscribe(lambda sample: None)
+    lines = [",".join(map(str, row)) + "\n" for row in data[: min(len(data), 20000)]]
+    results[f"{prefix}/csv_collector._handle_message"] = measure(
+        lambda i: csv_collector._handle_message(lines[i % len(lines)]), calls=len(lines)
+    )
+
+    return results
+
+
+def run(args: argparse.Namespace) -> dict:
+    inputs = {
+        "synthetic": synthetic_samples(args.samples),
+        "recorded": tile_samples(recorded_samples(args.data), args.samples),
+    }
+
+    results = {}
+    for prefix, data in inputs.items():
+        results.update(bench_strategies(data, args.span, prefix))
+        results.update(bench_buffer(data, args.span, args.buffer_size, prefix))
+        results.update(bench_detector(data, args.span, prefix))
+        results.update(bench_collectors(data, prefix))
+
+    return results
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--data",
+        type=str,
+        default=str(DEFAULT_RECORDING),
+        help="Recorded tmf8828 CSV file used as the recorded input",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=50000,
+        help="Number of samples per input",
+    )
+    parser.add_argument(
+        "--span",
+        type=int,
+        default=160,
+        help="Window span used by the GUI, as in Controller",
+    )
+    parser.add_argument(
+        "--buffer-size",
+        type=int,
+        default=10**6,
+        help="Buffer capacity, the buffer is filled to capacity before measuring reads",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Path to save the results as JSON",
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    results = run(args)
+    print_results(results)
+
+    if args.output:
+        save_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
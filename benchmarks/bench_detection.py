@@ -0,0 +1,122 @@
+"""Benchmarks of the batch pipeline in detection/utils.py, stage by stage and end to end."""
+
+from common import *
+
+import os
+import sys
+import argparse
+import contextlib
+
+import pandas as pd
+
+sys.path.insert(0, str(DETECTION_DIR))
+
+from config import COLUMNS
+from utils import (
+    load_tmf8828_data,
+    select_center_zone_distance,
+    partition_center_zone_distance_measurements,
+    merge_adjecent_series,
+    extract_motions,
+    confidence_strategy,
+    target_0_strategy,
+)
+
+
+def to_dataframe(data: np.ndarray) -> pd.DataFrame:
+    return pd.DataFrame(data, columns=COLUMNS).drop(columns=["ambient_light"])
+
+
+def bench_pipeline(df: pd.DataFrame, prefix: str, repeat: int) -> dict:
+    results = {}
+    n = len(df)
+
+    for name, strategy in [("target_0", target_0_strategy), ("confidence", confidence_strategy)]:
+        results[f"{prefix}/select_center_zone_distance[{name}]"] = measure_once(
+            lambda: select_center_zone_distance(df, strategy), samples=n, repeat=repeat
+        )
+
+    distances = select_center_zone_distance(df, confidence_strategy)
+    results[f"{prefix}/partition_center_zone_distance_measurements"] = measure_once(
+        lambda: partition_center_zone_distance_measurements(distances, min_samples=3, max_dd=200),
+        samples=n,
+        repeat=repeat,
+    )
+
+    series = partition_center_zone_distance_measurements(distances, min_samples=3, max_dd=200)
+    results[f"{prefix}/merge_adjecent_series"] = measure_once(
+        lambda: merge_adjecent_series(series, max_time_delta_ms=500), samples=n, repeat=repeat
+    )
+
+    results[f"{prefix}/extract_motions"] = measure_once(
+        lambda: extract_motions(
+            df, distStrategy=confidence_strategy, min_samples=3, max_dd=200, max_series_delta_time_ms=500
+        ),
+        samples=n,
+        repeat=repeat,
+    )
+
+    return results
+
+
+def run(args: argparse.Namespace) -> dict:
+    results = {}
+
+    # The pipeline prints a warning per skipped sample, keep it out of the timings
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        recorded_rows = len(recorded_samples(args.data))
+        results["recorded/load_tmf8828_data"] = measure_once(
+            lambda: load_tmf8828_data(args.data), samples=recorded_rows, repeat=args.repeat
+        )
+
+        inputs = {
+            "synthetic": to_dataframe(synthetic_samples(args.samples)),
+            "recorded": to_dataframe(tile_samples(recorded_samples(args.data), args.samples)),
+        }
+
+        for prefix, df in inputs.items():
+            results.update(bench_pipeline(df, prefix, args.repeat))
+
+    return results
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--data",
+        type=str,
+        default=str(DEFAULT_RECORDING),
+        help="Recorded tmf8828 CSV file used as the recorded input",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=50000,
+        help="Number of samples per input",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of timed runs per whole-recording benchmark",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Path to save the results as JSON",
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    results = run(args)
+    print_results(results)
+
+    if args.output:
+        save_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
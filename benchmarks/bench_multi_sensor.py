@@ -0,0 +1,103 @@
+"""Detection throughput of app/multi_sensor.py with 1..N sensors, each detected in its own process.
+
+Every ring is filled with the same synthetic recording before the detector processes start, so only the
+detectors are measured. Speedup is relative to a single sensor, close to N means linear scaling.
+"""
+
+from common import *
+
+import os
+import sys
+import argparse
+import threading
+import multiprocessing as mp
+
+sys.path.insert(0, str(APP_DIR))
+
+from multi_sensor import SharedRing, detect_stream
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=100000,
+        help="Number of samples per sensor",
+    )
+    parser.add_argument(
+        "--max-sensors",
+        type=int,
+        default=os.cpu_count(),
+        help="Largest number of sensors measured",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Path to save the results as JSON",
+    )
+    return parser.parse_args()
+
+
+def run(num_sensors: int, data: np.ndarray) -> float:
+    """Wall time in s until all detectors processed the whole recording."""
+    rings = [SharedRing(len(data)) for _ in range(num_sensors)]
+    for ring in rings:
+        for sample in data:
+            ring.write(sample)
+
+    events = mp.Queue()
+    stop = mp.Event()
+    stop.set()  # Detectors drain their ring and exit
+
+    processes = [
+        mp.Process(
+            target=detect_stream,
+            args=(sensor_id, ring.name, ring.capacity, "target_0", None, events, stop, 1024, 0.001),
+        )
+        for sensor_id, ring in enumerate(rings)
+    ]
+
+    # A process does not exit before its queued events are read
+    drain = threading.Thread(target=lambda: list(iter(events.get, None)), daemon=True)
+    drain.start()
+
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed_s = time.perf_counter() - start
+
+    events.put(None)
+    drain.join()
+
+    for ring in rings:
+        assert ring.header[SharedRing.READ] == len(data)
+        ring.close()
+
+    return elapsed_s
+
+
+def main() -> None:
+    args = parse_args()
+    data = synthetic_samples(args.samples)
+
+    results = {}
+    single = None
+    print(f"{'sensors':>8} {'samples/s':>14} {'speedup':>10}")
+    for num_sensors in range(1, args.max_sensors + 1):
+        elapsed_s = run(num_sensors, data)
+        samples_per_sec = num_sensors * len(data) / elapsed_s
+        single = single or samples_per_sec
+        results[num_sensors] = {"samples_per_sec": samples_per_sec, "speedup": samples_per_sec / single}
+        print(f"{num_sensors:>8} {samples_per_sec:>14.0f} {samples_per_sec / single:>10.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({**report_header(), "results": results}, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Startup time and peak RSS of app/main.py in headless and GUI mode.
+
+Each mode runs in a fresh process streaming the sensor simulation, headless mode stops right after startup
+and GUI mode uses the non-interactive Agg backend, whose plt.show() returns immediately.
+"""
+
+from common import *
+
+import os
+import sys
+import argparse
+
+
+MODES = {
+    "headless": ["--headless", "--run-for", "0"],
+    "gui": [],
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Number of runs per mode, the median is reported",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Path to save the results as JSON",
+    )
+    return parser.parse_args()
+
+
+def run_once(mode_args: list[str]) -> tuple[float, float]:
+    """Wall time in s and peak RSS in MB of a single run."""
+    env = {**os.environ, "MPLBACKEND": "Agg"}
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "main.py", "--sim", "--sim-seed", "0", *mode_args],
+        cwd=APP_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    _, status, rusage = os.wait4(process.pid, 0)
+    elapsed_s = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    if process.returncode != 0:
+        raise RuntimeError(f"exited with {process.returncode}")
+
+    # ru_maxrss is in kB on Linux
+    return elapsed_s, rusage.ru_maxrss / 2**10
+
+
+def main() -> None:
+    args = parse_args()
+
+    results = {}
+    print(f"{'mode':<12} {'startup s':>10} {'peak RSS MB':>12}")
+    for mode, mode_args in MODES.items():
+        try:
+            runs = np.array([run_once(mode_args) for _ in range(args.repeat)])
+        except RuntimeError as e:
+            print(f"{mode:<12} failed: {e}")
+            continue
+
+        startup_s, rss_mb = np.median(runs, axis=0)
+        results[mode] = {"startup_s": float(startup_s), "peak_rss_mb": float(rss_mb), "runs": args.repeat}
+        print(f"{mode:<12} {startup_s:>10.3f} {rss_mb:>12.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({**report_header(), "startup": results}, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
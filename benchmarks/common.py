@@ -0,0 +1,146 @@
+import json
+import time
+import platform
+import subprocess
+
+import numpy as np
+
+from pathlib import Path
+from typing import Callable, Optional
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+APP_DIR = ROOT_DIR / "app"
+DETECTION_DIR = ROOT_DIR / "detection"
+DEFAULT_RECORDING = ROOT_DIR / "data" / "random-movement-1719437141.csv"
+
+NUM_ZONES = 9
+NUM_TARGETS = 2
+NUM_COLUMNS = 2 + NUM_ZONES * NUM_TARGETS * 2
+CENTER_ZONE_IDX = 4
+PERCENTILES = [50, 90, 99]
+
+
+# ----------------------------------- INPUTS --------------------------------- #
+
+
+def synthetic_samples(n: int, period_ms: int = 33, seed: int = 0) -> np.ndarray:
+    """Raw tmf8828 rows (timestamp, ambient, conf/dist pairs), empty scene with a center zone
+    crossing of 20 monotonic samples every 200 samples and noisy second targets."""
+    rng = np.random.default_rng(seed)
+
+    data = np.full((n, NUM_COLUMNS), -1, dtype=np.int64)
+    data[:, 0] = 1_700_000_000_000 + np.arange(n, dtype=np.int64) * period_ms
+    data[:, 1] = rng.integers(50, 100, n)
+
+    zones = data[:, 2:].reshape(n, NUM_ZONES, NUM_TARGETS, 2)
+    crossing = np.arange(n) % 200 < 20
+    crossing_step = np.arange(n) % 200
+    zones[crossing, CENTER_ZONE_IDX, 0, 0] = rng.integers(100, 255, crossing.sum())
+    zones[crossing, CENTER_ZONE_IDX, 0, 1] = 3000 - crossing_step[crossing] * 75
+
+    noise = rng.random((n, NUM_ZONES)) < 0.05
+    zones[..., 1, 0][noise] = rng.integers(1, 100, noise.sum())
+    zones[..., 1, 1][noise] = rng.integers(500, 5000, noise.sum())
+
+    return data
+
+
+def recorded_samples(file: Path) -> np.ndarray:
+    return np.loadtxt(file, delimiter=",", dtype=np.int64, ndmin=2)
+
+
+def tile_samples(data: np.ndarray, n: int) -> np.ndarray:
+    """Repeats a recording up to n rows, keeping timestamps strictly increasing."""
+    repeats = -(-n // len(data))
+    tiled = np.tile(data, (repeats, 1))[:n]
+    span = data[-1, 0] - data[0, 0] + 1
+    tiled[:, 0] += np.repeat(np.arange(repeats, dtype=np.int64) * span, len(data))[:n]
+    return tiled
+
+
+# ---------------------------------- MEASURE --------------------------------- #
+
+
+def measure(
+    fn: Callable[[int], None],
+    calls: int,
+    samples_per_call: int = 1,
+    warmup: int = 10,
+    setup: Optional[Callable[[], None]] = None,
+) -> dict:
+    """Calls fn(i) `calls` times and reports throughput and per-call latency percentiles."""
+    if setup is not None:
+        setup()
+
+    for i in range(min(warmup, calls)):
+        fn(i)
+
+    latencies = np.empty(calls, dtype=np.int64)
+    start = time.perf_counter_ns()
+    for i in range(calls):
+        t0 = time.perf_counter_ns()
+        fn(i)
+        latencies[i] = time.perf_counter_ns() - t0
+    total_ns = time.perf_counter_ns() - start
+
+    latencies_us = latencies / 1000.0
+    return {
+        "calls": calls,
+        "samples": calls * samples_per_call,
+        "total_s": total_ns / 1e9,
+        "samples_per_sec": calls * samples_per_call / (total_ns / 1e9),
+        "latency_us": {
+            **{f"p{p}": float(np.percentile(latencies_us, p)) for p in PERCENTILES},
+            "mean": float(latencies_us.mean()),
+            "max": float(latencies_us.max()),
+        },
+    }
+
+
+def measure_once(fn: Callable[[], None], samples: int, repeat: int = 3) -> dict:
+    """For whole-recording benchmarks, each call processes `samples` rows."""
+    return measure(lambda _: fn(), calls=repeat, samples_per_call=samples, warmup=1)
+
+
+# ---------------------------------- REPORT ---------------------------------- #
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return "unknown"
+
+
+def report_header() -> dict:
+    return {
+        "commit": git_commit(),
+        "time": int(time.time()),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def print_results(results: dict) -> None:
+    print(f"{'benchmark':<64} {'samples/s':>14} {'p50 us':>10} {'p90 us':>10} {'p99 us':>10} {'max us':>10}")
+    for name, result in results.items():
+        latency = result["latency_us"]
+        print(
+            f"{name:<64} {result['samples_per_sec']:>14.0f} {latency['p50']:>10.1f} "
+            f"{latency['p90']:>10.1f} {latency['p99']:>10.1f} {latency['max']:>10.1f}"
+        )
+
+
+def save_results(path: str, results: dict) -> None:
+    with open(path, "w") as f:
+        json.dump({**report_header(), "results": results}, f, indent=2)
+
+    print(f"Saved results to {path}")
+
+
+def load_results(path: str) -> dict:
+    with open(path, "r") as f:
+        return json.load(f)
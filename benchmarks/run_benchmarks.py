@@ -0,0 +1,105 @@
+"""Runs every benchmark suite, saves the merged results as JSON and optionally compares to a previous run.
+
+app/ and detection/ both use top level `config`/`utils` modules, so each suite runs in its own process.
+"""
+
+from common import *
+
+import sys
+import argparse
+import tempfile
+
+
+SUITES = {
+    "app": Path(__file__).resolve().parent / "bench_app.py",
+    "detection": Path(__file__).resolve().parent / "bench_detection.py",
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--suite",
+        type=str,
+        choices=list(SUITES.keys()),
+        action="append",
+        help="Suite to run, can be repeated (default: all)",
+    )
+    parser.add_argument(
+        "--data",
+        type=str,
+        default=str(DEFAULT_RECORDING),
+        help="Recorded tmf8828 CSV file used as the recorded input",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=50000,
+        help="Number of samples per input",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Path to save the results as JSON (default: benchmarks/results/<commit>.json)",
+    )
+    parser.add_argument(
+        "--compare",
+        type=str,
+        help="Previous results JSON to compare against",
+    )
+    return parser.parse_args()
+
+
+def run_suite(script: Path, args: argparse.Namespace) -> dict:
+    with tempfile.NamedTemporaryFile(suffix=".json") as output:
+        subprocess.run(
+            [sys.executable, str(script), "--data", args.data, "--samples", str(args.samples), "--output", output.name],
+            cwd=script.parent,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        return load_results(output.name)["results"]
+
+
+def compare(results: dict, baseline: dict) -> None:
+    print(f"\nComparison against {baseline['commit']}:")
+    print(f"{'benchmark':<64} {'samples/s':>14} {'baseline':>14} {'speedup':>8} {'p99 ratio':>10}")
+    for name, result in results.items():
+        if name not in baseline["results"]:
+            continue
+
+        base = baseline["results"][name]
+        speedup = result["samples_per_sec"] / base["samples_per_sec"]
+        p99_ratio = result["latency_us"]["p99"] / base["latency_us"]["p99"]
+        print(
+            f"{name:<64} {result['samples_per_sec']:>14.0f} {base['samples_per_sec']:>14.0f} "
+            f"{speedup:>7.2f}x {p99_ratio:>10.2f}"
+        )
+
+
+def main() -> None:
+    args = parse_args()
+    suites = args.suite if args.suite else list(SUITES.keys())
+
+    results = {}
+    for suite in suites:
+        print(f"Running {suite} benchmarks")
+        results.update({f"{suite}/{name}": result for name, result in run_suite(SUITES[suite], args).items()})
+
+    print()
+    print_results(results)
+
+    output = args.output
+    if output is None:
+        results_dir = Path(__file__).resolve().parent / "results"
+        results_dir.mkdir(exist_ok=True)
+        output = str(results_dir / f"{git_commit()}.json")
+
+    save_results(output, results)
+
+    if args.compare:
+        compare(results, load_results(args.compare))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
 import argparse
+import sys
+from pathlib import Path
 from utils import *
-from config import THRESHOLD_KMH
+from config import THRESHOLD_KMH, DIST_TO_PATH
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "app"))
+
+from velocity_estimator import StreamingVelocityEstimator
 
 # ----------------------------------- ARGS ----------------------------------- #
 
@@ -33,6 +39,13 @@ def parse_args() -> argparse.Namespace:
         type=str,
         help="Path of the test tmf8828 data CSV file, without labels",
     )
+    add_parameter_args(parser)
+
+    return parser.parse_args()
+
+
+def add_parameter_args(parser: argparse.ArgumentParser) -> None:
+    """Detection parameters, shared with the dataset runner in evaluate_dataset.py."""
     parser.add_argument(
         "--min-samples",
         "-m",
@@ -78,8 +91,94 @@ def parse_args() -> argparse.Namespace:
         default=THRESHOLD_KMH,
         help="Velocity threshold for bike detection",
     )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Compare provisional detections of the streaming velocity estimator with the batch motions",
+    )
+    parser.add_argument(
+        "--confidence-z",
+        required=False,
+        type=float,
+        default=2.0,
+        help="Standard deviations above the threshold needed for a provisional detection",
+    )
+    parser.add_argument(
+        "--provisional-min-samples",
+        required=False,
+        type=int,
+        default=5,
+        help="Distances tracked before a provisional detection",
+    )
 
-    return parser.parse_args()
+
+# --------------------------- STREAMING COMPARISON --------------------------- #
+
+
+def streaming_estimates(samples: np.ndarray, args: argparse.Namespace) -> list:
+    """Provisional detections over the (timestamp, distance) samples, in the order the live detector emits them."""
+    estimator = StreamingVelocityEstimator(
+        threshold_kmh=args.threshold,
+        dist_to_path=DIST_TO_PATH,
+        confidence_z=args.confidence_z,
+        min_samples=max(args.min_samples, args.provisional_min_samples),
+        max_dd=args.max_dd,
+        max_gap_ms=args.max_dt,
+    )
+    return [estimate for t, d in samples.tolist() if (estimate := estimator.update(t, d)) is not None]
+
+
+def match_estimates(X: list[Motion], estimates: list, max_dt: int) -> list:
+    """First provisional detection of each motion, decided before the live detector would flush it, or None."""
+    times = np.array([estimate.time for estimate in estimates], dtype=np.int64)
+    matches = []
+    for motion in X:
+        i = np.searchsorted(times, motion.time_start)
+        matched = i < len(estimates) and estimates[i].time <= motion.time_end + max_dt
+        matches.append(estimates[i] if matched else None)
+    return matches
+
+
+def evaluate_streaming(tmf8828_data: pd.DataFrame, X: list[Motion], y: list[float], args: argparse.Namespace) -> None:
+    strategy = confidence_strategy if args.dist_strategy == "confidence" else target_0_strategy
+    samples = select_center_zone_distance(tmf8828_data, strategy).to_numpy(dtype=np.int64)
+    timestamps = samples[:, 0]
+
+    estimates = streaming_estimates(samples, args)
+    matches = match_estimates(X, estimates, args.max_dt)
+
+    # The live detector flushes a motion on the first sample more than max_dt after its last one
+    def flush_delay(motion: Motion) -> int:
+        i = np.searchsorted(timestamps, motion.time_end + args.max_dt, side="right")
+        return int(timestamps[min(i, len(timestamps) - 1)] - motion.time_end)
+
+    bikes = [(motion, label, match) for motion, label, match in zip(X, y, matches) if label >= args.threshold]
+    others = [(motion, match) for motion, label, match in zip(X, y, matches) if label < args.threshold]
+    detected = [(motion, label) for motion, label, _ in bikes if motion.velocity >= args.threshold]
+    provisional = [(motion, label, match) for motion, label, match in bikes if match is not None]
+
+    print(f"Streaming comparison on {len(bikes)} labeled bicycles:")
+    if detected:
+        delays = [flush_delay(motion) for motion, _ in detected]
+        mae = np.mean([abs(motion.velocity - label) for motion, label in detected])
+        print(
+            f"  batch: {len(detected)} detected, decided {np.median(delays):.0f} ms "
+            f"(p90 {np.percentile(delays, 90):.0f} ms) after the last sample, MAE {mae:.2f} kmh"
+        )
+    if provisional:
+        delays = [match.time - motion.time_end for motion, _, match in provisional]
+        mae = np.mean([abs(match.velocity - label) for _, label, match in provisional])
+        batch_mae = np.mean([abs(motion.velocity - label) for motion, label, _ in provisional])
+        print(
+            f"  streaming: {len(provisional)} provisional, decided {np.median(delays):.0f} ms "
+            f"(p90 {np.percentile(delays, 90):.0f} ms) after the last sample, MAE {mae:.2f} kmh "
+            f"(batch {batch_mae:.2f} kmh on the same motions)"
+        )
+    print(
+        f"  non-bicycles: {sum(motion.velocity >= args.threshold for motion, _ in others)} batch, "
+        f"{sum(match is not None for _, match in others)} provisional false detections out of {len(others)}"
+    )
+    print(f"  {len(estimates) - sum(match is not None for match in matches)} provisional detections without a motion")
 
 
 # ----------------------------------- MAIN ----------------------------------- #
@@ -118,10 +217,13 @@ def main() -> None:
 
     print(f"Bicycle classification accuracy: {(sum([motion.velocity >= args.threshold for motion in X])) / args.num_samples * 100:.2f}%")
 
+    if args.streaming:
+        evaluate_streaming(tmf8828_data, X, y, args)
+
     fig, (ax1, ax2) = plt.subplots(2, 1, sharex=True)
     ax1.set_ylim(0, 5500)
     ax2.set_ylim(0, 35)
-    # plot_raw_data(tmf8828_data, ax1)
+    plot_raw_data(tmf8828_data, ax1)
     plot_samples_partitioning(X, ax1)
     plot_real_velocity(X, y, ax2)
     plot_calculated_velocity(X, ax2)
@@ -142,9 +244,15 @@ def main() -> None:
 
         print(f"Pedestrian classification accuracy: {(sum([motion.velocity < args.threshold for motion in X]) / len(X)) * 100:.2f}%")
 
+        if args.streaming:
+            strategy = confidence_strategy if args.dist_strategy == "confidence" else target_0_strategy
+            samples = select_center_zone_distance(validation_data, strategy).to_numpy(dtype=np.int64)
+            print(f"Pedestrian provisional detections: {len(streaming_estimates(samples, args))} for {len(X)} motions")
+
         fig, (ax1, ax2) = plt.subplots(2, 1, sharex=True)
         ax1.set_ylim(0, 5500)
         ax2.set_ylim(0, 35)
+        plot_raw_data(validation_data, ax1)
         plot_samples_partitioning(X, ax1)
         plot_calculated_velocity(X, ax2)
         plot_velocity_threshold(args.threshold, ax2)
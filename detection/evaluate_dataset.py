@@ -0,0 +1,230 @@
+"""
+Evaluation of every recording listed in a dataset manifest with one parameter set.
+
+The manifest (data/manifest.csv) lists each recording with its velocity labels, role and sample counts. Bike
+recordings are labeled, pedestrian and random movement recordings are not, every motion found in them is a
+non-bicycle. Recordings are evaluated concurrently on a process pool, largest first, so the whole dataset takes
+about as long as its slowest recording. Per-recording, per-role and overall metrics are reported in one table.
+"""
+
+import os
+import time
+import argparse
+import contextlib
+
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import *
+from batch_evaluation import add_parameter_args, streaming_estimates, match_estimates
+
+
+ROLES = ["bike", "pedestrian", "random"]
+
+
+# ----------------------------------- ARGS ----------------------------------- #
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Script for bicycle detection algorithm evaluation over a whole dataset.",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=str(Path(__file__).resolve().parent.parent / "data" / "manifest.csv"),
+        help="Dataset manifest CSV, paths in it are relative to its directory",
+    )
+    parser.add_argument(
+        "--roles",
+        type=str,
+        nargs="+",
+        choices=ROLES,
+        default=ROLES,
+        help="Only evaluate recordings with these roles",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Path to save the report table as CSV",
+    )
+    add_parameter_args(parser)
+
+    return parser.parse_args()
+
+
+# --------------------------------- MANIFEST --------------------------------- #
+
+
+def load_manifest(file: str) -> pd.DataFrame:
+    """Columns: recording, labels (bike recordings only), role, rows (lines in the recording, empty if unknown)
+    and num_samples (recorded bike passes)."""
+    manifest = pd.read_csv(file, dtype={"recording": str, "labels": str, "role": str})
+
+    unknown = set(manifest["role"]) - set(ROLES)
+    if unknown:
+        raise ValueError(f"Unknown roles in {file}: {sorted(unknown)}")
+    if manifest.loc[manifest["role"] == "bike", "labels"].isna().any():
+        raise ValueError(f"Bike recordings in {file} must have a labels file")
+
+    directory = Path(file).resolve().parent
+    manifest["recording"] = [str(directory / recording) for recording in manifest["recording"]]
+    manifest["labels"] = [str(directory / labels) if isinstance(labels, str) else None for labels in manifest["labels"]]
+    return manifest
+
+
+# --------------------------------- EVALUATE --------------------------------- #
+
+
+def evaluate_recording(entry: dict, args: argparse.Namespace) -> dict:
+    start = time.perf_counter()
+    strategy = confidence_strategy if args.dist_strategy == "confidence" else target_0_strategy
+
+    # Partitioning warns about every degenerate series, keep worker output readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        tmf8828_data = load_tmf8828_data(entry["recording"])
+        if entry["role"] == "bike":
+            velocity_labels = load_velocity_labels(entry["labels"])
+            X, y = prepare_labeled_data(
+                tmf8828_data,
+                velocity_labels,
+                distStrategy=strategy,
+                velocityLabelStrategy=video_strategy if args.velocity_strategy == "video" else gps_strategy,
+                min_samples=args.min_samples,
+                max_dd=args.max_dd,
+                max_series_delta_time_ms=args.max_dt,
+                max_label_delta_time_ms=2000,
+            )
+        else:
+            X = prepare_unlabeled_data(
+                tmf8828_data,
+                distStrategy=strategy,
+                min_samples=args.min_samples,
+                max_dd=args.max_dd,
+                max_series_delta_time_ms=args.max_dt,
+            )
+            y = []
+
+        if args.streaming:
+            samples = select_center_zone_distance(tmf8828_data, strategy).to_numpy(dtype=np.int64)
+            estimates = streaming_estimates(samples, args)
+
+    velocities = np.array([motion.velocity for motion in X])
+    result = {
+        "recording": Path(entry["recording"]).name,
+        "role": entry["role"],
+        "rows": len(tmf8828_data),
+        "motions": len(X),
+        "bicycles": int(np.sum(velocities >= args.threshold)),
+        "labels": len(velocity_labels) if entry["role"] == "bike" else 0,
+        "num_samples": int(entry["num_samples"]) if entry["role"] == "bike" else 0,
+        "absolute_errors": np.abs(velocities - np.array(y)) if entry["role"] == "bike" else np.array([]),
+    }
+
+    if args.streaming:
+        matches = match_estimates(X, estimates, args.max_dt)
+        result["provisional"] = len(estimates)
+        result["provisional_motions"] = sum(match is not None for match in matches)
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+# -------------------------------- AGGREGATE --------------------------------- #
+
+
+def summarize(recording: str, role: str, results: list[dict]) -> dict:
+    """One report row over the results. Bike motions above the threshold count as correct out of the recorded
+    bike passes, other motions below the threshold count as correct out of the motions found. Seconds is the
+    time of the slowest recording."""
+    bikes = [result for result in results if result["role"] == "bike"]
+    others = [result for result in results if result["role"] != "bike"]
+
+    labels = sum(result["labels"] for result in bikes)
+    errors = np.concatenate([result["absolute_errors"] for result in bikes] or [np.array([])])
+    correct = sum(r["bicycles"] for r in bikes) + sum(r["motions"] - r["bicycles"] for r in others)
+    total = sum(r["num_samples"] for r in bikes) + sum(r["motions"] for r in others)
+
+    row = {
+        "recording": recording,
+        "role": role,
+        "rows": sum(result["rows"] for result in results),
+        "motions": sum(result["motions"] for result in results),
+        "bicycles": sum(result["bicycles"] for result in results),
+        "detection_rate": sum(result["motions"] for result in bikes) / labels if labels > 0 else np.nan,
+        "mae": errors.mean() if len(errors) > 0 else np.nan,
+        "accuracy": correct / total if total > 0 else np.nan,
+    }
+    if "provisional" in results[0]:
+        row["provisional"] = sum(result["provisional"] for result in results)
+        row["provisional_motions"] = sum(result["provisional_motions"] for result in results)
+
+    row["seconds"] = max(result["seconds"] for result in results)
+    return row
+
+
+def report(results: list[dict]) -> pd.DataFrame:
+    rows = [summarize(result["recording"], result["role"], [result]) for result in results]
+
+    roles = [role for role in ROLES if any(result["role"] == role for result in results)]
+    for role in roles:
+        rows.append(summarize("total", role, [result for result in results if result["role"] == role]))
+    if len(roles) > 1:
+        rows.append(summarize("total", "all", results))
+
+    return pd.DataFrame(rows)
+
+
+# ----------------------------------- MAIN ----------------------------------- #
+
+
+def main() -> None:
+    args = parse_args()
+
+    manifest = load_manifest(args.manifest)
+    entries = manifest[manifest["role"].isin(args.roles)].to_dict("records")
+
+    for entry in entries:
+        if not Path(entry["recording"]).exists():
+            print(f"Skipping {Path(entry['recording']).name}, the recording is missing")
+    entries = [entry for entry in entries if Path(entry["recording"]).exists()]
+    if not entries:
+        print("No recordings to evaluate")
+        return
+
+    # Largest recordings first, so that the slowest one does not start last
+    order = sorted(range(len(entries)), key=lambda i: -os.path.getsize(entries[i]["recording"]))
+    workers = max(1, min(args.workers, len(entries)))
+
+    print(f"Evaluating {len(entries)} recordings on {workers} workers")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {i: executor.submit(evaluate_recording, entries[i], args) for i in order}
+        results = [futures[i].result() for i in range(len(entries))]
+    wall_time = time.perf_counter() - start
+
+    for entry, result in zip(entries, results):
+        if not pd.isna(entry["rows"]) and int(entry["rows"]) != result["rows"]:
+            print(f"Warning: {result['recording']} has {result['rows']} rows, the manifest lists {int(entry['rows'])}")
+
+    table = report(results)
+    print(table.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    print(
+        f"Evaluated in {wall_time:.2f} s, the slowest recording took {max(r['seconds'] for r in results):.2f} s "
+        f"and all of them {sum(r['seconds'] for r in results):.2f} s"
+    )
+
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f"Saved report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -28,6 +28,34 @@ def parse_args() -> argparse.Namespace:
         type=str,
         help="Path of the test tmf8828 data CSV file",
     )
+    parser.add_argument(
+        "--model",
+        required=False,
+        type=str,
+        choices=list(ESTIMATORS.keys()),
+        default="linear",
+        help="Regression estimator used for velocity correction",
+    )
+    parser.add_argument(
+        "--n-splits",
+        required=False,
+        type=int,
+        default=5,
+        help="Number of cross-validation folds",
+    )
+    parser.add_argument(
+        "--n-jobs",
+        required=False,
+        type=int,
+        default=-1,
+        help="Number of worker processes used for cross-validation (-1 uses all cores)",
+    )
+    parser.add_argument(
+        "--save-model",
+        required=False,
+        type=str,
+        help="Path to save the trained model for app/main.py --velocity-model (.npz for linear models or .joblib)",
+    )
 
     return parser.parse_args()
 
@@ -36,52 +64,76 @@ def parse_args() -> argparse.Namespace:
 
 
 from sklearn.model_selection import KFold
-from sklearn.linear_model import LinearRegression
+from sklearn.linear_model import LinearRegression, Lasso, Ridge, ElasticNet
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.svm import SVR
+from joblib import Parallel, delayed
+import joblib
+
+
+ESTIMATORS = {
+    "linear": LinearRegression,
+    "lasso": Lasso,
+    "ridge": Ridge,
+    "elastic-net": ElasticNet,
+    "random-forest": RandomForestRegressor,
+    "svr": SVR,
+}
 
 
 def extract_features(X: list[Motion]) -> np.ndarray:
-    return np.array([[m.time_total, m.dist_avg, m.direction, m.velocity] for m in X])
+    return motion_feature_matrix(X)
+
+
+def evaluate_fold(
+    model_name: str, X: np.ndarray, y: np.ndarray, train_index: np.ndarray, test_index: np.ndarray
+) -> float:
+    model = ESTIMATORS[model_name]()
+    model.fit(X[train_index], y[train_index])
+
+    y_pred = model.predict(X[test_index])
+    return np.mean(np.abs(y_pred - y[test_index]))
 
 
-def train_linear_regression(X: list[Motion], y: list[float]) -> Any:
+def train_linear_regression(
+    X: list[Motion], y: list[float], model_name: str = "linear", n_splits: int = 5, n_jobs: int = -1
+) -> Any:
     X, y = extract_features(X), np.array(y)
 
-    n_splits = 5
     kf = KFold(n_splits=n_splits, shuffle=True, random_state=42)
 
-    mae_scores = []
-    for train_index, test_index in kf.split(X):
-        # Splitting the data for this fold
-        X_train, X_test = [X[i] for i in train_index], [X[i] for i in test_index]
-        y_train, y_test = y[train_index], y[test_index]
-
-        # Initialize and fit the model
-        model = LinearRegression()
-        # model = Lasso()
-        # model = Ridge()
-        # model = ElasticNet()
-        # model = RandomForestRegressor()
-        # model = SVR()
-        model.fit(X_train, y_train)
-
-        # Make predictions and evaluate
-        y_pred = model.predict(X_test)
-        mae = sum(abs(y_pred - y_test)) / len(y_pred)
-        mae_scores.append(mae)
+    # Folds are independent, fit them concurrently
+    mae_scores = Parallel(n_jobs=n_jobs)(
+        delayed(evaluate_fold)(model_name, X, y, train_index, test_index)
+        for train_index, test_index in kf.split(X)
+    )
 
     # Calculate and print the average MAE across all folds
-    average_mae = sum(mae_scores) / n_splits
-    average_velocity = sum(y) / len(y)
+    average_mae = np.mean(mae_scores)
+    average_velocity = np.mean(y)
+    print(f"Model: {model_name}")
     print(f"Average velocity: {average_velocity}")
     print(f"Average MAE across {n_splits} folds: {average_mae}")
 
     # Train on the whole dataset and return
-    model = LinearRegression()
+    model = ESTIMATORS[model_name]()
     model.fit(X, y)
 
     return model
 
 
+def save_model(model: Any, path: str) -> None:
+    if path.endswith(".npz"):
+        if not hasattr(model, "coef_"):
+            raise ValueError(f"{type(model).__name__} is not a linear model, save it as .joblib instead")
+
+        np.savez(path, features=np.array(MOTION_FEATURES), coef=model.coef_, intercept=model.intercept_)
+    else:
+        joblib.dump({"features": MOTION_FEATURES, "estimator": model}, path)
+
+    print(f"Saved model to {path}")
+
+
 def main() -> None:
     args = parse_args()
     tmf8828_data = load_tmf8828_data(args.data)
@@ -103,9 +155,12 @@ def main() -> None:
 
     print("Detection percentage:", len(y) / len(velocity_labels) * 100, "%")
 
-    model = train_linear_regression(X, y)
+    model = train_linear_regression(X, y, model_name=args.model, n_splits=args.n_splits, n_jobs=args.n_jobs)
     y_pred = model.predict(extract_features(X))
 
+    if args.save_model:
+        save_model(model, args.save_model)
+
     fig, (ax1, ax2) = plt.subplots(2, 1, sharex=True)
     plot_samples_partitioning(X, ax1)
     plot_real_velocity(X, y, ax2)
@@ -48,102 +48,107 @@ def select_center_zone_distance(df: pd.DataFrame, strategy: Callable[[pd.Series]
 
 
 class MonotonicSeries:
-    def __init__(self, samples: list[Tuple[int, int]]) -> None:
+    """Series of (timestamp, distance) samples, a [start, end) index range into the samples of a recording.
+
+    The samples are not copied, `samples` is a view of the (n, 2) recording array.
+    """
+
+    def __init__(self, recording: np.ndarray, start: int, end: int) -> None:
+        samples = recording[start:end]
         self._validate_monotonicity(samples)
-        self._samples = samples
+        self._recording = recording
+        self.start = start
+        self.end = end
 
-        self.time_start = samples[0][0]
-        self.time_end = samples[-1][0]
+        timestamps, distances = samples[:, 0], samples[:, 1]
+        self.time_start = int(timestamps[0])
+        self.time_end = int(timestamps[-1])
         self.time_total = self.time_end - self.time_start
 
-        self.dist_start = samples[0][1]
-        self.dist_end = samples[-1][1]
-        self.dist_avg = sum(dist for _, dist in samples) / len(samples)
+        self.dist_start = int(distances[0])
+        self.dist_end = int(distances[-1])
+        self.dist_avg = int(distances.sum()) / len(samples)
 
         self.direction = -1 if self.dist_start < self.dist_end else 1
         self.velocity = self._calculate_avg_velocity()
 
+    @property
+    def samples(self) -> np.ndarray:
+        return self._recording[self.start : self.end]
+
     def __len__(self) -> int:
-        return len(self._samples)
+        return self.end - self.start
 
-    def _validate_monotonicity(self, samples: list[Tuple[int, int]]) -> None:
+    def _validate_monotonicity(self, samples: np.ndarray) -> None:
         assert len(samples) >= 2
 
-        direction = samples[1] > samples[0]
-        for i in range(1, len(samples)):
-            assert (samples[i] > samples[i - 1]) == direction
+        # Lexicographic comparison of consecutive (timestamp, distance) samples
+        t, d = samples[:, 0], samples[:, 1]
+        increasing = (t[1:] > t[:-1]) | ((t[1:] == t[:-1]) & (d[1:] > d[:-1]))
+        assert (increasing == increasing[0]).all()
 
     def _calculate_avg_velocity(self) -> float:
-        velocities = []
-        for i in range(1, len(self._samples)):
-            t1, d1 = self._samples[i - 1]
-            t2, d2 = self._samples[i]
+        samples = self.samples
+        t1, d1 = samples[:-1, 0], samples[:-1, 1]
+        t2, d2 = samples[1:, 0], samples[1:, 1]
 
-            dt = t2 - t1
-            dd = d2 - d1
+        dt = t2 - t1
+        dd = d2 - d1
 
-            if (dt == 0) or (d2**2 - DIST_TO_PATH**2 <= 0):
-                print("WARNING: Zero division would occur, skipping sample")
-                continue
+        valid = (dt != 0) & (d2**2 - DIST_TO_PATH**2 > 0)
+        if not valid.all():
+            print(f"WARNING: Zero division would occur, skipping {np.sum(~valid)} samples")
 
-            velocity = d2 / np.sqrt(d2**2 - DIST_TO_PATH**2) * dd / dt * 3.6
-            velocities.append(velocity)
+        d2, dd, dt = d2[valid], dd[valid], dt[valid]
+        velocities = (d2 / np.sqrt(d2**2 - DIST_TO_PATH**2) * dd / dt * 3.6).tolist()
 
         if np.std(velocities) > 5:
             print(
                 f"WARNING: High velocity standard deviation: "
-                f"{np.mean(velocities):.2f} +- {np.std(velocities):.2f} kmh at t={t2}"
+                f"{np.mean(velocities):.2f} +- {np.std(velocities):.2f} kmh at t={self.time_end}"
             )
 
         return abs(sum(velocities) / len(velocities))
 
 
 def split_to_non_zero_monotonic_series(
-    samples: list[Tuple[int, int]],
+    distances: np.ndarray,
     min_samples: int,
     max_dd: int,
-) -> list[list[Tuple[int, int]]]:
-
-    def skip_to_next_motion(i) -> int:
-        while i < len(samples) and samples[i][1] == -1:
-            i += 1
-
-        return i
-
-    def flush(result: list[list[Tuple[int, int]]], start: int, end: int) -> None:
-        series = samples[start:end]
-        if (
-            all(abs(series[i][1] - series[i - 1][1]) < max_dd for i in range(1, len(series)))
-            and len(series) >= min_samples
-        ):
-            result.append(series)
+) -> list[Tuple[int, int]]:
+    """[start, end) index ranges of the valid monotonic series, -1 distances separate motions.
+
+    A series ends where the direction changes or the distance jumps by more than max_dd, so only the ends of the
+    series are searched for, not every sample visited.
+    """
+    distances = np.asarray(distances, dtype=np.int64)
+    dd = np.diff(distances)
+    increasing = dd > 0
+    jump = np.abs(dd) > max_dd
+
+    # Pair k (samples k, k + 1) ends a series started before k if its direction differs from pair k - 1
+    breaks = np.flatnonzero(np.concatenate(([False], (increasing[1:] != increasing[:-1]) | jump[1:])))
+    # Running count of pairs too far apart for a valid series
+    invalid = np.concatenate(([0], np.cumsum(np.abs(dd) >= max_dd)))
+
+    def flush(result: list[Tuple[int, int]], start: int, end: int) -> None:
+        if end - start >= min_samples and invalid[end - 1] - invalid[start] == 0:
+            result.append((start, end))
+
+    # Runs of non-zero measurements
+    present = np.concatenate(([False], distances != -1, [False]))
+    edges = np.flatnonzero(present[1:] != present[:-1])
 
     result = []
-    prev_direction = None
-    i = skip_to_next_motion(0)
-    j = i + 1
-
-    while j < len(samples):
-        if samples[j][1] == -1:
-            flush(result, i, j)
-            prev_direction = None
-            i = skip_to_next_motion(j)
-            j = i + 1
-
-        else:
-            direction = samples[j][1] > samples[j - 1][1]
-
-            if prev_direction == None:
-                prev_direction = direction
-
-            elif prev_direction != direction or abs(samples[j][1] - samples[j-1][1]) > max_dd:
-                flush(result, i, j)
-                prev_direction = None
-                i = j
-
-            j += 1
-
-    flush(result, i, j)
+    for run_start, run_end in zip(edges[::2].tolist(), edges[1::2].tolist()):
+        start = run_start
+        b = np.searchsorted(breaks, start + 1)
+        while b < len(breaks) and breaks[b] + 1 < run_end:
+            end = int(breaks[b]) + 1
+            flush(result, start, end)
+            start = end
+            b = np.searchsorted(breaks, start + 1)
+        flush(result, start, run_end)
 
     return result
 
@@ -151,9 +156,9 @@ def split_to_non_zero_monotonic_series(
 def partition_center_zone_distance_measurements(
     df: pd.DataFrame, min_samples: int, max_dd: int
 ) -> list[MonotonicSeries]:
-    samples = df[["timestamp_ms", f"zone{CENTER_ZONE_IDX}_distance"]].values.tolist()
-    series = split_to_non_zero_monotonic_series(samples, min_samples=min_samples, max_dd=max_dd)
-    return [MonotonicSeries(s) for s in series]
+    samples = df[["timestamp_ms", f"zone{CENTER_ZONE_IDX}_distance"]].to_numpy(dtype=np.int64)
+    series = split_to_non_zero_monotonic_series(samples[:, 1], min_samples=min_samples, max_dd=max_dd)
+    return [MonotonicSeries(samples, start, end) for start, end in series]
 
 
 # ------------ MERGE ADJECENT MONOTONIC SERIES INTO MOTION OBJECTS ----------- #
@@ -298,31 +303,128 @@ def prepare_unlabeled_data(
     )
 
 
+# Feature columns used for velocity regression, shared with the live velocity model
+MOTION_FEATURES = ["time_total", "dist_avg", "direction", "velocity"]
+
+
+def motion_feature_matrix(X: list[Motion]) -> np.ndarray:
+    """Builds a (n_motions, n_features) float matrix from the [start, end) index ranges of the motion series.
+
+    Pair velocities and running sums are computed once per recording, the sums over a series are differences of
+    the running sums at its ends, and the series are averaged into their motions with bincount.
+    """
+    # Index ranges of the series, grouped by the recording they index
+    recordings: dict[int, Tuple[np.ndarray, list[Tuple[int, int, int]]]] = {}
+    for i, motion in enumerate(X):
+        for series in motion._monotonic_series:
+            ranges = recordings.setdefault(id(series._recording), (series._recording, []))[1]
+            ranges.append((i, series.start, series.end))
+
+    columns = {feature: np.zeros(len(X)) for feature in ("time_total", "dist_avg", "direction", "velocity")}
+    num_series = np.zeros(len(X), dtype=np.int64)
+
+    for recording, ranges in recordings.values():
+        owner, start, end = np.array(ranges, dtype=np.int64).reshape(-1, 3).T
+        t, d = recording[:, 0], recording[:, 1]
+
+        # Velocity of each pair of consecutive samples, see MonotonicSeries._calculate_avg_velocity()
+        dt, dd, d2 = np.diff(t), np.diff(d), d[1:]
+        valid = (dt != 0) & (d2**2 - DIST_TO_PATH**2 > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            velocities = np.where(valid, d2 / np.sqrt(d2**2 - DIST_TO_PATH**2) * dd / dt * 3.6, 0.0)
+
+        # Series over samples [start, end) has pairs [start, end - 1)
+        velocity_sums = np.concatenate(([0.0], np.cumsum(velocities)))
+        valid_counts = np.concatenate(([0], np.cumsum(valid)))
+        distance_sums = np.concatenate(([0], np.cumsum(d)))
+        series_velocity = np.abs(
+            (velocity_sums[end - 1] - velocity_sums[start]) / (valid_counts[end - 1] - valid_counts[start])
+        )
+        series_dist_avg = (distance_sums[end] - distance_sums[start]) / (end - start)
+
+        columns["velocity"] += np.bincount(owner, weights=series_velocity, minlength=len(X))
+        columns["dist_avg"] += np.bincount(owner, weights=series_dist_avg, minlength=len(X))
+        num_series += np.bincount(owner, minlength=len(X))
+
+        # The series of a motion are in time order, its first and last series bound it
+        motions, first = np.unique(owner, return_index=True)
+        last = len(owner) - 1 - np.unique(owner[::-1], return_index=True)[1]
+        columns["time_total"][motions] = t[end[last] - 1] - t[start[first]]
+        columns["direction"][motions] = np.where(d[start[first]] < d[end[first] - 1], -1, 1)
+
+    columns["velocity"] /= np.maximum(num_series, 1)
+    columns["dist_avg"] /= np.maximum(num_series, 1)
+
+    return np.column_stack([columns[feature] for feature in MOTION_FEATURES]).reshape(len(X), len(MOTION_FEATURES))
+
+
 # ----------------------------------- PLOT ----------------------------------- #
 
 
 from matplotlib import pyplot as plt
+from matplotlib.collections import LineCollection
+from pathlib import Path
 from typing import Any
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "app"))
+
+from summary import SummaryPyramid
 
 
 def plot_raw_data(tmf8828_data: pd.DataFrame, ax: Any) -> None:
+    """Center zone distances, drawn as a min/max line per pixel column while the visible samples outnumber the
+    pixels. The lines are recomputed from a summary pyramid whenever the x limits change, so drawing and zooming
+    a whole recording costs the same as a few seconds of it. Samples without a target are not drawn."""
     data = select_center_zone_distance(tmf8828_data, confidence_strategy)
-    ax.scatter(data["timestamp_ms"], data[f"zone{CENTER_ZONE_IDX}_distance"], color="orange", s=6)
+    timestamps = data["timestamp_ms"].to_numpy(dtype=np.int64)
+    distances = data[f"zone{CENTER_ZONE_IDX}_distance"].to_numpy(dtype=np.int64)
+    if len(timestamps) == 0:
+        return
+
+    pyramid = SummaryPyramid.from_samples(timestamps, distances)
+    envelope = ax.add_collection(LineCollection([], color="orange", linewidths=1), autolim=False)
+    (samples,) = ax.plot([], [], color="orange", marker="o", markersize=2.5, linestyle="")
+
+    def update(ax: Any) -> None:
+        columns = max(int(ax.get_window_extent().width), 1)
+        start, end = np.searchsorted(timestamps, ax.get_xlim())
+        start, end = max(start - 1, 0), min(end + 1, len(timestamps))
+
+        overview = pyramid.query(start, end, columns) if end - start > 2 * columns else None
+        if overview is None:
+            present = distances[start:end] != -1
+            samples.set_data(timestamps[start:end][present], distances[start:end][present])
+            envelope.set_segments([])
+            return
+
+        present = overview.max_distances != -1
+        lower = np.column_stack((overview.timestamps, overview.min_distances))[present]
+        upper = np.column_stack((overview.timestamps, overview.max_distances))[present]
+        envelope.set_segments(np.stack((lower, upper), axis=1))
+        samples.set_data([], [])
+
+    ax.update_datalim([(timestamps[0], 0), (timestamps[-1], max(distances.max(), 0))])
+    ax.autoscale_view()
+    ax.callbacks.connect("xlim_changed", update)
+    update(ax)
 
 def plot_velocity_threshold(threshold_kmh: float, ax: Any) -> None:
     ax.axhline(y=threshold_kmh, color='r', linestyle='--', label=f'Classification threshold: {threshold_kmh} km/h')
 
 def plot_samples_partitioning(X: list[Motion], ax: Any) -> None:
-    for motion in X:
-        for series in motion._monotonic_series:
-            timestamps = [sample[0] for sample in series._samples]
-            distances = [sample[1] for sample in series._samples]
-
-            color = "red" if series.direction == 1 else "blue"
-            label = "Approaching" if color == "red" else "Moving away"
-
-            ax.scatter(timestamps, distances, color="black", s=5)
-            ax.plot(timestamps, distances, color=color, label=label)
+    """One line collection per direction and a single scatter, instead of two artists per series."""
+    series = [series for motion in X for series in motion._monotonic_series]
+    if len(series) == 0:
+        return
+
+    for direction, color, label in ((1, "red", "Approaching"), (-1, "blue", "Moving away")):
+        segments = [s.samples for s in series if s.direction == direction]
+        if len(segments) != 0:
+            ax.add_collection(LineCollection(segments, color=color, label=label))
+
+    samples = np.concatenate([s.samples for s in series])
+    ax.scatter(samples[:, 0], samples[:, 1], color="black", s=5)
 
 
 def plot_calculated_velocity(X: list[Motion], ax: Any) -> None:
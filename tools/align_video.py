@@ -0,0 +1,340 @@
+"""
+Video to sensor clock alignment.
+
+The video start timestamp is taken from the file name, which has a 1 s resolution and includes the camera
+startup delay. This script estimates the actual offset by cross-correlating two signals resampled to a common
+time grid:
+
+- motion energy of the video: mean absolute difference of consecutive downsampled grayscale frames,
+- center zone occupancy of the tmf8828 recording: 1 when the center zone reports a target, 0 otherwise.
+
+The offset maximizing the FFT cross-correlation is stored next to the recording as
+<data>-video-alignment.json, which is picked up by the labeling scripts.
+"""
+
+from extract_velocity_labels import alignment_path, video_path_to_timestamp, DEFAULT_VIDEO_OFFSET_S
+from sensor_model import CENTER_ZONE_IDX, NUM_TARGETS
+
+import pandas as pd
+import numpy as np
+import cv2
+
+import sys
+import json
+import argparse
+
+from pathlib import Path
+from typing import Tuple
+
+
+# Raw tmf8828 rows: timestamp, ambient light, then confidence/distance pairs of every target of every zone
+CENTER_ZONE_DISTANCE_COLUMN = 2 + CENTER_ZONE_IDX * NUM_TARGETS * 2 + 1
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--data",
+        required=True,
+        type=str,
+        help="Path of the tmf8828 data CSV file",
+    )
+    parser.add_argument(
+        "--video",
+        required=True,
+        type=str,
+        help="MP4 video file path",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Output alignment JSON (default: <data>-video-alignment.json)",
+    )
+    parser.add_argument(
+        "--max-offset",
+        type=float,
+        default=30,
+        help="Maximum absolute offset from the file name timestamp searched for, in s",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=50,
+        help="Sampling rate of the common time grid in Hz",
+    )
+    parser.add_argument(
+        "--stride",
+        type=int,
+        default=1,
+        help="Decode every n-th video frame only",
+    )
+    parser.add_argument(
+        "--width",
+        type=int,
+        default=64,
+        help="Width of the downsampled frames used for motion energy",
+    )
+    parser.add_argument(
+        "--windows",
+        type=int,
+        default=1,
+        help="Also align this many consecutive windows separately to check for clock drift",
+    )
+    parser.add_argument(
+        "--plot",
+        action="store_true",
+        help="Plot the aligned signals and the cross-correlation",
+    )
+    return parser.parse_args()
+
+
+# ---------------------------------- SIGNALS --------------------------------- #
+
+
+def center_zone_occupancy(data_path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Timestamps in s and center zone occupancy of a raw tmf8828 CSV recording."""
+    df = pd.read_csv(data_path, header=None, usecols=[0, CENTER_ZONE_DISTANCE_COLUMN])
+    timestamps = df[0].to_numpy(dtype=np.float64) / 1000
+    occupancy = (df[CENTER_ZONE_DISTANCE_COLUMN].to_numpy() != -1).astype(np.float64)
+    return timestamps, occupancy
+
+
+def motion_energy(video_path: str, width: int, stride: int, chunk: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+    """Frame times in s since the video start and motion energy, frames are streamed in chunks."""
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video {video_path}")
+
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    energy = []
+    frames = []
+    previous = None
+    frame_number = 0
+
+    while True:
+        # grab() without retrieve() skips the color conversion of skipped frames
+        if frame_number % stride != 0:
+            if not capture.grab():
+                break
+            frame_number += 1
+            continue
+
+        ret, frame = capture.read()
+        if not ret:
+            break
+        frame_number += 1
+
+        height = max(int(width * frame.shape[0] / frame.shape[1]), 1)
+        frame = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (width, height), interpolation=cv2.INTER_AREA)
+        frames.append(frame)
+
+        if len(frames) == chunk:
+            previous = _append_energy(energy, previous, frames)
+            frames = []
+
+        if frame_number % (100 * chunk) == 0:
+            print(f"Decoded {frame_number}/{frame_count} frames")
+
+    if len(frames) > 0:
+        _append_energy(energy, previous, frames)
+    capture.release()
+
+    energy = np.concatenate(energy) if len(energy) > 0 else np.zeros(0)
+    times = np.arange(len(energy)) * stride / fps
+    return times, energy
+
+
+def _append_energy(energy: list[np.ndarray], previous: np.ndarray, frames: list[np.ndarray]) -> np.ndarray:
+    """Mean absolute difference of every frame to the previous one, vectorized over a chunk of frames."""
+    stack = np.stack(frames).astype(np.int16)
+    if previous is None:
+        previous = stack[:1]
+    diff = np.abs(np.diff(np.concatenate([previous, stack]), axis=0))
+    energy.append(diff.mean(axis=(1, 2)))
+    return stack[-1:]
+
+
+def resample(times: np.ndarray, values: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """Standardized signal on the grid, zero outside of the recorded time range."""
+    resampled = np.interp(grid, times, values, left=np.nan, right=np.nan)
+    valid = ~np.isnan(resampled)
+    if valid.sum() > 1 and resampled[valid].std() > 0:
+        resampled[valid] = (resampled[valid] - resampled[valid].mean()) / resampled[valid].std()
+    resampled[~valid] = 0
+    return resampled
+
+
+# --------------------------------- ALIGNMENT -------------------------------- #
+
+
+def cross_correlation(sensor: np.ndarray, video: np.ndarray, max_lag: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Normalized c[k] = sum_t video[t] * sensor[t + k] for |k| <= max_lag, computed with real FFTs."""
+    n = len(sensor) + len(video)
+    n_fft = 1 << (n - 1).bit_length()
+    correlation = np.fft.irfft(np.conj(np.fft.rfft(video, n_fft)) * np.fft.rfft(sensor, n_fft), n_fft)
+
+    lags = np.arange(-max_lag, max_lag + 1)
+    norm = np.sqrt(np.dot(sensor, sensor) * np.dot(video, video))
+    return lags, correlation[lags] / norm if norm > 0 else correlation[lags]
+
+
+def find_offset(
+    sensor_times: np.ndarray,
+    occupancy: np.ndarray,
+    video_times: np.ndarray,
+    energy: np.ndarray,
+    rate: float,
+    max_offset: float,
+) -> Tuple[float, float, np.ndarray, np.ndarray]:
+    """Offset in s to add to the nominal video times, peak correlation, lags in s and the correlation."""
+    step = 1 / rate
+    start = min(sensor_times[0], video_times[0])
+    end = max(sensor_times[-1], video_times[-1])
+    grid = np.arange(start, end + step, step)
+
+    sensor = resample(sensor_times, occupancy, grid)
+    video = resample(video_times, energy, grid)
+
+    lags, correlation = cross_correlation(sensor, video, int(max_offset * rate))
+    peak = int(np.argmax(correlation))
+
+    # Parabolic interpolation around the peak for sub-sample resolution
+    shift = 0.0
+    if 0 < peak < len(correlation) - 1:
+        left, center, right = correlation[peak - 1 : peak + 2]
+        denominator = left - 2 * center + right
+        if denominator != 0:
+            shift = 0.5 * (left - right) / denominator
+
+    return (lags[peak] + shift) * step, float(correlation[peak]), lags * step, correlation
+
+
+def find_window_offsets(
+    sensor_times: np.ndarray,
+    occupancy: np.ndarray,
+    video_times: np.ndarray,
+    energy: np.ndarray,
+    rate: float,
+    max_offset: float,
+    windows: int,
+) -> list[dict]:
+    """Aligns consecutive windows of the video separately, drifting clocks show up as a trend in the offsets."""
+    results = []
+    for window in np.array_split(np.arange(len(video_times)), windows):
+        if len(window) < 2:
+            continue
+
+        w_video_times = video_times[window]
+        in_window = (sensor_times >= w_video_times[0] - max_offset) & (sensor_times <= w_video_times[-1] + max_offset)
+        if in_window.sum() < 2:
+            continue
+
+        offset, peak, _, _ = find_offset(
+            sensor_times[in_window], occupancy[in_window], w_video_times, energy[window], rate, max_offset
+        )
+        results.append({"window_start_s": float(w_video_times[0] - video_times[0]), "offset_s": offset, "peak": peak})
+
+    return results
+
+
+def plot_alignment(
+    sensor_times: np.ndarray,
+    occupancy: np.ndarray,
+    video_times: np.ndarray,
+    energy: np.ndarray,
+    offset: float,
+    lags: np.ndarray,
+    correlation: np.ndarray,
+) -> None:
+    from matplotlib import pyplot as plt
+
+    fig, (ax1, ax2) = plt.subplots(2, 1)
+    ax1.plot(sensor_times, occupancy, label="Center zone occupancy")
+    ax1.plot(video_times + offset, energy / energy.max(), label="Video motion energy (aligned)", alpha=0.7)
+    ax1.set_xlabel("Time (s)")
+    ax1.legend()
+
+    ax2.plot(lags, correlation)
+    ax2.axvline(offset, color="red", linestyle="--", label=f"Offset {offset:.3f} s")
+    ax2.set_xlabel("Offset (s)")
+    ax2.set_ylabel("Correlation")
+    ax2.legend()
+
+    plt.tight_layout()
+    plt.show()
+
+
+# ----------------------------------- MAIN ----------------------------------- #
+
+
+def main() -> None:
+    args = parse_args()
+
+    sensor_times, occupancy = center_zone_occupancy(args.data)
+    print(f"Loaded {len(occupancy)} samples from {args.data}, center zone occupied {occupancy.mean() * 100:.1f}%")
+
+    try:
+        video_times, energy = motion_energy(args.video, args.width, args.stride)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"Computed motion energy of {len(energy)} frames from {args.video}")
+
+    # Nominal video timeline, the offset is searched around the file name timestamp
+    nominal_start = video_path_to_timestamp(args.video)
+    video_times = video_times + nominal_start
+
+    offset, peak, lags, correlation = find_offset(
+        sensor_times, occupancy, video_times, energy, args.rate, args.max_offset
+    )
+    print(
+        f"Video offset: {offset:+.3f} s (previously assumed {DEFAULT_VIDEO_OFFSET_S:+.3f} s), "
+        f"peak correlation {peak:.3f}"
+    )
+
+    if abs(offset) >= args.max_offset - 1 / args.rate:
+        print("WARNING: Offset at the edge of the search range, consider increasing --max-offset")
+
+    windows = []
+    if args.windows > 1:
+        windows = find_window_offsets(
+            sensor_times, occupancy, video_times, energy, args.rate, args.max_offset, args.windows
+        )
+        for window in windows:
+            print(
+                f"  window at {window['window_start_s']:8.1f} s: "
+                f"offset {window['offset_s']:+.3f} s, peak {window['peak']:.3f}"
+            )
+
+        if len(windows) > 1:
+            offsets = np.array([window["offset_s"] for window in windows])
+            starts = np.array([window["window_start_s"] for window in windows])
+            drift = np.polyfit(starts, offsets, 1)[0] * 3600
+            print(f"Clock drift: {drift:+.3f} s/h")
+
+    output = Path(args.output) if args.output else alignment_path(args.data)
+    with open(output, "w") as f:
+        json.dump(
+            {
+                "data": Path(args.data).name,
+                "video": Path(args.video).name,
+                "offset_s": round(offset, 4),
+                "peak_correlation": round(peak, 4),
+                "rate_hz": args.rate,
+                "windows": windows,
+            },
+            f,
+            indent=4,
+        )
+    print(f"Saved alignment to {output}")
+
+    if args.plot:
+        plot_alignment(
+            sensor_times - nominal_start, occupancy, video_times - nominal_start, energy, offset, lags, correlation
+        )
+
+
+if __name__ == "__main__":
+    main()
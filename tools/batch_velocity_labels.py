@@ -0,0 +1,336 @@
+"""
+Batch velocity labeling.
+
+Runs the detection pipeline from detection/ on a tmf8828 recording to find candidate motions, then decodes
+the video windows around all of them in sequential passes over the MP4 (one per worker, each over a
+contiguous video segment) and writes a contact sheet per motion. A velocity labels CSV pre-filled with the
+GPS velocity is written next to the recording, video velocities are left empty for the review pass.
+"""
+
+from extract_velocity_labels import GPSIndex, load_gps_data, load_video_offset, alignment_path, video_path_to_timestamp
+
+import pandas as pd
+import numpy as np
+import cv2
+
+import os
+import sys
+import argparse
+import contextlib
+
+from pathlib import Path
+from typing import NamedTuple, Optional
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "detection"))
+
+from utils import load_tmf8828_data, prepare_unlabeled_data, confidence_strategy, target_0_strategy
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--data",
+        required=True,
+        type=str,
+        help="Path of the tmf8828 data CSV file",
+    )
+    parser.add_argument(
+        "--video",
+        required=True,
+        type=str,
+        help="MP4 video file path",
+    )
+    parser.add_argument(
+        "--gps",
+        type=str,
+        help="GPS CSV file path",
+    )
+    parser.add_argument(
+        "--video-offset",
+        type=float,
+        help="Seconds added to the video start timestamp taken from its file name "
+        "(default: from <data>-video-alignment.json if present, else 0.5)",
+    )
+    parser.add_argument(
+        "--labels",
+        type=str,
+        help="Output velocity labels CSV (default: <data>-velocity-labels.csv)",
+    )
+    parser.add_argument(
+        "--sheets-dir",
+        type=str,
+        help="Output directory for the contact sheets (default: <data>-contact-sheets)",
+    )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="Overwrite an existing velocity labels file",
+    )
+    parser.add_argument(
+        "--frames",
+        type=int,
+        default=8,
+        help="Number of frames on each contact sheet",
+    )
+    parser.add_argument(
+        "--margin",
+        type=float,
+        default=0.5,
+        help="Seconds of video shown before the start and after the end of each motion",
+    )
+    parser.add_argument(
+        "--thumb-height",
+        type=int,
+        default=240,
+        help="Height of the frames on the contact sheets in pixels",
+    )
+    parser.add_argument(
+        "--seek-gap",
+        type=float,
+        default=10,
+        help="Gaps between motions longer than this many seconds are seeked over instead of decoded",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes, each decodes one contiguous video segment",
+    )
+    parser.add_argument(
+        "--min-samples",
+        "-m",
+        type=int,
+        default=3,
+        help="Minimum number of samples in a series",
+    )
+    parser.add_argument(
+        "--max-dd",
+        "-d",
+        type=int,
+        default=200,
+        help="Maximum distance delta between samples in a series",
+    )
+    parser.add_argument(
+        "--max-dt",
+        "-t",
+        type=int,
+        default=500,
+        help="Maximum time delta between series in a motion",
+    )
+    parser.add_argument(
+        "--dist-strategy",
+        type=str,
+        choices=["confidence", "closest"],
+        default="confidence",
+    )
+    return parser.parse_args()
+
+
+# ---------------------------------- MOTIONS --------------------------------- #
+
+
+class Job(NamedTuple):
+    """Contact sheet of a single motion."""
+
+    index: int
+    time_start: int
+    frame_numbers: list[int]
+    caption: str
+
+
+def find_motions(args: argparse.Namespace) -> pd.DataFrame:
+    tmf8828_data = load_tmf8828_data(args.data)
+
+    # The pipeline warns about every degenerate series, only the summary is interesting here
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        motions = prepare_unlabeled_data(
+            tmf8828_data,
+            distStrategy=confidence_strategy if args.dist_strategy == "confidence" else target_0_strategy,
+            min_samples=args.min_samples,
+            max_dd=args.max_dd,
+            max_series_delta_time_ms=args.max_dt,
+        )
+
+    return pd.DataFrame(
+        {
+            "time_start": [motion.time_start for motion in motions],
+            "time_end": [motion.time_end for motion in motions],
+            "velocity": [motion.velocity for motion in motions],
+        }
+    )
+
+
+def plan_jobs(
+    motions: pd.DataFrame, video_start: float, fps: float, frame_count: int, frames: int, margin: float
+) -> list[Job]:
+    """Evenly spaced frames over [start - margin, end + margin] of every motion that lies within the video."""
+    first = np.round(((motions["time_start"] / 1000 - margin) - video_start) * fps).astype(int)
+    last = np.round(((motions["time_end"] / 1000 + margin) - video_start) * fps).astype(int)
+
+    jobs = []
+    for i, motion in enumerate(motions.itertuples()):
+        if last[i] < 0 or first[i] >= frame_count:
+            continue
+
+        frame_numbers = np.unique(np.linspace(max(first[i], 0), min(last[i], frame_count - 1), frames).astype(int))
+        jobs.append(
+            Job(
+                index=i,
+                time_start=int(motion.time_start),
+                frame_numbers=frame_numbers.tolist(),
+                caption=f"#{i}  t={motion.time_start} ms  {motion.time_end - motion.time_start} ms  "
+                f"sensor {motion.velocity:.1f} km/h",
+            )
+        )
+
+    return jobs
+
+
+# ------------------------------- CONTACT SHEETS ----------------------------- #
+
+
+def frame_label(frame: np.ndarray, text: str) -> np.ndarray:
+    cv2.putText(frame, text, (5, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+    return frame
+
+
+def contact_sheet(thumbs: list[np.ndarray], caption: str) -> np.ndarray:
+    strip = np.hstack(thumbs)
+    header = np.zeros((30, strip.shape[1], 3), dtype=np.uint8)
+    cv2.putText(header, caption, (5, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+    return np.vstack([header, strip])
+
+
+def render_segment(
+    video_path: str, jobs: list[Job], video_start: float, sheets_dir: str, thumb_height: int, seek_gap_frames: int
+) -> list[Optional[str]]:
+    """Decodes all frames of the jobs in a single forward pass, seeking only over long gaps."""
+    capture = cv2.VideoCapture(video_path)
+    fps = capture.get(cv2.CAP_PROP_FPS)
+
+    position = None
+    thumbs: dict[int, np.ndarray] = {}
+    sheets = []
+
+    for job_idx, job in enumerate(jobs):
+        for frame_number in job.frame_numbers:
+            if frame_number in thumbs:
+                continue
+
+            # grab() skips the color conversion of read(), seeking costs a keyframe decode
+            if position is None or frame_number < position or frame_number - position > seek_gap_frames:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+                position = frame_number
+            while position < frame_number and capture.grab():
+                position += 1
+
+            ret, frame = capture.read()
+            position += 1
+            if not ret:
+                continue
+
+            width = int(thumb_height * frame.shape[1] / frame.shape[0])
+            timestamp_ms = int((video_start + frame_number / fps) * 1000)
+            thumbs[frame_number] = frame_label(cv2.resize(frame, (width, thumb_height)), f"{timestamp_ms} ms")
+
+        job_thumbs = [thumbs[frame_number] for frame_number in job.frame_numbers if frame_number in thumbs]
+        if len(job_thumbs) == 0:
+            sheets.append(None)
+            continue
+
+        path = str(Path(sheets_dir) / f"{job.index:04d}-{job.time_start}.jpg")
+        cv2.imwrite(path, contact_sheet(job_thumbs, job.caption))
+        sheets.append(path)
+
+        # Windows of adjacent motions may overlap, keep only frames the next job can still use
+        if job_idx + 1 < len(jobs):
+            next_first = jobs[job_idx + 1].frame_numbers[0]
+            thumbs = {n: thumb for n, thumb in thumbs.items() if n >= next_first}
+
+    capture.release()
+    return sheets
+
+
+# ----------------------------------- MAIN ----------------------------------- #
+
+
+def main() -> None:
+    args = parse_args()
+
+    data = Path(args.data)
+    labels_path = Path(args.labels) if args.labels else data.with_name(f"{data.stem}-velocity-labels.csv")
+    sheets_dir = Path(args.sheets_dir) if args.sheets_dir else data.with_name(f"{data.stem}-contact-sheets")
+
+    if labels_path.exists() and not args.overwrite:
+        print(f"Error: {labels_path} already exists, use --overwrite to replace it")
+        sys.exit(1)
+
+    # FIND MOTIONS
+    motions = find_motions(args)
+    print(f"Found {len(motions)} motions in {data}")
+
+    # PLAN VIDEO WINDOWS
+    capture = cv2.VideoCapture(args.video)
+    if not capture.isOpened():
+        print(f"Error: Could not open video {args.video}")
+        sys.exit(1)
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+
+    if args.video_offset is not None:
+        video_offset = args.video_offset
+    else:
+        video_offset = load_video_offset(str(alignment_path(args.data)))
+    video_start = video_path_to_timestamp(args.video) + video_offset
+    print(f"Video start timestamp: {video_start:.3f} s (offset {video_offset:+.3f} s)")
+    jobs = plan_jobs(motions, video_start, fps, frame_count, args.frames, args.margin)
+    print(f"{len(jobs)} motions within the video, decoding {sum(len(job.frame_numbers) for job in jobs)} frames")
+
+    # RENDER CONTACT SHEETS, ONE CONTIGUOUS SEGMENT PER WORKER
+    sheets_dir.mkdir(parents=True, exist_ok=True)
+    segments = [segment.tolist() for segment in np.array_split(np.arange(len(jobs)), max(args.workers, 1))]
+    segments = [[jobs[i] for i in segment] for segment in segments if len(segment) > 0]
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(
+                render_segment,
+                args.video,
+                segment,
+                video_start,
+                str(sheets_dir),
+                args.thumb_height,
+                int(args.seek_gap * fps),
+            )
+            for segment in segments
+        ]
+        sheets = [sheet for future in futures for sheet in future.result()]
+
+    print(f"Saved {sum(sheet is not None for sheet in sheets)} contact sheets to {sheets_dir}")
+
+    # PRE-FILL LABELS
+    gps_velocity = np.full(len(motions), np.nan)
+    if args.gps:
+        gps = GPSIndex(load_gps_data(args.gps))
+        for i, time_start in enumerate(motions["time_start"]):
+            try:
+                gps_velocity[i] = round(gps.velocity_at(time_start / 1000), 2)
+            except ValueError:
+                pass
+        print(f"GPS velocity found for {np.sum(~np.isnan(gps_velocity))} of {len(motions)} motions")
+
+    labels = pd.DataFrame(
+        {
+            "timestamp_ms": motions["time_start"],
+            "gps_velocity_kmh": gps_velocity,
+            "video_velocity_kmh": np.nan,
+        }
+    )
+    labels.to_csv(labels_path, index=False)
+    print(f"Saved velocity labels to {labels_path}, fill in video_velocity_kmh while reviewing the contact sheets")
+
+
+if __name__ == "__main__":
+    main()
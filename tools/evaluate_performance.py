@@ -1,168 +1,262 @@
+from matplotlib import pyplot as plt
+
 import pandas as pd
-import sys
+import numpy as np
 
-# ---------------------------------------------------------------------------- #
+import argparse
+import warnings
 
-if len(sys.argv) != 2:
-    print("Usage python3 evaluate_performance.py <csv file>")
-    sys.exit(1)
+from pathlib import Path
 
-file = sys.argv[1]
-print("Data file:", file, end="\n\n")
 
+# ----------------------------------- ARGS ----------------------------------- #
 
-# ---------------------------------------------------------------------------- #
 
-NUM_ZONES = 9
 NUM_TARGETS = 2
-CENTER_ZONE = 5
-
-
-make_confidence_distance_pair = lambda zone_idx, target_idx: (
-    f"zone{zone_idx}_conf{target_idx}",
-    f"zone{zone_idx}_dist{target_idx}",
-)
-
-distance_columns = [
-    col
-    for pair in [make_confidence_distance_pair(z, t) for z in range(1, NUM_ZONES + 1) for t in range(NUM_TARGETS)]
-    for col in pair
-]
-
-dtypes = {
-    "timestamp": "int64",
-    "ambient_light": "int16",
-    **{col: "int16" for col in distance_columns},
-}
-
-
-df = pd.read_csv(
-    file,
-    sep=",",
-    names=["timestamp", "ambient_light", *distance_columns],
-    index_col="timestamp",
-    dtype=dtypes,
-)
+STRATEGIES = ["target0", "confidence", "mean", "weighted_mean"]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Script for evaluating tmf8828 distance measurement performance across zones and strategies.",
+    )
+    parser.add_argument(
+        "files",
+        type=str,
+        nargs="*",
+        help="Measurement CSV files, defaults to every recording found in --dir",
+    )
+    parser.add_argument(
+        "--dir",
+        type=str,
+        default=str(Path(__file__).resolve().parent.parent / "performance"),
+        help="Directory searched for measurement CSV files when no files are given",
+    )
+    parser.add_argument(
+        "--path-distance",
+        "-a",
+        type=float,
+        default=1300,
+        help="Perpendicular distance from the sensor to the path in mm",
+    )
+    parser.add_argument(
+        "--window",
+        "-w",
+        type=int,
+        default=100,
+        help="Number of samples in the rolling approach velocity window",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Path to save the summary table as CSV",
+    )
+    parser.add_argument(
+        "--plot",
+        action="store_true",
+        default=False,
+        help="Plot distance and velocity of the selected zone and strategy for each file",
+    )
+    parser.add_argument(
+        "--zone",
+        type=int,
+        help="Zone number (1-based) to plot, defaults to the center zone",
+    )
+    parser.add_argument(
+        "--strategy",
+        type=str,
+        choices=STRATEGIES,
+        default="target0",
+        help="Distance selection strategy to plot",
+    )
+    return parser.parse_args()
+
+
+# --------------------------------- LOAD DATA -------------------------------- #
+
+
+def is_measurement_file(file: Path) -> bool:
+    """Recordings have no header, so the first field is a numeric timestamp."""
+    with open(file, "r") as f:
+        first_field = f.readline().split(",")[0].strip()
+
+    return first_field.isdigit()
+
+
+def find_measurement_files(directory: str) -> list[Path]:
+    return [file for file in sorted(Path(directory).glob("*.csv")) if is_measurement_file(file)]
+
+
+def load_measurements(file: Path) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns timestamps (n,), confidences (n, zones, targets) and distances (n, zones, targets).
+    Missing measurements (-1) are NaN, confidences are scaled to [0, 1]."""
+    data = pd.read_csv(file, sep=",", header=None, dtype=np.float64).to_numpy()
+
+    timestamps = data[:, 0]
+    zone_data = data[:, 2:]
+    num_zones = zone_data.shape[1] // (2 * NUM_TARGETS)
+    zone_data = zone_data[:, : num_zones * 2 * NUM_TARGETS].reshape(len(data), num_zones, NUM_TARGETS, 2)
+    zone_data[zone_data == -1] = np.nan
+
+    confidences = zone_data[..., 0] / 255.0
+    distances = zone_data[..., 1]
+
+    return timestamps, confidences, distances
+
+
+# ---------------------- DISTANCE SELECTION STRATEGIES ----------------------- #
+
+
+def select_distances(confidences: np.ndarray, distances: np.ndarray) -> np.ndarray:
+    """Applies every strategy at once, returns (strategies, n, zones) distances."""
+    conf0, conf1 = confidences[..., 0], confidences[..., 1]
+    dist0, dist1 = distances[..., 0], distances[..., 1]
+
+    valid = ~np.isnan(distances)
+    weights = np.where(valid, np.nan_to_num(confidences), 0)
+    dist_sum = np.where(valid, distances, 0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        target0 = dist0
+        confidence = np.where(np.nan_to_num(conf0, nan=-np.inf) >= np.nan_to_num(conf1, nan=-np.inf), dist0, dist1)
+        mean = dist_sum.sum(axis=-1) / valid.sum(axis=-1)
+        weighted_mean = (weights * dist_sum).sum(axis=-1) / weights.sum(axis=-1)
+
+    # Single target zones fall back to that target's distance
+    weighted_mean = np.where(valid.sum(axis=-1) == 1, mean, weighted_mean)
+
+    strategies = {
+        "target0": target0,
+        "confidence": confidence,
+        "mean": mean,
+        "weighted_mean": weighted_mean,
+    }
 
-df.drop(["ambient_light"], axis=1, inplace=True)
+    return np.stack([strategies[strategy] for strategy in STRATEGIES])
 
-df.replace(-1, pd.NA, inplace=True)
 
-confidence_columns = df.filter(regex="zone[0-9]*_conf[0-9]*").columns
-df[confidence_columns] = df[confidence_columns].apply(lambda confidence: confidence / 255.0)
+# ------------------------------- VELOCITY ----------------------------------- #
 
 
-# ---------------------------------------------------------------------------- #
+def calculate_velocity(timestamps: np.ndarray, d: np.ndarray, a: float) -> np.ndarray:
+    """Velocity in km/h along the path for (..., n, zones) distances, NaN where undefined."""
+    dt = np.diff(timestamps, prepend=np.nan)[:, np.newaxis]
+    dd = np.diff(d, axis=-2, prepend=np.nan)
+    radicand = d**2 - a**2
 
+    with np.errstate(invalid="ignore", divide="ignore"):
+        velocity = d / np.sqrt(radicand) * (dd / dt) * 3.6
 
-zone_data = lambda zone_idx: df.filter(like=f"zone{zone_idx}")
+    velocity[~(radicand > 0) | ~np.isfinite(velocity)] = np.nan
+    return velocity
 
 
-def unpack_zone_data(row):
-    conf_target1 = row.iloc[0]
-    dist_target1 = row.iloc[1]
-    conf_target2 = row.iloc[2]
-    dist_target2 = row.iloc[3]
+def rolling_approach_velocity(velocity: np.ndarray, window: int) -> np.ndarray:
+    """Rolling mean over the last `window` samples of the negative (approaching) velocities only."""
+    approaching = velocity < 0
+    sums = np.cumsum(np.where(approaching, velocity, 0), axis=-2)
+    counts = np.cumsum(approaching, axis=-2)
 
-    return conf_target1, dist_target1, conf_target2, dist_target2
+    sums[..., window:, :] -= sums[..., :-window, :].copy()
+    counts[..., window:, :] -= counts[..., :-window, :].copy()
 
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
 
-def confidence_strategy(row):
-    conf_target1, dist_target1, conf_target2, dist_target2 = unpack_zone_data(row)
 
-    if pd.isna(conf_target1) and pd.isna(conf_target2):
-        return pd.NA
+# -------------------------------- EVALUATION -------------------------------- #
 
-    if pd.isna(conf_target1):
-        return dist_target2
 
-    if pd.isna(conf_target2):
-        return dist_target1
+def evaluate_file(file: Path, a: float, window: int) -> tuple[pd.DataFrame, dict]:
+    timestamps, confidences, distances = load_measurements(file)
+    d = select_distances(confidences, distances)
+    velocity = calculate_velocity(timestamps, d, a)
+    rolling_velocity = rolling_approach_velocity(velocity, window)
 
-    return dist_target1 if conf_target1 >= conf_target2 else dist_target2
+    dt = np.diff(timestamps)
+    print(f"{file.name}: {len(timestamps)} samples, mean dt: {dt.mean():.2f} +- {dt.std():.2f} [{dt.min()} - {dt.max()}]")
 
+    num_strategies, _, num_zones = d.shape
 
-def mean_strategy(row):
-    conf_target1, dist_target1, conf_target2, dist_target2 = unpack_zone_data(row)
+    # All-NaN zones (out of range for the whole recording) yield NaN statistics
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        summary = pd.DataFrame(
+            {
+                "file": file.name,
+                "strategy": np.repeat(STRATEGIES, num_zones),
+                "zone": np.tile(np.arange(1, num_zones + 1), num_strategies),
+                "samples": len(timestamps),
+                "valid_distance_pct": (np.mean(~np.isnan(d), axis=1) * 100).ravel(),
+                "distance_mean_mm": np.nanmean(d, axis=1).ravel(),
+                "distance_std_mm": np.nanstd(d, axis=1).ravel(),
+                "valid_velocity": np.sum(~np.isnan(velocity), axis=1).ravel(),
+                "abs_velocity_mean_kmh": np.nanmean(np.abs(velocity), axis=1).ravel(),
+                "approach_velocity_mean_kmh": np.nanmean(rolling_velocity, axis=1).ravel(),
+            }
+        )
 
-    if pd.isna(conf_target1) and pd.isna(conf_target2):
-        return pd.NA
+    series = {
+        "timestamps": timestamps,
+        "distances": d,
+        "velocity": velocity,
+        "rolling_velocity": rolling_velocity,
+    }
 
-    if pd.isna(conf_target1):
-        return dist_target2
+    return summary, series
 
-    if pd.isna(conf_target2):
-        return dist_target1
 
-    return (dist_target1 + dist_target2) / 2
+# ----------------------------------- PLOT ----------------------------------- #
 
 
-def weighted_mean_strategy(row):
-    conf_target1, dist_target1, conf_target2, dist_target2 = unpack_zone_data(row)
+def plot_zone(file: Path, series: dict, strategy: str, zone: int) -> None:
+    s = STRATEGIES.index(strategy)
+    z = zone - 1
 
-    if pd.isna(conf_target1) and pd.isna(conf_target2):
-        return pd.NA
+    x = series["timestamps"] - series["timestamps"].min()
+    y1 = np.nan_to_num(series["distances"][s, :, z])
+    y2 = np.nan_to_num(series["velocity"][s, :, z])
+    y3 = series["rolling_velocity"][s, :, z]
 
-    if pd.isna(conf_target1):
-        return dist_target2
-
-    if pd.isna(conf_target2):
-        return dist_target1
-
-    return (conf_target1 * dist_target1 + conf_target2 * dist_target2) / (conf_target1 + conf_target2)
-
-
-def target0_strategy(row):
-    _, dist_target1, _, _ = unpack_zone_data(row)
-
-    return dist_target1
-
-# ---------------------------------------------------------------------------- #
-
-import numpy as np
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(6, 10))
+    fig.suptitle(f"{file.name}, zone {zone}, {strategy}")
+    ax1.scatter(x, y1, c="orange")
+    ax2.scatter(x, y2, c="blue")
+    ax2.plot(x, y3, c="red")  # Rolling approach velocity
 
-strategy = target0_strategy
-zone = CENTER_ZONE
-a = 1300
 
-df["d"] = zone_data(zone).apply(strategy, axis=1)
-df["dt"] = df.index.to_series().diff()
-df["dd"] = df["d"].diff()
+# ----------------------------------- MAIN ----------------------------------- #
 
-df["velocity"] = df.apply(
-    lambda row: (
-        (row["d"] / np.sqrt(row["d"] ** 2 - a**2)) * (row["dd"] / row["dt"]) * 3.6
-        if not pd.isna(row["d"]) and not pd.isna(row["dd"]) and not pd.isna(row["dt"]) and row["d"] ** 2 - a**2 > 0
-        else pd.NA
-    ),
-    axis=1,
-)
 
-print(f"Mean dt: {df['dt'].mean()} +- {df['dt'].std()} [{df['dt'].min()} - {df['dt'].max()}]")
+def main() -> None:
+    args = parse_args()
+    files = [Path(file) for file in args.files] if args.files else find_measurement_files(args.dir)
 
-# ---------------------------------------------------------------------------- #
+    if len(files) == 0:
+        print("No measurement files found")
+        return
 
-import matplotlib.pyplot as plt
+    summaries = []
+    for file in files:
+        summary, series = evaluate_file(file, args.path_distance, args.window)
+        summaries.append(summary)
 
+        if args.plot:
+            num_zones = series["distances"].shape[2]
+            zone = args.zone if args.zone is not None else num_zones // 2 + 1
+            plot_zone(file, series, args.strategy, min(zone, num_zones))
 
-x = df.index - df.index.min()
-y1 = df["d"].replace(pd.NA, 0)
-y2 = df["velocity"].replace(pd.NA, 0)
+    summary = pd.concat(summaries, ignore_index=True)
+    print()
+    print(summary.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
 
-# Custom function to calculate the average of non-zero, non-NaN values in a window
-def custom_avg(series):
-    # Filter out both NaN and 0 values before calculating the mean
-    filtered_series = series[series < 0]
-    return filtered_series.mean()
+    if args.output:
+        summary.to_csv(args.output, index=False)
+        print(f"Saved summary to {args.output}")
 
-# Apply the custom function to a rolling window of the last 100 values
-# Ensure the column is numeric before applying rolling
-y3 = pd.to_numeric(y2, downcast='float').rolling(window=100, min_periods=1).apply(custom_avg, raw=False)
+    if args.plot:
+        plt.show()
 
-# Continue with the plotting as before
-fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(6, 10))
-ax1.scatter(x, y1, c="orange")
-ax2.scatter(x, y2, c="blue")
-ax2.plot(x, y3, c="red")  # Plotting y3 to visualize the rolling average
 
-plt.show()
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,17 @@
 import pandas as pd
+import numpy as np
 import cv2
 
 import sys
+import json
+import queue
 import argparse
+import threading
 
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
 
 
 def parse_args() -> argparse.Namespace:
@@ -22,14 +28,34 @@ def parse_args() -> argparse.Namespace:
         type=str,
         help="GPS CSV file path",
     )
+    parser.add_argument(
+        "--alignment",
+        type=str,
+        help="Video alignment JSON written by align_video.py (default: fixed 0.5 s offset)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=256,
+        help="Number of decoded frames kept in memory",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=15,
+        help="Number of frames decoded ahead of and behind the displayed frame",
+    )
     args = parser.parse_args()
 
-    if not args.gps and args.video:
+    if not args.gps and not args.video:
         parser.error("Please provide at least one of: video or GPS file paths")
 
     return args
 
 
+# ------------------------------------ GPS ----------------------------------- #
+
+
 def load_gps_data(gps_path):
     df = pd.read_csv(
         gps_path,
@@ -52,61 +78,181 @@ def load_gps_data(gps_path):
     )
 
     df["timestamp"] = pd.to_datetime(df["date time"], format="%Y-%m-%d %H:%M:%S").values.astype("int64") // 10**9
-    df["velocity"] = df["speed(m/s)"].apply(lambda x: x * 3.6)
-    df = df[["timestamp", "velocity"]]
+    df["velocity"] = df["speed(m/s)"] * 3.6
+    df = df[["timestamp", "velocity"]].sort_values("timestamp", kind="stable", ignore_index=True)
 
     return df
 
 
-def get_gps_velocity(df, timestamp):
-    closest_idx = df["timestamp"].sub(timestamp).abs().idxmin()
-    closest_row = df.loc[closest_idx]
-    velocity = closest_row["velocity"]
-    closest_timestamp_value = closest_row["timestamp"]
+class GPSIndex:
+    """Sorted GPS timestamps for O(log n) nearest fix lookup."""
 
-    if abs(timestamp - closest_timestamp_value) > 1:
-        raise ValueError("No GPS data found for the given timestamp")
+    def __init__(self, df: pd.DataFrame, max_gap_s: float = 1) -> None:
+        self._timestamps = df["timestamp"].to_numpy(dtype=np.float64)
+        self._velocities = df["velocity"].to_numpy(dtype=np.float64)
+        self._max_gap_s = max_gap_s
 
-    return velocity
+    def velocity_at(self, timestamp: float) -> float:
+        if len(self._timestamps) == 0:
+            raise ValueError("No GPS data found for the given timestamp")
 
+        # Nearest of the two fixes around the timestamp, the first one wins ties like idxmin
+        right = int(np.searchsorted(self._timestamps, timestamp, side="left"))
+        left = max(right - 1, 0)
+        right = min(right, len(self._timestamps) - 1)
+        idx = left if abs(timestamp - self._timestamps[left]) <= abs(self._timestamps[right] - timestamp) else right
 
-def show_frame_at_offset(video_path, offset_seconds):
-    # Read frame from video at offset
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        print("Error: Could not open video.")
-        sys.exit()
+        if abs(timestamp - self._timestamps[idx]) > self._max_gap_s:
+            raise ValueError("No GPS data found for the given timestamp")
 
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
-    duration_seconds = total_frames / fps
-    if offset_seconds < 0 or offset_seconds > duration_seconds:
-        cap.release()
-        raise ValueError(
-            f"The offset {offset_seconds} seconds is outside the video duration of {duration_seconds} seconds."
-        )
+        return self._velocities[idx]
+
+
+# ----------------------------------- VIDEO ---------------------------------- #
+
+
+class VideoReader:
+    """Keeps the capture open and caches decoded, resized frames.
+
+    Neighbours of the last requested frame are decoded on a background thread, sequentially after a single
+    seek, so stepping through a crossing frame by frame is served from the cache.
+    """
+
+    def __init__(self, video_path: str, height: int = 720, cache_size: int = 256, prefetch: int = 15) -> None:
+        self._capture = cv2.VideoCapture(video_path)
+        if not self._capture.isOpened():
+            raise ValueError(f"Could not open video {video_path}")
+
+        self.fps = self._capture.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.duration_seconds = self.frame_count / self.fps
+        self._height = height
+
+        # Position of the next frame returned by read(), seeking is skipped when reading sequentially
+        self._position = 0
+        self._capture_lock = threading.Lock()
+
+        self._cache: OrderedDict[int, np.ndarray] = OrderedDict()
+        self._cache_size = max(cache_size, 2 * prefetch + 1)
+        self._cache_lock = threading.Lock()
+
+        self._prefetch = prefetch
+        self._requests: queue.Queue[Optional[int]] = queue.Queue()
+        self._prefetch_thread = threading.Thread(target=self._prefetch_loop, daemon=True)
+        self._prefetch_thread.start()
+
+    # ---------------------------------- PRIVATE --------------------------------- #
+
+    def _cached(self, frame_number: int) -> Optional[np.ndarray]:
+        with self._cache_lock:
+            frame = self._cache.get(frame_number)
+            if frame is not None:
+                self._cache.move_to_end(frame_number)
+            return frame
+
+    def _store(self, frame_number: int, frame: np.ndarray) -> None:
+        with self._cache_lock:
+            self._cache[frame_number] = frame
+            self._cache.move_to_end(frame_number)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    def _resize(self, frame: np.ndarray) -> np.ndarray:
+        width = int(self._height * frame.shape[1] / frame.shape[0])
+        return cv2.resize(frame, (width, self._height))
 
-    frame_number = int(round(offset_seconds * fps))
-    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-    ret, frame = cap.read()
+    def _decode(self, frame_number: int) -> np.ndarray:
+        """Decodes a single frame, must be called with the capture lock held."""
+        if frame_number != self._position:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
 
-    if not ret:
-        print("Error: Could not read frame.")
-        cap.release()
-        sys.exit()
+        ret, frame = self._capture.read()
+        if not ret:
+            self._position = -1
+            raise ValueError(f"Could not read frame {frame_number}")
 
-    # Display frame
-    desired_height = 720
-    aspect_ratio = frame.shape[1] / frame.shape[0]
-    desired_width = int(desired_height * aspect_ratio)
-    resized_frame = cv2.resize(frame, (desired_width, desired_height))
+        self._position = frame_number + 1
+        frame = self._resize(frame)
+        self._store(frame_number, frame)
+        return frame
 
-    cv2.imshow(f"Frame at {offset_seconds} seconds", resized_frame)
+    def _prefetch_loop(self) -> None:
+        while True:
+            center = self._requests.get()
+            if center is None:
+                return
 
-    # Cleanup
-    cv2.waitKey(0)
-    cap.release()
-    cv2.destroyAllWindows()
+            first = max(center - self._prefetch, 0)
+            last = min(center + self._prefetch, self.frame_count - 1)
+
+            # Frames after the center first, stepping forward through a crossing is the common case
+            for frame_number in list(range(center + 1, last + 1)) + list(range(first, center)):
+                # Newer request supersedes this one
+                if not self._requests.empty():
+                    break
+                if self._cached(frame_number) is not None:
+                    continue
+
+                with self._capture_lock:
+                    try:
+                        self._decode(frame_number)
+                    except ValueError:
+                        break
+
+    # ---------------------------------- PUBLIC ---------------------------------- #
+
+    def frame_number_at(self, offset_seconds: float) -> int:
+        if offset_seconds < 0 or offset_seconds > self.duration_seconds:
+            raise ValueError(
+                f"The offset {offset_seconds} seconds is outside the video duration of {self.duration_seconds} seconds."
+            )
+
+        return min(int(round(offset_seconds * self.fps)), self.frame_count - 1)
+
+    def frame(self, frame_number: int) -> np.ndarray:
+        frame = self._cached(frame_number)
+        if frame is None:
+            with self._capture_lock:
+                frame = self._cached(frame_number)
+                if frame is None:
+                    frame = self._decode(frame_number)
+
+        self._requests.put(frame_number)
+        return frame
+
+    def close(self) -> None:
+        self._requests.put(None)
+        self._prefetch_thread.join()
+        self._capture.release()
+
+
+def show_frames(reader: VideoReader, offset_seconds: float, video_start: float) -> None:
+    """Shows the frame at offset, a/d step one frame back/forward, any other key returns to the prompt."""
+    frame_number = reader.frame_number_at(offset_seconds)
+    window = "Video"
+
+    while True:
+        frame = reader.frame(frame_number).copy()
+        offset = frame_number / reader.fps
+        timestamp_ms = int((video_start + offset) * 1000)
+        cv2.putText(
+            frame,
+            f"{int(offset // 60)}:{offset % 60:05.2f}  frame {frame_number}  sensor {timestamp_ms} ms",
+            (10, 30),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.8,
+            (0, 255, 255),
+            2,
+        )
+        cv2.imshow(window, frame)
+
+        key = cv2.waitKey(0) & 0xFF
+        if key == ord("a"):
+            frame_number = max(frame_number - 1, 0)
+        elif key == ord("d"):
+            frame_number = min(frame_number + 1, reader.frame_count - 1)
+        else:
+            break
 
 
 def video_path_to_timestamp(path):
@@ -119,6 +265,30 @@ def video_path_to_timestamp(path):
     return epoch_timestamp
 
 
+# --------------------------------- ALIGNMENT -------------------------------- #
+
+# Offset between the file name timestamp and the first frame, used when a recording has no alignment
+DEFAULT_VIDEO_OFFSET_S = 0.5
+
+
+def alignment_path(data_path: str) -> Path:
+    """Alignment file stored next to the recording and its velocity labels."""
+    data = Path(data_path)
+    return data.with_name(f"{data.stem}-video-alignment.json")
+
+
+def load_video_offset(path: Optional[str]) -> float:
+    if path is None or not Path(path).exists():
+        return DEFAULT_VIDEO_OFFSET_S
+
+    with open(path) as f:
+        return json.load(f)["offset_s"]
+
+
+def video_start_timestamp(video_path: str, alignment: Optional[str] = None) -> float:
+    return video_path_to_timestamp(video_path) + load_video_offset(alignment)
+
+
 if __name__ == "__main__":
     args = parse_args()
     video_path = args.video
@@ -126,13 +296,23 @@ if __name__ == "__main__":
 
     if gps_path:
         df = load_gps_data(gps_path)
+        gps = GPSIndex(df)
         print(f"Loaded GPS data from {gps_path}:")
         print(df.describe())
         print("====================================")
 
     if video_path:
-        video_start = video_path_to_timestamp(video_path) + 0.5
+        if args.alignment and not Path(args.alignment).exists():
+            print(f"Error: Alignment file {args.alignment} not found")
+            sys.exit()
+        video_start = video_start_timestamp(video_path, args.alignment)
+        try:
+            reader = VideoReader(video_path, cache_size=args.cache_size, prefetch=args.prefetch)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit()
         print(f"Loaded video {video_path}, start timestamp: {video_start} s")
+        print("Use a/d to step one frame back/forward, any other key to enter the next timestamp")
         print("====================================")
 
     while True:
@@ -142,14 +322,14 @@ if __name__ == "__main__":
                 break
 
             timestamp = int(timestamp_input) / 1000.0
-            offset = timestamp - video_start
 
             if gps_path:
-                print(f"Speed at timestamp {int(timestamp*1000)} ms: {get_gps_velocity(df, timestamp):.2f} km/h")
+                print(f"Speed at timestamp {int(timestamp*1000)} ms: {gps.velocity_at(timestamp):.2f} km/h")
 
             if video_path:
+                offset = timestamp - video_start
                 print(f"Displaying frame at video time: {int(offset // 60)}:{offset % 60:.2f}")
-                show_frame_at_offset(video_path, offset)
+                show_frames(reader, offset, video_start)
 
             print("====================================")
 
@@ -164,3 +344,7 @@ if __name__ == "__main__":
         except Exception as e:
             print(f"An unexpected error occurred: {e}")
             break
+
+    if video_path:
+        reader.close()
+        cv2.destroyAllWindows()
@@ -0,0 +1,205 @@
+from sensor_model import Sensor, Motions, GroundTruth, random_motions, to_frames, OBJECT_KINDS
+
+import pandas as pd
+import numpy as np
+
+import time
+import argparse
+
+from pathlib import Path
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Script for generating synthetic tmf8828 recordings with ground truth velocity labels.",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        default="synthetic",
+        help="Directory for the generated recordings",
+    )
+    parser.add_argument(
+        "--name",
+        type=str,
+        default="synthetic",
+        help="Recording name prefix, files are named <name>-<epoch seconds>.csv like in data/",
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=["csv", "bin"],
+        default="csv",
+        help="csv as written by data_collector.c, or bin with the TCP frame layout read by TCPCollector",
+    )
+    parser.add_argument(
+        "--num-files",
+        type=int,
+        default=1,
+        help="Number of recordings to generate",
+    )
+    parser.add_argument(
+        "--num-motions",
+        type=int,
+        default=1000,
+        help="Number of motions per recording",
+    )
+    parser.add_argument(
+        "--bike-ratio",
+        type=float,
+        default=0.5,
+        help="Fraction of motions that are bicycles, the rest are pedestrians",
+    )
+    parser.add_argument(
+        "--bike-speed",
+        type=float,
+        nargs=2,
+        default=[10, 30],
+        metavar=("MIN", "MAX"),
+        help="Bicycle velocity range in km/h",
+    )
+    parser.add_argument(
+        "--pedestrian-speed",
+        type=float,
+        nargs=2,
+        default=[3, 6],
+        metavar=("MIN", "MAX"),
+        help="Pedestrian velocity range in km/h",
+    )
+    parser.add_argument(
+        "--distance-to-path",
+        type=float,
+        nargs=2,
+        default=[0.75, 2.25],
+        metavar=("MIN", "MAX"),
+        help="Range of the distance between the sensor and the object trajectory in m",
+    )
+    parser.add_argument(
+        "--gap",
+        type=float,
+        nargs=2,
+        default=[1, 5],
+        metavar=("MIN", "MAX"),
+        help="Range of the idle time between motions in s",
+    )
+    parser.add_argument(
+        "--angle",
+        type=float,
+        default=60,
+        help="Angle between the sensor axis and the normal to the path in degrees",
+    )
+    parser.add_argument(
+        "--frame-period",
+        type=float,
+        default=33,
+        help="Sensor frame period in ms",
+    )
+    parser.add_argument(
+        "--snr",
+        type=float,
+        default=50,
+        help="Distance signal to noise ratio, noise stddev is distance / snr",
+    )
+    parser.add_argument(
+        "--dropout",
+        type=float,
+        default=0.02,
+        help="Probability of a missed measurement in a zone that sees the object",
+    )
+    parser.add_argument(
+        "--start-time",
+        type=int,
+        help="Epoch timestamp in milliseconds of the first recording (default: now)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Random seed",
+    )
+    return parser.parse_args()
+
+
+def save_recording(data: np.ndarray, path: Path, format: str) -> None:
+    if format == "bin":
+        to_frames(data).tofile(path)
+    else:
+        pd.DataFrame(data).to_csv(path, header=False, index=False)
+
+
+def save_labels(motions: Motions, ground_truth: GroundTruth, path: Path) -> None:
+    """Velocity labels in the schema of data/*-velocity-labels.csv, for motions seen by the center zone."""
+    seen = ground_truth.center_zone_ms != -1
+    labels = pd.DataFrame(
+        {
+            "timestamp_ms": ground_truth.center_zone_ms[seen],
+            "gps_velocity_kmh": np.round(motions.velocity_kmh[seen], 2),
+            "video_velocity_kmh": np.round(motions.velocity_kmh[seen], 1),
+        }
+    )
+    labels.to_csv(path, index=False)
+
+
+def save_ground_truth(motions: Motions, ground_truth: GroundTruth, path: Path) -> None:
+    pd.DataFrame(
+        {
+            "start_ms": ground_truth.start_ms,
+            "end_ms": ground_truth.end_ms,
+            "center_zone_ms": ground_truth.center_zone_ms,
+            "center_zone_samples": ground_truth.center_zone_samples,
+            "kind": np.array(OBJECT_KINDS)[motions.kind],
+            "velocity_kmh": motions.velocity_kmh,
+            "distance_to_path_m": motions.distance_to_path_m,
+            "direction": motions.direction,
+        }
+    ).to_csv(path, index=False)
+
+
+def main() -> None:
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    sensor = Sensor(
+        angle_deg=args.angle,
+        frame_period_ms=args.frame_period,
+        snr=args.snr,
+        dropout=args.dropout,
+    )
+
+    start_ms = args.start_time if args.start_time is not None else int(time.time() * 1000)
+
+    for _ in range(args.num_files):
+        t0 = time.perf_counter()
+        motions = random_motions(
+            args.num_motions,
+            rng,
+            bike_ratio=args.bike_ratio,
+            bike_speed_kmh=args.bike_speed,
+            pedestrian_speed_kmh=args.pedestrian_speed,
+            distance_to_path_m=args.distance_to_path,
+            gap_s=args.gap,
+        )
+        data, ground_truth = sensor.sample(motions, rng, start_ms=start_ms)
+        t1 = time.perf_counter()
+
+        prefix = output_dir / f"{args.name}-{start_ms // 1000}"
+        recording = prefix.with_name(f"{prefix.name}.{args.format}")
+        save_recording(data, recording, args.format)
+        save_labels(motions, ground_truth, prefix.with_name(f"{prefix.name}-velocity-labels.csv"))
+        save_ground_truth(motions, ground_truth, prefix.with_name(f"{prefix.name}-ground-truth.csv"))
+
+        print(
+            f"{recording}: {len(data)} samples, {len(motions)} motions "
+            f"({np.sum(ground_truth.center_zone_ms != -1)} seen by the center zone), "
+            f"sampled in {t1 - t0:.2f} s, saved in {time.perf_counter() - t1:.2f} s"
+        )
+
+        # Next recording starts a second after this one ends
+        start_ms = int(data[-1, 0]) + 1000
+
+
+if __name__ == "__main__":
+    main()
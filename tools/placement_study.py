@@ -0,0 +1,289 @@
+"""
+Monte Carlo study of sensor placement and preset configuration.
+
+Every configuration (mounting angle, distance to the path axis, preset iterations) is evaluated by
+sampling many random crossings with the vectorized sensor model and running the live Detector from app/
+over the resulting recording. Configurations are ranked by velocity MAE and detection rate.
+
+Iterations trade frame period for measurement noise. The frame period model is fitted to the recordings
+in performance/ (550k iterations: ~31.7 ms, 4000k iterations: ~225 ms) and noise stddev is assumed to
+shrink with the square root of the number of iterations.
+"""
+
+from sensor_model import Sensor, GroundTruth, random_motions, BICYCLE
+
+import pandas as pd
+import numpy as np
+
+import os
+import sys
+import argparse
+import itertools
+import contextlib
+
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "app"))
+
+from detector import Detector
+from mediator import Mediator
+from motion import Motion
+from strategy import TargetZeroStrategy
+from config import BICYCLE_VELOCITY_THRESHOLD_KMH
+
+
+REFERENCE_ITERATIONS = 550_000
+REFERENCE_SNR = 50
+
+
+def frame_period_ms(iterations: int) -> float:
+    return 0.0565 * iterations / 1000 + 0.6
+
+
+def snr(iterations: int) -> float:
+    return REFERENCE_SNR * np.sqrt(iterations / REFERENCE_ITERATIONS)
+
+
+# ----------------------------------- ARGS ----------------------------------- #
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--angles",
+        type=float,
+        nargs="+",
+        default=[45, 50, 55, 60, 65, 70],
+        help="Mounting angles between the sensor axis and the normal to the path in degrees",
+    )
+    parser.add_argument(
+        "--distances",
+        type=float,
+        nargs="+",
+        default=[1.0, 1.5, 2.0, 2.5],
+        help="Distances from the sensor to the path axis in m",
+    )
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        nargs="+",
+        default=[250_000, 550_000, 1_000_000, 2_000_000, 4_000_000],
+        help="Preset iterations (ITERATIONS in preset.sh)",
+    )
+    parser.add_argument(
+        "--path-width",
+        type=float,
+        default=1.5,
+        help="Path width in m, crossings are spread uniformly across it",
+    )
+    parser.add_argument(
+        "--crossings",
+        type=int,
+        default=1000,
+        help="Number of simulated crossings per configuration",
+    )
+    parser.add_argument(
+        "--chunk",
+        type=int,
+        default=250,
+        help="Crossings per worker task",
+    )
+    parser.add_argument(
+        "--bike-ratio",
+        type=float,
+        default=0.5,
+        help="Fraction of crossings that are bicycles",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes",
+    )
+    parser.add_argument(
+        "--rank-by",
+        type=str,
+        choices=["mae", "detection_rate", "accuracy"],
+        default="mae",
+        help="Ranking metric, ties are broken by the other metrics",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=20,
+        help="Number of best configurations to print",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Path to save the full results table as CSV",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Random seed",
+    )
+    return parser.parse_args()
+
+
+# --------------------------------- SIMULATE --------------------------------- #
+
+
+class NullMediator(Mediator):
+    def handle_signal_bicycle(self, motion: Motion) -> None:
+        pass
+
+
+class RecordingDetector(Detector):
+    """Detector keeping every flushed motion, not only the signalled bicycles."""
+
+    def __init__(self) -> None:
+        super().__init__(mediator=NullMediator())
+        self.motions: list[Motion] = []
+
+    def _flush_series(self) -> None:
+        super()._flush_series()
+        self.motions.append(self._motion)
+
+
+def detect_motions(data: np.ndarray) -> list[Motion]:
+    data = TargetZeroStrategy().transform(data)
+
+    # Empty sample well after the end flushes the last motion
+    flush = np.full((1, data.shape[1]), -1, dtype=np.int64)
+    flush[0, 0] = data[-1, 0] + 10_000
+    data = np.concatenate([data, flush])
+
+    detector = RecordingDetector()
+    for sample in data:
+        detector.append_sample(sample)
+
+    return detector.motions
+
+
+def match_motions(motions: list[Motion], ground_truth: GroundTruth) -> np.ndarray:
+    """Index of the first detected motion starting within each crossing, -1 if none."""
+    time_start = np.array([motion.time_start for motion in motions], dtype=np.int64)
+    crossing = np.searchsorted(ground_truth.start_ms, time_start, side="right") - 1
+    within = (crossing >= 0) & (time_start <= ground_truth.end_ms[np.maximum(crossing, 0)])
+
+    matched = np.full(len(ground_truth.start_ms), -1)
+    crossings, first = np.unique(crossing[within], return_index=True)
+    matched[crossings] = np.flatnonzero(within)[first]
+    return matched
+
+
+def simulate(config: dict, crossings: int, bike_ratio: float, path_width: float, seed: np.random.SeedSequence) -> dict:
+    rng = np.random.default_rng(seed)
+
+    sensor = Sensor(
+        angle_deg=config["angle_deg"],
+        frame_period_ms=frame_period_ms(config["iterations"]),
+        snr=snr(config["iterations"]),
+    )
+    distance = config["distance_m"]
+    motions = random_motions(
+        crossings,
+        rng,
+        bike_ratio=bike_ratio,
+        distance_to_path_m=(distance - path_width / 2, distance + path_width / 2),
+    )
+    data, ground_truth = sensor.sample(motions, rng)
+
+    # Detector warns about every degenerate series, keep worker output readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        detected = detect_motions(data)
+    matched = match_motions(detected, ground_truth)
+    found = matched != -1
+
+    velocity = np.array([detected[i].velocity for i in matched[found]])
+    is_bike = motions.kind[found] == BICYCLE
+
+    return {
+        **config,
+        "crossings": crossings,
+        "detected": int(found.sum()),
+        "absolute_errors": np.abs(velocity - motions.velocity_kmh[found]),
+        "correctly_classified": int(np.sum((velocity > BICYCLE_VELOCITY_THRESHOLD_KMH) == is_bike)),
+        "false_motions": len(detected) - int(found.sum()),
+    }
+
+
+# -------------------------------- AGGREGATE --------------------------------- #
+
+
+COUNTERS = ["crossings", "detected", "correctly_classified", "false_motions"]
+
+
+def aggregate(results: list[dict]) -> pd.DataFrame:
+    keys = ["angle_deg", "distance_m", "iterations"]
+    rows = {}
+
+    for result in results:
+        key = tuple(result[k] for k in keys)
+        row = rows.setdefault(key, {**{field: 0 for field in COUNTERS}, "errors": []})
+        for field in COUNTERS:
+            row[field] += result[field]
+        row["errors"].append(result["absolute_errors"])
+
+    table = []
+    for key, row in rows.items():
+        errors = np.concatenate(row["errors"])
+        table.append(
+            {
+                **dict(zip(keys, key)),
+                "frame_period_ms": frame_period_ms(key[2]),
+                "crossings": row["crossings"],
+                "detection_rate": row["detected"] / row["crossings"],
+                "mae": errors.mean() if len(errors) > 0 else np.nan,
+                "accuracy": row["correctly_classified"] / row["detected"] if row["detected"] > 0 else np.nan,
+                "false_motions": row["false_motions"],
+            }
+        )
+
+    return pd.DataFrame(table)
+
+
+def rank(table: pd.DataFrame, metric: str) -> pd.DataFrame:
+    order = {"mae": True, "detection_rate": False, "accuracy": False}
+    metrics = [metric] + [m for m in order if m != metric]
+    return table.sort_values(metrics, ascending=[order[m] for m in metrics], na_position="last", ignore_index=True)
+
+
+# ----------------------------------- MAIN ----------------------------------- #
+
+
+def main() -> None:
+    args = parse_args()
+
+    configs = [
+        {"angle_deg": angle, "distance_m": distance, "iterations": iterations}
+        for angle, distance, iterations in itertools.product(args.angles, args.distances, args.iterations)
+    ]
+
+    # Split every configuration into chunks so that small grids still use all workers
+    chunks = [min(args.chunk, args.crossings - start) for start in range(0, args.crossings, args.chunk)]
+    tasks = [(config, crossings) for config in configs for crossings in chunks]
+    seeds = np.random.SeedSequence(args.seed).spawn(len(tasks))
+
+    print(f"Simulating {len(configs)} configurations x {args.crossings} crossings on {args.workers} workers")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(simulate, config, crossings, args.bike_ratio, args.path_width, seed)
+            for (config, crossings), seed in zip(tasks, seeds)
+        ]
+        results = [future.result() for future in futures]
+
+    table = rank(aggregate(results), args.rank_by)
+    print(table.head(args.top).to_string(float_format=lambda v: f"{v:.3f}"))
+
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Vectorized TMF8828 sampling model, used to generate synthetic 9-zone recordings.
+
+Follows the assumptions of sensor_simulation_new.py, extended to the 3x3 zone grid:
+
+- Objects move along straight lines parallel to the path, with constant velocity.
+- Only one object is present at a time.
+- Objects are segments of a given length along the direction of motion.
+
+- Sensor is the origin, x is the normal to the path, the path runs along y.
+- Sensor axis is rotated by `angle_deg` from the normal, zone columns split the horizontal FOV into equal wedges.
+- Each zone column reports the distance to the center of the visible part of the object (histogram peak).
+- Top and bottom zone rows see the same point under the vertical zone angle.
+
+Only depends on numpy, so it can be used by the live app as well as by the tools.
+"""
+
+import numpy as np
+
+from collections import namedtuple
+from typing import Optional, Tuple
+
+
+NUM_ZONES = 9
+NUM_ZONE_COLUMNS = 3
+NUM_TARGETS = 2
+NUM_COLUMNS = 2 + NUM_ZONES * NUM_TARGETS * 2
+CENTER_ZONE_IDX = 4
+
+# measurements_wrapper as sent by main.c and read by TCPCollector ("<Qi18i18i4x")
+FRAME_DTYPE = np.dtype(
+    [
+        ("timestamp_ms", "<u8"),
+        ("ambient_light", "<i4"),
+        ("confidences", "<i4", (NUM_ZONES * NUM_TARGETS,)),
+        ("distances", "<i4", (NUM_ZONES * NUM_TARGETS,)),
+        ("padding", "V4"),
+    ]
+)
+
+PEDESTRIAN = 0
+BICYCLE = 1
+OBJECT_KINDS = ["pedestrian", "bicycle"]
+OBJECT_LENGTHS_M = np.array([0.4, 0.6])  # reflective body length along the path (walker, rider)
+
+APPROACHING = 1
+MOVING_AWAY = -1
+
+
+class Motions(namedtuple("Motions", ["kind", "velocity_kmh", "distance_to_path_m", "direction", "gap_ms"])):
+    """Arrays describing a sequence of object motions, one element per motion."""
+
+    kind: np.ndarray
+    velocity_kmh: np.ndarray
+    distance_to_path_m: np.ndarray
+    direction: np.ndarray
+    gap_ms: np.ndarray  # idle time before the motion
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+
+class GroundTruth(namedtuple("GroundTruth", ["start_ms", "end_ms", "center_zone_ms", "center_zone_samples"])):
+    """Per-motion timing of a sampled recording, center_zone_ms is -1 if the center zone never saw the motion."""
+
+    start_ms: np.ndarray
+    end_ms: np.ndarray
+    center_zone_ms: np.ndarray
+    center_zone_samples: np.ndarray
+
+
+def random_motions(
+    n: int,
+    rng: np.random.Generator,
+    bike_ratio: float = 0.5,
+    bike_speed_kmh: Tuple[float, float] = (10, 30),
+    pedestrian_speed_kmh: Tuple[float, float] = (3, 6),
+    distance_to_path_m: Tuple[float, float] = (0.75, 2.25),
+    gap_s: Tuple[float, float] = (1, 5),
+    arrivals_per_min: Optional[float] = None,
+) -> Motions:
+    """Gaps are uniform in gap_s, or exponential (Poisson arrivals of one object at a time) if arrivals_per_min is set."""
+    kind = np.where(rng.random(n) < bike_ratio, BICYCLE, PEDESTRIAN)
+    velocity_kmh = np.where(
+        kind == BICYCLE,
+        rng.uniform(*bike_speed_kmh, n),
+        rng.uniform(*pedestrian_speed_kmh, n),
+    )
+
+    return Motions(
+        kind=kind,
+        velocity_kmh=velocity_kmh,
+        distance_to_path_m=rng.uniform(*distance_to_path_m, n),
+        direction=np.where(rng.random(n) < 0.5, APPROACHING, MOVING_AWAY),
+        gap_ms=(
+            rng.exponential(60_000 / arrivals_per_min, n)
+            if arrivals_per_min is not None
+            else rng.uniform(gap_s[0] * 1000, gap_s[1] * 1000, n)
+        ),
+    )
+
+
+class Sensor:
+    def __init__(
+        self,
+        angle_deg: float = 60,
+        zone_fov_deg: float = 9.428,
+        max_range_m: float = 5.2,
+        frame_period_ms: float = 33,
+        snr: float = 50,
+        dropout: float = 0.02,
+        ghost_rate: float = 0.01,
+    ) -> None:
+        self.angle = np.radians(angle_deg)
+        self.zone_fov = np.radians(zone_fov_deg)
+        self.max_range_m = max_range_m
+        self.frame_period_ms = frame_period_ms
+        self.snr = snr
+        self.dropout = dropout
+        self.ghost_rate = ghost_rate
+
+        # Angles between the normal to the path and the wedge limits of each zone column
+        offsets = (np.arange(NUM_ZONE_COLUMNS) - NUM_ZONE_COLUMNS / 2) * self.zone_fov
+        self.column_limits = np.stack([self.angle + offsets, self.angle + offsets + self.zone_fov], axis=1)
+
+        self.fov_min = self.column_limits[0, 0]
+        self.fov_max = self.column_limits[-1, 1]
+
+    # ---------------------------------- PRIVATE --------------------------------- #
+
+    def _schedule(self, motions: Motions, start_ms: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns motion start/end times and the y coordinate where each motion starts."""
+        x = motions.distance_to_path_m
+        length = OBJECT_LENGTHS_M[motions.kind]
+        y_fov_min = x * np.tan(self.fov_min)
+        y_fov_max = x * np.tan(self.fov_max)
+
+        # Object starts and ends just outside the FOV
+        y_start = np.where(motions.direction == APPROACHING, y_fov_max, y_fov_min - length)
+        traverse_m = y_fov_max - y_fov_min + length
+        duration_ms = traverse_m / (motions.velocity_kmh / 3.6) * 1000
+
+        start = start_ms + np.cumsum(motions.gap_ms) + np.concatenate([[0], np.cumsum(duration_ms)[:-1]])
+        return start, start + duration_ms, y_start
+
+    # ---------------------------------- PUBLIC ---------------------------------- #
+
+    def sample(self, motions: Motions, rng: np.random.Generator, start_ms: int = 0) -> Tuple[np.ndarray, GroundTruth]:
+        """Samples a whole recording, returns raw tmf8828 rows (n, NUM_COLUMNS) and the per-motion ground truth."""
+        motion_start, motion_end, y_start = self._schedule(motions, start_ms)
+
+        n = int((motion_end[-1] - start_ms) / self.frame_period_ms) + 1
+        timestamps = start_ms + np.arange(n) * self.frame_period_ms + rng.uniform(0, 1, n)
+
+        data = np.full((n, NUM_COLUMNS), -1, dtype=np.int64)
+        data[:, 0] = timestamps.astype(np.int64)
+        data[:, 1] = rng.integers(50, 100, n)
+        zones = data[:, 2:].reshape(n, NUM_ZONES, NUM_TARGETS, 2)
+
+        # Motion active at each frame
+        m = np.searchsorted(motion_start, timestamps, side="right") - 1
+        active = (m >= 0) & (timestamps <= motion_end[np.maximum(m, 0)])
+        frames = np.flatnonzero(active)
+        m = m[frames]
+
+        # Object segment [y_low, y_low + length] at each active frame
+        x = motions.distance_to_path_m[m]
+        length = OBJECT_LENGTHS_M[motions.kind[m]]
+        travelled_m = (timestamps[frames] - motion_start[m]) / 1000 * motions.velocity_kmh[m] / 3.6
+        y_low = y_start[m] - motions.direction[m] * travelled_m
+
+        # Center of the visible part of the object in each zone column, (frames, columns)
+        wedge_min = x[:, None] * np.tan(self.column_limits[:, 0])
+        wedge_max = x[:, None] * np.tan(self.column_limits[:, 1])
+        y_visible_min = np.maximum(y_low[:, None], wedge_min)
+        y_visible_max = np.minimum((y_low + length)[:, None], wedge_max)
+        visible = y_visible_min <= y_visible_max
+        distance_m = np.sqrt(x[:, None] ** 2 + ((y_visible_min + y_visible_max) / 2) ** 2)
+
+        # Top and bottom rows see the same point under the vertical zone angle, (frames, rows, columns)
+        row_factor = 1 / np.cos(np.array([self.zone_fov, 0, self.zone_fov]))
+        distance_m = distance_m[:, None, :] * row_factor[None, :, None]
+        distance_m += rng.normal(0, 1, distance_m.shape) * distance_m / self.snr
+        visible = visible[:, None, :] & (distance_m <= self.max_range_m) & (distance_m > 0)
+        visible &= rng.random(visible.shape) >= self.dropout
+
+        distance_mm = np.where(visible, np.round(distance_m * 1000), -1).reshape(len(frames), NUM_ZONES)
+        confidence = 255 * (1 - 0.8 * distance_m / self.max_range_m) + rng.normal(0, 10, distance_m.shape)
+        confidence = np.clip(np.round(confidence), 1, 255)
+        confidence = np.where(visible, confidence, -1).reshape(len(frames), NUM_ZONES)
+
+        zones[frames, :, 0, 0] = confidence
+        zones[frames, :, 0, 1] = distance_mm
+
+        # Spurious low confidence second targets
+        ghosts = rng.random((n, NUM_ZONES)) < self.ghost_rate
+        zones[..., 1, 0][ghosts] = rng.integers(1, 60, ghosts.sum())
+        zones[..., 1, 1][ghosts] = rng.integers(300, int(self.max_range_m * 1000), ghosts.sum())
+
+        # First frame of each motion seen by the center zone
+        center = frames[zones[frames, CENTER_ZONE_IDX, 0, 1] != -1]
+        center_motion = np.searchsorted(motion_start, timestamps[center], side="right") - 1
+        seen, first = np.unique(center_motion, return_index=True)
+        center_zone_ms = np.full(len(motions), -1, dtype=np.int64)
+        center_zone_ms[seen] = data[center[first], 0]
+        center_zone_samples = np.bincount(center_motion, minlength=len(motions))
+
+        ground_truth = GroundTruth(
+            start_ms=motion_start.astype(np.int64),
+            end_ms=motion_end.astype(np.int64),
+            center_zone_ms=center_zone_ms,
+            center_zone_samples=center_zone_samples,
+        )
+
+        return data, ground_truth
+
+
+# --------------------------------- ENCODING --------------------------------- #
+
+
+def to_frames(data: np.ndarray) -> np.ndarray:
+    """Converts raw tmf8828 rows into measurements_wrapper structs."""
+    frames = np.zeros(len(data), dtype=FRAME_DTYPE)
+    frames["timestamp_ms"] = data[:, 0]
+    frames["ambient_light"] = data[:, 1]
+    frames["confidences"] = data[:, 2::2]
+    frames["distances"] = data[:, 3::2]
+    return frames
+
+
+def from_frames(frames: np.ndarray) -> np.ndarray:
+    """Converts measurements_wrapper structs into raw tmf8828 rows."""
+    data = np.empty((len(frames), NUM_COLUMNS), dtype=np.int64)
+    data[:, 0] = frames["timestamp_ms"]
+    data[:, 1] = frames["ambient_light"]
+    data[:, 2::2] = frames["confidences"]
+    data[:, 3::2] = frames["distances"]
+    return data